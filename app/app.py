@@ -1,10 +1,24 @@
 # app.py — COMPLETO (límite total 2 tickets + bloqueo por encuesta pendiente)
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, send_from_directory
-from flask_mysqldb import MySQL
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, send_file, abort
+from werkzeug.utils import safe_join
 from werkzeug.security import check_password_hash
 from functools import wraps
 from datetime import datetime, date, timedelta
-import os, re
+import os, re, time, base64, hashlib, hmac, mimetypes, shutil, tempfile, zipfile
+from collections import Counter
+import click
+
+from db import MySQLPool, PoolTimeout
+from cache import TTLCache
+from events import EventBus, BusFull
+from uploads import (UploadPipeline, UploadTooLarge, DERIVATIVE_SIZES, derivative_path,
+                     plan_dedupe, remove_with_derivatives)
+from reports import SurveyReports
+from fastjson import FastJSONProvider
+from metrics import Metrics
+from profiler import Profiler
+import migrations
+from surveys import build_descripcion, parse_descripcion, score_1_5, rating as survey_rating
 
 # ====================== Config ======================
 try:
@@ -14,6 +28,8 @@ except Exception:
     pass
 
 app = Flask(__name__)
+# JSON de las APIs: filas del cursor sin copiar, fechas "YYYY-MM-DD HH:MM:SS" (ver fastjson.py)
+app.json = FastJSONProvider(app)
 
 app.config['MYSQL_HOST'] = os.getenv('MYSQL_HOST', 'localhost')
 app.config['MYSQL_USER'] = os.getenv('MYSQL_USER', 'root')
@@ -21,29 +37,118 @@ app.config['MYSQL_PASSWORD'] = os.getenv('MYSQL_PASSWORD', '')
 app.config['MYSQL_DB'] = os.getenv('MYSQL_DB', 'madi_dev')
 app.config['MYSQL_CURSORCLASS'] = 'DictCursor'
 
+# Pool de conexiones (ver db.py)
+app.config['MYSQL_POOL_SIZE'] = int(os.getenv('MYSQL_POOL_SIZE', '5'))
+app.config['MYSQL_POOL_MAX_OVERFLOW'] = int(os.getenv('MYSQL_POOL_MAX_OVERFLOW', '10'))
+app.config['MYSQL_POOL_RECYCLE'] = int(os.getenv('MYSQL_POOL_RECYCLE', '3600'))
+app.config['MYSQL_POOL_PRE_PING'] = os.getenv('MYSQL_POOL_PRE_PING', '1') == '1'
+app.config['MYSQL_POOL_TIMEOUT'] = float(os.getenv('MYSQL_POOL_TIMEOUT', '10'))
+
 app.config['SECRET_KEY'] = os.getenv("SECRET_KEY", "dev-key")
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER', 'uploads')
 
+# Adjuntos: tope por imagen, workers de procesamiento y tope total de la petición
+app.config['UPLOAD_MAX_BYTES'] = int(os.getenv('UPLOAD_MAX_BYTES', str(8 * 1024 * 1024)))
+app.config['UPLOAD_MAX_DIM'] = int(os.getenv('UPLOAD_MAX_DIM', '2560'))
+app.config['UPLOAD_WORKERS'] = int(os.getenv('UPLOAD_WORKERS', '2'))
+app.config['MAX_CONTENT_LENGTH'] = 3 * app.config['UPLOAD_MAX_BYTES'] + 1024 * 1024
+# PDFs de encuestas (reportlab): hilos que los generan
+app.config['REPORT_WORKERS'] = int(os.getenv('REPORT_WORKERS', '1'))
+app.config['REPORT_MAX_ATTEMPTS'] = int(os.getenv('REPORT_MAX_ATTEMPTS', '3'))
+
+# Entrega de archivos: Flask autoriza y el servidor web transfiere los bytes.
+#   SENDFILE_MODE=""           → Flask envía el archivo (desarrollo)
+#   SENDFILE_MODE="x-sendfile" → Apache/lighttpd (mod_xsendfile)
+#   SENDFILE_MODE="x-accel"    → nginx, con una location interna, p. ej.:
+#       location /_protected/uploads/ { internal; alias /ruta/a/app/uploads/; }
+#       location /static/ { alias /ruta/a/app/static/; expires max; }
+app.config['SENDFILE_MODE'] = os.getenv('SENDFILE_MODE', '').lower()
+app.config['X_ACCEL_PREFIX'] = os.getenv('X_ACCEL_PREFIX', '/_protected/uploads/')
+app.config['USE_X_SENDFILE'] = app.config['SENDFILE_MODE'] == 'x-sendfile'
+# Caché del navegador: estáticos sin huella y adjuntos con nombre no direccionado por contenido
+app.config['STATIC_MAX_AGE'] = int(os.getenv('STATIC_MAX_AGE', '3600'))
+app.config['UPLOAD_MAX_AGE'] = int(os.getenv('UPLOAD_MAX_AGE', '86400'))
+
+# Stream SSE de tickets: segundos entre heartbeats y streams abiertos por proceso.
+# El generador es síncrono, así que el tope depende de cómo se despliega:
+# - Worker por hilos (gunicorn --threads N): cada stream retiene un hilo
+#   mientras el cliente sigue conectado. WEB_THREADS debe valer lo mismo que
+#   --threads y el tope por defecto es la mitad, para que las peticiones
+#   normales siempre tengan hilos libres.
+# - Worker gevent (gunicorn -k gevent, con monkey patching): cada stream es un
+#   greenlet y la Queue/Lock del bus ceden al hub, así que el tope por defecto
+#   sube a SSE_MAX_STREAMS_ASYNC.
+# SSE_MAX_STREAMS fija el tope a mano. Pasado el tope el stream responde 503.
+def _gevent_activo() -> bool:
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("threading")
+
+app.config['WEB_THREADS'] = int(os.getenv('WEB_THREADS', '8'))
+app.config['SSE_ASYNC'] = _gevent_activo()
+app.config['SSE_HEARTBEAT'] = float(os.getenv('SSE_HEARTBEAT', '15'))
+app.config['SSE_MAX_STREAMS'] = int(os.getenv(
+    'SSE_MAX_STREAMS',
+    os.getenv('SSE_MAX_STREAMS_ASYNC', '1000') if app.config['SSE_ASYNC']
+    else str(max(1, app.config['WEB_THREADS'] // 2))))
+
+# Métricas (ver metrics.py): umbral del log de consultas lentas y acceso a /metrics.
+# /metrics está cerrado salvo que se configure METRICS_TOKEN ("Authorization:
+# Bearer <token>") o METRICS_ALLOW_IPS (direcciones separadas por coma). Detrás
+# de nginx todas las peticiones llegan desde 127.0.0.1: ahí usar el token.
+# METRICS_SERVER_TIMING=1 añade el encabezado Server-Timing (tiempo en BD y
+# número de consultas) a cada respuesta; solo para depurar.
+app.config['SLOW_QUERY_MS'] = float(os.getenv('SLOW_QUERY_MS', '200'))
+app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN', '')
+app.config['METRICS_ALLOW_IPS'] = {ip.strip() for ip in os.getenv('METRICS_ALLOW_IPS', '').split(',') if ip.strip()}
+app.config['METRICS_SERVER_TIMING'] = os.getenv('METRICS_SERVER_TIMING', '0') == '1'
+# Perfilado por muestreo (ver profiler.py): carpeta, periodo de muestreo y perfiles por endpoint
+app.config['PROFILE_DIR'] = os.getenv('PROFILE_DIR', '')
+app.config['PROFILE_INTERVAL_MS'] = float(os.getenv('PROFILE_INTERVAL_MS', '5'))
+app.config['PROFILE_MAX_PER_ENDPOINT'] = int(os.getenv('PROFILE_MAX_PER_ENDPOINT', '50'))
+
+# Segundos que el perfil guardado en sesión se usa sin releerlo de BD
+app.config['PROFILE_TTL'] = int(os.getenv('PROFILE_TTL', '60'))
+
 # Límite global de tickets por usuario (HISTÓRICO)
 MAX_TOTAL_TICKETS = int(os.getenv("MAX_TOTAL_TICKETS", "2"))
 
-conexion = MySQL(app)
+# Paginación keyset de los listados (creado_en, id)
+LIST_DEFAULT_LIMIT = int(os.getenv("LIST_DEFAULT_LIMIT", "50"))
+LIST_MAX_LIMIT = int(os.getenv("LIST_MAX_LIMIT", "200"))
+
+# Operaciones masivas de técnicos: tickets por petición
+BULK_MAX_TICKETS = int(os.getenv("BULK_MAX_TICKETS", "200"))
+
+conexion = MySQLPool(app)
+uploads = UploadPipeline(app)
+reports = SurveyReports(app)
+bus = EventBus(max_subscribers=app.config['SSE_MAX_STREAMS'])
+metrics = Metrics(app)
+conexion.add_query_listener(metrics.observe_query)
+profiler = Profiler(app)
+conexion.add_query_listener(profiler.observe_query)
+# Acumulados de cada stats() que se exponen como counters (<nombre>_total)
+CACHE_COUNTERS = ("hits", "misses", "expirations", "evictions", "invalidations")
+metrics.add_gauges("madi_db_pool", conexion.stats,
+                   counters=("checkouts", "timeouts", "created", "recycled", "ping_failures", "wait_ms"))
+metrics.add_gauges("madi_uploads", uploads.stats,
+                   counters=("queued", "done", "rejected", "failed", "deduplicated"))
+metrics.add_gauges("madi_reports", reports.stats, counters=("queued", "done", "failed"))
+metrics.add_gauges("madi_sse", bus.stats, counters=("rejected",))
+
+# Catálogos casi estáticos (tipos, sugerencias, técnicos activos)
+catalog_cache = TTLCache(
+    maxsize=int(os.getenv("CATALOG_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("CATALOG_CACHE_TTL", "300")),
+)
+metrics.add_gauges("madi_cache_catalogos", catalog_cache.stats, counters=CACHE_COUNTERS)
 
 # ====================== Helpers ======================
-def serialize_rows(rows):
-    out = []
-    for r in rows:
-        d = {}
-        for k, v in r.items():
-            if isinstance(v, (datetime, date)):
-                d[k] = v.strftime("%Y-%m-%d %H:%M:%S")
-            else:
-                d[k] = v
-        out.append(d)
-    return out
-
 def _wants_json() -> bool:
     return request.path.startswith("/api/") or \
            "application/json" in (request.headers.get("Accept") or "") or \
@@ -58,9 +163,10 @@ def to_int_list(values):
     except (TypeError, ValueError):
         return None
 
-def _fmt_hms(delta):
+def _fmt_hms(delta, vacio=""):
+    """timedelta → "HH:MM:SS" (negativos como 0); `vacio` si no hay duración."""
     if not delta:
-        return ""
+        return vacio
     secs = int(max(0, delta.total_seconds()))
     h = secs // 3600
     m = (secs % 3600) // 60
@@ -74,6 +180,60 @@ def _s15(v):
     except:
         return None
 
+def _encode_cursor(row) -> str:
+    """Cursor opaco a partir de la última fila de una página (creado_en, id)."""
+    raw = f"{row['creado_en'].isoformat(sep=' ')}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_cursor(value: str):
+    """Devuelve (creado_en, id) o lanza ValueError si el cursor no es válido."""
+    pad = "=" * (-len(value) % 4)
+    raw = base64.urlsafe_b64decode((value + pad).encode()).decode()
+    ts, _, tid = raw.partition("|")
+    return datetime.fromisoformat(ts), int(tid)
+
+def _list_args():
+    """
+    Lee ?cursor=&limit=&q= de la petición.
+    Devuelve (cursor, limit, q); cursor es None en la primera página.
+    """
+    raw_cursor = (request.args.get("cursor") or "").strip()
+    cursor = _decode_cursor(raw_cursor) if raw_cursor else None
+    try:
+        limit = int(request.args.get("limit") or LIST_DEFAULT_LIMIT)
+    except ValueError:
+        limit = LIST_DEFAULT_LIMIT
+    limit = max(1, min(limit, LIST_MAX_LIMIT))
+    q = (request.args.get("q") or "").strip()[:100]
+    return cursor, limit, q
+
+def _like_escape(value: str) -> str:
+    """Escapa comodines de LIKE (\\, %, _) para buscar el texto literal."""
+    return re.sub(r"([\\%_])", r"\\\1", value)
+
+def _list_filters_sql(cursor, q):
+    """
+    Condiciones extra de keyset + búsqueda para listados sobre `tickets t`
+    con `areas a` unida. Devuelve (sql, params).
+    """
+    sql, params = "", []
+    if cursor:
+        sql += " AND (t.creado_en < %s OR (t.creado_en = %s AND t.id < %s))"
+        params += [cursor[0], cursor[0], cursor[1]]
+    if q:
+        like = "%" + _like_escape(q) + "%"
+        sql += " AND (t.asunto LIKE %s OR t.solicitante_nombre LIKE %s OR a.nombre LIKE %s)"
+        params += [like, like, like]
+    return sql, params
+
+def _paginate(rows, limit):
+    """Recorta la fila extra pedida (limit+1) y calcula el siguiente cursor."""
+    rows = list(rows or [])
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, _encode_cursor(rows[-1])
+    return rows, None
+
 def _encuestas_pendientes(uid: int, incluir_cancelados: bool = False):
     """
     Devuelve los tickets del usuario con encuesta pendiente.
@@ -109,14 +269,482 @@ def _total_tickets_count(uid: int) -> int:
     finally:
         cur.close()
 
+def _catalog_response(key: str, loader):
+    """
+    Respuesta JSON de un catálogo cacheado en proceso (ver catalog_cache).
+    Se guarda el cuerpo ya serializado + su ETag; si el navegador envía
+    If-None-Match con el mismo ETag se responde 304 sin cuerpo.
+    """
+    def build():
+        body = app.json.dumps(loader())
+        return body, hashlib.sha1(body.encode("utf-8")).hexdigest()
+
+    body, etag = catalog_cache.get_or_set(key, build)
+    resp = app.response_class(body, mimetype="application/json")
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp.make_conditional(request)
+
+def invalidate_catalogs(prefix=None) -> int:
+    """Hook para invalidar catálogos tras cambios en tipos/sugerencias/usuarios."""
+    return catalog_cache.invalidate(prefix)
+
+# ====================== Eventos (SSE) ======================
+# Dueño (solicitante) de cada ticket, para filtrar eventos; nunca cambia.
+_ticket_owners = TTLCache(maxsize=10000, ttl=24 * 3600)
+
+def _ticket_owner(cur, tid: int):
+    def load():
+        cur.execute("SELECT usuario_id FROM tickets WHERE id=%s", (tid,))
+        row = cur.fetchone()
+        return row["usuario_id"] if row else None
+    return _ticket_owners.get_or_set(tid, load)
+
+def _publicar(tipo: str, tid: int, owner, **data):
+    """Publica un evento de ticket en el bus (llamar después del COMMIT)."""
+    _olvidar_resumen(tid)
+    bus.publish(tipo, dict(id=tid, **data), owner=owner)
+
+# ====================== Adjuntos ======================
+def _tickets_upload_dir() -> str:
+    return os.path.join(app.root_path, app.config['UPLOAD_FOLDER'], "tickets")
+
+def _spool_imagenes(files, max_n: int = 3):
+    """
+    Vuelca a temporales hasta max_n imágenes de la petición.
+    Devuelve [(tmp_path, filename)]; UploadTooLarge si alguna excede el tope.
+    """
+    out = []
+    try:
+        for f in files:
+            if len(out) >= max_n:
+                break
+            if not f or not (f.mimetype or "").startswith("image/"):
+                continue
+            out.append((uploads.spool(f), f.filename or "img"))
+    except Exception:
+        _descartar_temporales(out)
+        raise
+    return out
+
+def _descartar_temporales(spooled):
+    for tmp_path, _ in spooled:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+
+def _adjunto_json(att_id, fname) -> dict:
+    """Adjunto para las APIs: original + derivados para galerías/miniaturas."""
+    return {
+        "id": att_id,
+        "name": fname,
+        "url": url_for("serve_ticket_upload", fname=fname),
+        "thumb": url_for("serve_ticket_upload", fname=fname, size="thumb"),
+        "medium": url_for("serve_ticket_upload", fname=fname, size="medium"),
+    }
+
+def _registrar_adjunto(ticket_id: int):
+    """Callback del worker: inserta la fila en ticket_attachments al terminar."""
+    def on_ready(path):
+        with conexion.borrow() as conn:
+            cur = conn.cursor()
+            try:
+                # El mismo blob puede llegar dos veces al mismo ticket: una sola fila
+                cur.execute("""
+                    INSERT INTO ticket_attachments (ticket_id, ruta, archivo)
+                    SELECT %s, %s, %s FROM DUAL
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM ticket_attachments WHERE ticket_id=%s AND ruta=%s
+                    )
+                """, (ticket_id, path, os.path.basename(path), ticket_id, path))
+                if cur.rowcount == 1:
+                    _tocar_tickets(cur, [ticket_id])
+                conn.commit()
+            finally:
+                cur.close()
+    return on_ready
+
+# Blob (<sha256><ext>) o su derivado (<sha256><ext>.webp)
+_BLOB_RE = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]+(\.webp)?$")
+
+def _send_upload(path):
+    """
+    Respuesta para un archivo ya autorizado de uploads/. Según SENDFILE_MODE la
+    transferencia la hace nginx (X-Accel-Redirect), Apache (X-Sendfile, vía
+    USE_X_SENDFILE de Flask) o el propio Flask (con soporte de Range/304).
+    """
+    if app.config['SENDFILE_MODE'] == "x-accel":
+        root = os.path.join(app.root_path, app.config['UPLOAD_FOLDER'])
+        rel = os.path.relpath(path, root).replace(os.sep, "/")
+        resp = app.response_class(mimetype=mimetypes.guess_type(path)[0] or "application/octet-stream")
+        resp.headers["X-Accel-Redirect"] = app.config['X_ACCEL_PREFIX'].rstrip("/") + "/" + rel
+    else:
+        resp = send_file(path, conditional=True)
+
+    # Los blobs (y sus derivados) se nombran por contenido: nunca cambian
+    resp.cache_control.private = True
+    if _BLOB_RE.match(os.path.basename(path)):
+        resp.cache_control.max_age = 31536000
+        resp.cache_control.immutable = True
+    else:
+        resp.cache_control.max_age = app.config['UPLOAD_MAX_AGE']
+    return resp
+
+# ====================== Estáticos con huella ======================
+# url_for('static', filename=...) añade ?v=<hash del contenido>; esas URLs se
+# sirven como inmutables (1 año) y cambian solas cuando cambia el archivo.
+_static_versions = {}
+
+def _static_version(filename: str) -> str:
+    v = None if app.debug else _static_versions.get(filename)
+    if v is None:
+        try:
+            with open(os.path.join(app.static_folder, filename), "rb") as fh:
+                v = hashlib.sha1(fh.read()).hexdigest()[:12]
+        except OSError:
+            v = ""
+        _static_versions[filename] = v
+    return v
+
+@app.url_defaults
+def _static_fingerprint(endpoint, values):
+    if endpoint == "static" and "filename" in values and "v" not in values:
+        v = _static_version(values["filename"])
+        if v:
+            values["v"] = v
+
+@app.after_request
+def _static_cache_headers(resp):
+    if request.endpoint == "static" and resp.status_code in (200, 206, 304):
+        resp.cache_control.public = True
+        v = request.args.get("v")
+        if v and v == _static_version(request.view_args["filename"]):
+            resp.cache_control.max_age = 31536000
+            resp.cache_control.immutable = True
+        else:
+            resp.cache_control.max_age = app.config['STATIC_MAX_AGE']
+    return resp
+
+def _liberar_blob(cur, fname) -> bool:
+    """Conteo de referencias: borra el blob (y derivados) si ninguna fila lo usa."""
+    cur.execute("SELECT COUNT(*) AS c FROM ticket_attachments WHERE archivo = %s", (fname,))
+    if int((cur.fetchone() or {}).get("c") or 0):
+        return False
+    remove_with_derivatives(_tickets_upload_dir(), fname)
+    return True
+
+@app.errorhandler(UploadTooLarge)
+def _upload_too_large(e):
+    mb = app.config['UPLOAD_MAX_BYTES'] // (1024 * 1024)
+    return jsonify(ok=False, msg=f"La imagen {e} supera el tamaño máximo de {mb} MB."), 413
+
+@app.errorhandler(413)
+def _request_too_large(e):
+    return jsonify(ok=False, msg="La solicitud excede el tamaño máximo permitido."), 413
+
+# ====================== Listados (técnicos / encuestas por página) ======================
+# Los listados traen primero la página de tickets y luego resuelven técnicos y
+# encuestas de TODA la página con un IN (...) cada uno, en vez de subconsultas
+# correlacionadas por fila.
+def _in_placeholders(values) -> str:
+    return ", ".join(["%s"] * len(values))
+
+def _tocar_tickets(cur, ids):
+    """
+    Sube `tickets.version` (ETag del detalle) de los tickets cuyo detalle cambió
+    sin que su fila se actualizara (notas, técnicos, adjuntos, encuesta).
+    Va en la misma transacción que el cambio.
+    """
+    if ids:
+        cur.execute(f"UPDATE tickets SET version = version + 1 WHERE id IN ({_in_placeholders(ids)})",
+                    tuple(ids))
+
+def _tecnicos_por_ticket(cur, ids) -> dict:
+    """{ticket_id: [username, ...]} ordenado por username, en una sola consulta."""
+    out = {}
+    if not ids:
+        return out
+    cur.execute(f"""
+        SELECT tt.ticket_id, u.username
+        FROM ticket_tecnicos tt
+        JOIN users u ON u.id = tt.user_id
+        WHERE tt.ticket_id IN ({_in_placeholders(ids)})
+        ORDER BY tt.ticket_id, u.username ASC
+    """, tuple(ids))
+    for r in cur.fetchall() or []:
+        out.setdefault(r["ticket_id"], []).append(r["username"])
+    return out
+
+def _tickets_encuestados(cur, ids) -> set:
+    """Ids de la página que ya tienen encuesta registrada."""
+    if not ids:
+        return set()
+    cur.execute(f"""
+        SELECT DISTINCT ticket_id
+        FROM encuestas
+        WHERE ticket_id IN ({_in_placeholders(ids)})
+    """, tuple(ids))
+    return {r["ticket_id"] for r in cur.fetchall() or []}
+
+def _merge_tecnicos(cur, rows, key="asignados", principal=None, encuestas=False):
+    """
+    Completa las filas de una página con los técnicos asignados
+    (`key` = "a, b, c"; `principal` = primero por username) y, opcionalmente,
+    la marca `encuestada` (1/None) como la devolvían las subconsultas.
+    """
+    ids = [r["id"] for r in rows]
+    tecs = _tecnicos_por_ticket(cur, ids)
+    hechas = _tickets_encuestados(cur, ids) if encuestas else set()
+    for r in rows:
+        names = tecs.get(r["id"]) or []
+        r[key] = ", ".join(names) or None
+        if principal:
+            r[principal] = names[0] if names else None
+        if encuestas:
+            r["encuestada"] = 1 if r["id"] in hechas else None
+    return rows
+
+def _precondiciones_ticket(cur, uid: int, incluir_cancelados: bool = False):
+    """
+    Dentro de una transacción, en una sola sentencia con bloqueo: área del
+    usuario, total histórico de tickets y encuestas pendientes (cantidad e ids,
+    más reciente primero, para responder el 409 sin otra consulta).
+    FOR UPDATE bloquea la fila del usuario y sus tickets (lectura actual, no
+    snapshot), así dos envíos simultáneos del mismo usuario quedan
+    serializados hasta el COMMIT del primero y el límite no se puede rebasar.
+    encuestas.ticket_id no es único: la encuesta se busca con EXISTS para no
+    contar un ticket una vez por encuesta.
+    """
+    estados = ("RESUELTO", "CANCELADO") if incluir_cancelados else ("RESUELTO",)
+    cur.execute(f"""
+        SELECT u.area_id,
+               COUNT(t.id) AS total,
+               COALESCE(SUM(t.estado IN ({_in_placeholders(estados)})
+                            AND NOT EXISTS (SELECT 1 FROM encuestas e WHERE e.ticket_id = t.id)), 0) AS pendientes,
+               GROUP_CONCAT(CASE WHEN t.estado IN ({_in_placeholders(estados)})
+                                  AND NOT EXISTS (SELECT 1 FROM encuestas e WHERE e.ticket_id = t.id)
+                                 THEN CAST(t.id AS CHAR) END
+                            ORDER BY t.creado_en DESC) AS pendientes_ids
+        FROM users u
+        LEFT JOIN tickets t ON t.usuario_id = u.id
+        WHERE u.id = %s
+        GROUP BY u.id, u.area_id
+        FOR UPDATE
+    """, (*estados, *estados, uid))
+    return cur.fetchone()
+
+# ====================== Métricas (rollups diarios) ======================
+# El dashboard de admin no recorre `tickets`: lee tablas agregadas por día de
+# creación del ticket que cada escritura mantiene con deltas (-1 en la clave
+# anterior, +1 en la nueva) dentro de su propia transacción. Así una consulta
+# de mes toca ~31 días × áreas × estados filas sin importar el histórico.
+# Tablas: migrations/0003; `flask metrics-rebuild` las recalcula desde cero.
+ESTADOS_ABIERTOS = ("PENDIENTE", "EN_CURSO")
+
+def _rollup_claves(cur, ids, lock: bool = False) -> dict:
+    """{ticket_id: (dia, area_id, estado, asignado)} según el estado actual."""
+    if not ids:
+        return {}
+    cur.execute(f"""
+        SELECT id, DATE(creado_en) AS dia, COALESCE(area_id, 0) AS area_id, estado,
+               asignado_a IS NOT NULL AS asignado
+        FROM tickets
+        WHERE id IN ({_in_placeholders(ids)})
+        {"FOR UPDATE" if lock else ""}
+    """, tuple(ids))
+    return {r["id"]: (r["dia"], r["area_id"], r["estado"], int(r["asignado"]))
+            for r in cur.fetchall() or []}
+
+def _rollup_aplicar(cur, antes: dict, despues: dict):
+    """Mueve cada ticket de su clave `antes` a su clave `despues` en metricas_tickets_dia."""
+    deltas = Counter()
+    for clave in antes.values():
+        deltas[clave] -= 1
+    for clave in despues.values():
+        deltas[clave] += 1
+    filas = [(*clave, n) for clave, n in deltas.items() if n]
+    if filas:
+        cur.executemany("""
+            INSERT INTO metricas_tickets_dia (dia, area_id, estado, asignado, n)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE n = n + VALUES(n)
+        """, filas)
+
+def _rollup_tecnicos(cur, claves: dict, pares):
+    """Suma 1 servicio por cada par (ticket_id, user_id) recién insertado en ticket_tecnicos."""
+    deltas = Counter((claves[tid][0], user_id) for tid, user_id in pares if tid in claves)
+    if deltas:
+        cur.executemany("""
+            INSERT INTO metricas_tecnicos_dia (dia, user_id, n)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE n = n + VALUES(n)
+        """, [(dia, user_id, n) for (dia, user_id), n in deltas.items()])
+
+def _pares_existentes(cur, ticket_ids, user_ids) -> set:
+    """Pares (ticket_id, user_id) que ya están en ticket_tecnicos."""
+    if not ticket_ids or not user_ids:
+        return set()
+    cur.execute(f"""
+        SELECT ticket_id, user_id
+        FROM ticket_tecnicos
+        WHERE ticket_id IN ({_in_placeholders(ticket_ids)})
+          AND user_id IN ({_in_placeholders(user_ids)})
+    """, (*ticket_ids, *user_ids))
+    return {(r["ticket_id"], r["user_id"]) for r in cur.fetchall() or []}
+
+def _disponibles(cur, ticket_ids) -> set:
+    """Ids que hoy están en el scope "disponibles" (PENDIENTE y sin técnicos)."""
+    if not ticket_ids:
+        return set()
+    cur.execute(f"""
+        SELECT t.id
+        FROM tickets t
+        WHERE t.id IN ({_in_placeholders(ticket_ids)})
+          AND t.estado='PENDIENTE'
+          AND NOT EXISTS (SELECT 1 FROM ticket_tecnicos x WHERE x.ticket_id=t.id)
+    """, tuple(ticket_ids))
+    return {r["id"] for r in cur.fetchall() or []}
+
+def _mes_rango(month: str):
+    """'YYYY-MM' → (primer día, primer día del mes siguiente); ValueError si no es válido."""
+    inicio = datetime.strptime(month, "%Y-%m").date()
+    fin = date(inicio.year + inicio.month // 12, inicio.month % 12 + 1, 1)
+    return inicio, fin
+
+def _meses_atras(inicio: date, n: int) -> date:
+    y, m = divmod(inicio.year * 12 + inicio.month - 1 - n, 12)
+    return date(y, m + 1, 1)
+
+# ====================== Encuestas (respuestas estructuradas) ======================
+# Las calificaciones viven en `encuesta_respuestas` (una fila por encuesta, con
+# área y fecha copiadas del ticket para filtrar por índice) y los promedios por
+# área/mes en `encuestas_promedios_mes`, que se actualiza con cada alta.
+# Tablas: migrations/0004; `flask surveys-migrate` migra las descripciones antiguas.
+
+def _guardar_respuestas(cur, filas):
+    """
+    Inserta filas de encuesta_respuestas (dicts) y suma su aporte a
+    encuestas_promedios_mes, en la transacción de quien llama.
+    """
+    if not filas:
+        return
+    cur.executemany("""
+        INSERT INTO encuesta_respuestas
+            (encuesta_id, ticket_id, area_id, creado_en,
+             q_rapidez, q_resolucion_efectiva, q_satis_solucion, q_satis_web,
+             q_identificacion, sugerencias, comentarios, rating)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """, [(
+        f["encuesta_id"], f["ticket_id"], f["area_id"] or 0, f["creado_en"],
+        f["q_rapidez"], f["q_resolucion_efectiva"], f["q_satis_solucion"], f["q_satis_web"],
+        f["q_identificacion"], f["sugerencias"], f["comentarios"], f["rating"],
+    ) for f in filas])
+
+    deltas = {}
+    for f in filas:
+        clave = (f["creado_en"].date().replace(day=1), f["area_id"] or 0)
+        n, calificadas, suma = deltas.get(clave, (0, 0, 0))
+        if f["rating"] is not None:
+            calificadas, suma = calificadas + 1, suma + f["rating"]
+        deltas[clave] = (n + 1, calificadas, suma)
+    cur.executemany("""
+        INSERT INTO encuestas_promedios_mes (mes, area_id, n, calificadas, suma)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE n = n + VALUES(n),
+                                calificadas = calificadas + VALUES(calificadas),
+                                suma = suma + VALUES(suma)
+    """, [(*clave, *vals) for clave, vals in deltas.items()])
+
+ENCUESTA_PREGUNTAS = (
+    ("q_rapidez", "Rapidez de la atención"),
+    ("q_resolucion_efectiva", "Resolución efectiva"),
+    ("q_satis_solucion", "Satisfacción con la solución"),
+    ("q_satis_web", "Satisfacción con el sistema web"),
+    ("p2", "Pregunta 2"),
+    ("p3", "Pregunta 3"),
+    ("p4", "Pregunta 4"),
+    ("q_identificacion", "¿El técnico se identificó?"),
+    ("rating", "Calificación promedio"),
+)
+
+def _encuesta_pdf_datos(encuesta_id: int):
+    """Loader del PDF (corre en el worker de reports): encabezado del ticket + respuestas."""
+    with conexion.borrow() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                SELECT e.id, e.ticket_id, e.p2, e.p3, e.p4, e.t_servicio, e.t_atencion, e.atendida,
+                       r.q_rapidez, r.q_resolucion_efectiva, r.q_satis_solucion, r.q_satis_web,
+                       r.q_identificacion, r.sugerencias, r.comentarios, r.rating, r.creado_en
+                FROM encuestas e
+                LEFT JOIN encuesta_respuestas r ON r.encuesta_id = e.id
+                WHERE e.id=%s
+            """, (encuesta_id,))
+            e = cur.fetchone()
+            t = _ticket_resumen(cur, e["ticket_id"], cache=False) if e else None
+        finally:
+            cur.close()
+    if not e or not t:
+        return None
+
+    return {
+        "titulo": f"Encuesta de satisfacción — Folio {t['folio']}",
+        "secciones": [
+            ("Ticket", [
+                ("Folio", t["folio"]),
+                ("Solicitante", t["solicitante"]),
+                ("Área", t["area_nombre"]),
+                ("Tipo de servicio", t["tipo_servicio"]),
+                ("Estado", t["estado"]),
+                ("Hora de solicitud", t["hora_solicitud"]),
+                ("Hora de cierre", t["hora_cierre"]),
+                ("Tiempo del técnico", t["t_atencion"]),
+                ("Técnicos", t["tecnicos_str"]),
+            ]),
+            ("Encuesta", [
+                ("Registrada", e["creado_en"].strftime("%Y-%m-%d %H:%M") if e["creado_en"] else "-"),
+                ("Tiempo de servicio", e["t_servicio"]),
+                ("Tiempo de atención", e["t_atencion"]),
+                ("Atendida", e["atendida"]),
+            ] + [(etiqueta, e[k]) for k, etiqueta in ENCUESTA_PREGUNTAS]),
+        ],
+        "texto": [("Sugerencias", e["sugerencias"]), ("Comentarios", e["comentarios"])],
+    }
+
+def _respuestas_fila(encuesta_id, ticket_id, area_id, creado_en, answers: dict) -> dict:
+    """Fila de encuesta_respuestas a partir de las respuestas (form o descripción parseada)."""
+    ident = (answers.get("q_identificacion") or "").lower()
+    return {
+        "encuesta_id": encuesta_id, "ticket_id": ticket_id,
+        "area_id": area_id, "creado_en": creado_en,
+        "q_rapidez": score_1_5(answers.get("q_rapidez")),
+        "q_resolucion_efectiva": score_1_5(answers.get("q_resolucion_efectiva")),
+        "q_satis_solucion": score_1_5(answers.get("q_satis_solucion")),
+        "q_satis_web": score_1_5(answers.get("q_satis_web")),
+        "q_identificacion": ident if ident in ("si", "no") else None,
+        "sugerencias": answers.get("sugerencias") or None,
+        "comentarios": answers.get("comentarios") or None,
+        "rating": survey_rating(answers),
+    }
+
 # ====================== Auth / Roles ======================
+# El tiempo de estas comprobaciones se mide aparte de la vista (metrics.auth)
+def _no_autenticado():
+    if not session.get("user_id") or _session_profile() is None:
+        session.clear()
+        if _wants_json():
+            return jsonify(ok=False, msg="No autenticado"), 401
+        return redirect(url_for("login"))
+    return None
+
 def login_required(view):
     @wraps(view)
     def wrapper(*a, **kw):
-        if not session.get("user_id"):
-            if _wants_json():
-                return jsonify(ok=False, msg="No autenticado"), 401
-            return redirect(url_for("login"))
+        with metrics.auth():
+            denegado = _no_autenticado()
+        if denegado is not None:
+            return denegado
         return view(*a, **kw)
     return wrapper
 
@@ -124,21 +752,73 @@ def role_required(*roles):
     def deco(view):
         @wraps(view)
         def wrapper(*a, **kw):
-            if not session.get("user_id"):
-                if _wants_json():
-                    return jsonify(ok=False, msg="No autenticado"), 401
-                return redirect(url_for("login"))
-            if session.get("role") not in roles:
-                if _wants_json():
-                    return jsonify(ok=False, msg="No autorizado"), 403
-                return redirect(url_for({
-                    "TECNICO": "tecnico_disponibles",
-                    "SOLICITANTE": "solicitante_form"
-                }.get(session.get("role"), "root_index")))
+            with metrics.auth():
+                denegado = _no_autenticado()
+                if denegado is None and session.get("role") not in roles:
+                    if _wants_json():
+                        denegado = (jsonify(ok=False, msg="No autorizado"), 403)
+                    else:
+                        denegado = redirect(url_for({
+                            "TECNICO": "tecnico_disponibles",
+                            "SOLICITANTE": "solicitante_form"
+                        }.get(session.get("role"), "root_index")))
+            if denegado is not None:
+                return denegado
             return view(*a, **kw)
         return wrapper
     return deco
 
+# ====================== Perfil en sesión ======================
+# El perfil (email, área, rol) se guarda en la sesión al hacer login y se
+# relee de BD cuando tiene más de PROFILE_TTL segundos. Los usuarios se editan
+# fuera de la app (no hay escrituras a `users` en este árbol), así que el TTL
+# es lo que lleva los cambios de rol, área, email o baja a las sesiones
+# abiertas, en todos los workers. Entre recargas, login_required,
+# /api/session/me y la creación de tickets no consultan la BD.
+PROFILE_FIELDS = ("id", "username", "email", "area_id", "role", "area_name")
+
+def _load_profile(cur, where_sql: str, param):
+    cur.execute(f"""
+        SELECT u.id, u.username, u.email, u.area_id, u.is_active, u.password_hash,
+               r.nombre AS role, a.nombre AS area_name
+        FROM users u
+        JOIN roles r ON r.id = u.role_id
+        LEFT JOIN areas a ON a.id = u.area_id
+        WHERE {where_sql}
+        LIMIT 1
+    """, (param,))
+    return cur.fetchone()
+
+def _store_profile(row):
+    session["user_id"]  = row["id"]
+    session["username"] = row["username"]
+    session["role"]     = row["role"]
+    session["area_id"]  = row["area_id"]
+    session["profile"]  = {k: row.get(k) for k in PROFILE_FIELDS}
+    session["profile_at"] = time.time()
+
+def _session_profile():
+    """Perfil del usuario actual; solo va a BD si el de la sesión tiene más de PROFILE_TTL."""
+    uid = session["user_id"]
+    prof = session.get("profile")
+    if prof and time.time() - session.get("profile_at", 0) < app.config['PROFILE_TTL']:
+        return prof
+    cur = conexion.connection.cursor()
+    try:
+        row = _load_profile(cur, "u.id = %s", uid)
+    finally:
+        cur.close()
+    if not row or not row["is_active"]:
+        return None
+    _store_profile(row)
+    return session["profile"]
+
+@app.errorhandler(PoolTimeout)
+def _pool_timeout(e):
+    if _wants_json():
+        return jsonify(ok=False, msg="Servicio ocupado, intenta de nuevo."), 503
+    return "Servicio ocupado, intenta de nuevo.", 503
+
 # ====================== Público ======================
 @app.route("/")
 def root_index():
@@ -158,15 +838,7 @@ def login():
 
     cur = conexion.connection.cursor()
     try:
-        cur.execute("""
-            SELECT u.id, u.username, u.password_hash, u.is_active, u.area_id,
-                   r.nombre AS role
-            FROM users u
-            JOIN roles r ON r.id = u.role_id
-            WHERE u.username=%s
-            LIMIT 1
-        """, (user,))
-        row = cur.fetchone()
+        row = _load_profile(cur, "u.username = %s", user)
     finally:
         cur.close()
 
@@ -175,14 +847,12 @@ def login():
     if not check_password_hash(row["password_hash"], pwd):
         return jsonify(ok=False, msg="Credenciales incorrectas."), 401
 
-    session["user_id"]  = row["id"]
-    session["username"] = row["username"]
-    session["role"]     = row["role"]
-    session["area_id"]  = row["area_id"]
+    _store_profile(row)
 
     dest = {
         "TECNICO": "tecnico_disponibles",
         "SOLICITANTE": "solicitante_form",
+        "ADMIN": "admin_dashboard",
     }.get(row["role"], "root_index")
     return jsonify(ok=True, redirect=url_for(dest))
 
@@ -208,22 +878,10 @@ def solicitante_tickets():
 @app.get("/api/session/me")
 @login_required
 def api_session_me():
-    cur = conexion.connection.cursor()
-    try:
-        cur.execute("""
-            SELECT u.id, u.username, u.email, u.area_id, r.nombre AS role, a.nombre AS area_name
-            FROM users u
-            JOIN roles r ON r.id = u.role_id
-            LEFT JOIN areas a ON a.id = u.area_id
-            WHERE u.id = %s
-            LIMIT 1
-        """, (session["user_id"],))
-        row = cur.fetchone()
-    finally:
-        cur.close()
-    if not row:
+    prof = _session_profile()
+    if not prof:
         return jsonify({"ok": False, "msg": "Sesión inválida."}), 401
-    return jsonify(serialize_rows([row])[0]), 200
+    return jsonify(prof), 200
 
 @app.get("/api/session/basic")
 @login_required
@@ -240,6 +898,11 @@ def api_session_basic():
 @role_required("SOLICITANTE")
 def api_mis_tickets():
     estado = (request.args.get("estado") or "").upper()
+    try:
+        cursor, limit, q = _list_args()
+    except ValueError:
+        return jsonify({"ok": False, "msg": "cursor inválido"}), 400
+
     cur = conexion.connection.cursor()
     try:
         base = """
@@ -249,22 +912,9 @@ def api_mis_tickets():
               t.estado,
               t.creado_en,
               t.solicitante_nombre,
-              (
-                SELECT u.username
-                FROM ticket_tecnicos tt
-                JOIN users u ON u.id = tt.user_id
-                WHERE tt.ticket_id = t.id
-                ORDER BY u.username ASC
-                LIMIT 1
-              ) AS tecnico,
-              (
-                SELECT GROUP_CONCAT(u2.username ORDER BY u2.username SEPARATOR ', ')
-                FROM ticket_tecnicos tt2
-                JOIN users u2 ON u2.id = tt2.user_id
-                WHERE tt2.ticket_id = t.id
-              ) AS tecnicos,
-              (SELECT 1 FROM encuestas e WHERE e.ticket_id = t.id LIMIT 1) AS encuestada
+              a.nombre AS area
             FROM tickets t
+            LEFT JOIN areas a ON a.id = t.area_id
             WHERE t.usuario_id = %s
         """
         params = [session["user_id"]]
@@ -277,13 +927,19 @@ def api_mis_tickets():
         else:
             base += " AND t.estado IN ('PENDIENTE','EN_CURSO')"
 
-        base += " ORDER BY t.creado_en DESC LIMIT 200"
+        extra, extra_params = _list_filters_sql(cursor, q)
+        base += extra + " ORDER BY t.creado_en DESC, t.id DESC LIMIT %s"
+        params += extra_params + [limit + 1]
         cur.execute(base, tuple(params))
-        rows = cur.fetchall()
+        rows, next_cursor = _paginate(cur.fetchall(), limit)
+        _merge_tecnicos(cur, rows, key="tecnicos", principal="tecnico", encuestas=True)
     finally:
         cur.close()
 
-    return jsonify(serialize_rows(rows)), 200
+    resp = app.json.stream(rows)
+    if next_cursor:
+        resp.headers["X-Next-Cursor"] = next_cursor
+    return resp, 200
 
 @app.get("/api/tickets/total/limit")
 @login_required
@@ -292,6 +948,70 @@ def api_tickets_total_limit():
     cnt = _total_tickets_count(session["user_id"])
     return jsonify({"ok": True, "limit": MAX_TOTAL_TICKETS, "count": cnt}), 200
 
+@app.get("/api/solicitante/overview")
+@login_required
+@role_required("SOLICITANTE")
+def api_solicitante_overview():
+    """
+    Todo lo que piden la página de tickets y el formulario en una respuesta:
+    abiertos, finalizados (los LIST_MAX_LIMIT más recientes), encuestas
+    pendientes y uso de MAX_TOTAL_TICKETS. Una sentencia con una rama por
+    grupo (la de finalizados con su propio LIMIT, sobre
+    ix_tickets_usuario_estado_creado; la encuesta con EXISTS porque
+    encuestas.ticket_id no es único), un COUNT sobre el mismo índice y otra
+    consulta para los técnicos de las filas devueltas.
+    """
+    uid = session["user_id"]
+    abiertos_ph = _in_placeholders(ESTADOS_ABIERTOS)
+    cols = """
+              t.id,
+              t.asunto,
+              t.estado,
+              t.creado_en,
+              t.solicitante_nombre,
+              a.nombre AS area,
+              EXISTS (SELECT 1 FROM encuestas e WHERE e.ticket_id = t.id) AS encuestada
+            FROM tickets t
+            LEFT JOIN areas a ON a.id = t.area_id
+            WHERE t.usuario_id = %s"""
+    cur = conexion.connection.cursor()
+    try:
+        cur.execute(f"""
+            (SELECT 'A' AS grupo, {cols} AND t.estado IN ({abiertos_ph}))
+            UNION ALL
+            (SELECT 'F' AS grupo, {cols} AND t.estado NOT IN ({abiertos_ph})
+             ORDER BY t.creado_en DESC, t.id DESC
+             LIMIT %s)
+            UNION ALL
+            (SELECT 'P' AS grupo, {cols} AND t.estado = 'RESUELTO'
+               AND NOT EXISTS (SELECT 1 FROM encuestas e WHERE e.ticket_id = t.id))
+            ORDER BY creado_en DESC, id DESC
+        """, (uid, *ESTADOS_ABIERTOS, uid, *ESTADOS_ABIERTOS, LIST_MAX_LIMIT, uid))
+        rows = cur.fetchall() or []
+        cur.execute("SELECT COUNT(*) AS c FROM tickets WHERE usuario_id=%s", (uid,))
+        total = int(cur.fetchone()["c"] or 0)
+
+        abiertos, finalizados, pendientes = [], [], []
+        for r in rows:
+            grupo = r.pop("grupo")
+            if grupo == "P":
+                pendientes.append({k: r[k] for k in ("id", "asunto", "estado", "creado_en")})
+                continue
+            r["encuestada"] = r["encuestada"] or None
+            (abiertos if grupo == "A" else finalizados).append(r)
+        _merge_tecnicos(cur, abiertos + finalizados, key="tecnicos", principal="tecnico")
+    finally:
+        cur.close()
+
+    return jsonify({
+        "ok": True,
+        "abiertos": abiertos,
+        "finalizados": finalizados,
+        "encuestas_pendientes": {"count": len(pendientes), "tickets": pendientes},
+        "limit": MAX_TOTAL_TICKETS,
+        "count": total,
+    }), 200
+
 @app.post("/api/tickets")
 @login_required
 @role_required("SOLICITANTE")
@@ -315,76 +1035,90 @@ def api_crear_ticket():
     if not tipo or not desc:
         return jsonify({"ok": False, "msg": "tipo y descripcion son obligatorios."}), 400
 
-    # LÍMITE GLOBAL: máx. 2 tickets en total por usuario (histórico)
-    total_count = _total_tickets_count(session["user_id"])
-    if total_count >= MAX_TOTAL_TICKETS:
-        return jsonify({
-            "ok": False,
-            "msg": f"No puedes crear otra solicitud: alcanzaste el máximo total de {MAX_TOTAL_TICKETS} ticket(s).",
-            "total_count": total_count,
-            "limit": MAX_TOTAL_TICKETS
-        }), 409
-
-    # BLOQUEO POR ENCUESTA PENDIENTE (cambia a True si también aplica a CANCELADO)
-    pendientes = _encuestas_pendientes(session["user_id"], incluir_cancelados=False)
-    if pendientes:
-        return jsonify({
-            "ok": False,
-            "msg": "Tienes una encuesta de satisfacción pendiente. Resuélvela para crear un nuevo ticket.",
-            "pendientes": serialize_rows(pendientes)
-        }), 409
+    # Imágenes a temporales antes de abrir la transacción (máx 3, con tope de tamaño)
+    spooled = _spool_imagenes(files, 3)
 
-    # Inserción del ticket
-    cur = conexion.connection.cursor()
+    uid = session["user_id"]
+    ticket_id = None
+    conn = conexion.connection
+    cur = conn.cursor()
     try:
-        cur.execute("SELECT area_id FROM users WHERE id=%s", (session["user_id"],))
-        row = cur.fetchone()
-        area_id = row["area_id"] if row else None
+        # Límite, encuesta pendiente y área en una sola sentencia con bloqueo
+        pre = _precondiciones_ticket(cur, uid, incluir_cancelados=False)
+        if not pre:
+            conn.rollback()
+            return jsonify({"ok": False, "msg": "Sesión inválida."}), 401
+
+        # LÍMITE GLOBAL: máx. 2 tickets en total por usuario (histórico)
+        total_count = int(pre["total"] or 0)
+        if total_count >= MAX_TOTAL_TICKETS:
+            conn.rollback()
+            return jsonify({
+                "ok": False,
+                "msg": f"No puedes crear otra solicitud: alcanzaste el máximo total de {MAX_TOTAL_TICKETS} ticket(s).",
+                "total_count": total_count,
+                "limit": MAX_TOTAL_TICKETS
+            }), 409
+
+        # BLOQUEO POR ENCUESTA PENDIENTE (cambia a True si también aplica a CANCELADO)
+        if pre["pendientes"]:
+            conn.rollback()
+            return jsonify({
+                "ok": False,
+                "msg": "Tienes una encuesta de satisfacción pendiente. Resuélvela para crear un nuevo ticket.",
+                "pendientes": [int(i) for i in pre["pendientes_ids"].split(",")]
+            }), 409
+
+        area_id = pre["area_id"]
         if not area_id:
+            conn.rollback()
             return jsonify({"ok": False, "msg": "Tu usuario no tiene un área asignada."}), 400
 
         asunto = tipo[:180]
         cur.execute("""
             INSERT INTO tickets (usuario_id, area_id, solicitante_nombre, asunto, descripcion, estado)
             VALUES (%s, %s, %s, %s, %s, 'PENDIENTE')
-        """, (session["user_id"], area_id, nombre, asunto, desc))
-        conexion.connection.commit()
-        ticket_id = cur.lastrowid
-
-        # adjuntos (máx 3 imágenes)
-        saved = 0
-        for f in files[:3]:
-            if not f or not (f.mimetype or "").startswith("image/"):
-                continue
-            safe_name = re.sub(r'[^a-zA-Z0-9._-]+','_', f.filename or "img")
-            subdir = os.path.join(app.root_path, app.config['UPLOAD_FOLDER'], "tickets")
-            os.makedirs(subdir, exist_ok=True)
-            filepath = os.path.join(subdir, f"{ticket_id}_{safe_name}")
-            f.save(filepath)
-            cur.execute("INSERT INTO ticket_attachments (ticket_id, ruta) VALUES (%s, %s)", (ticket_id, filepath))
-            saved += 1
-        if saved:
-            conexion.connection.commit()
+        """, (uid, area_id, nombre, asunto, desc))
+        nuevo_id = cur.lastrowid
+        _rollup_aplicar(cur, {}, _rollup_claves(cur, [nuevo_id]))
+        conn.commit()
+        ticket_id = nuevo_id
+        _ticket_owners.set(ticket_id, uid)
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         cur.close()
+        if ticket_id is None:
+            # Error o salida temprana (límite, encuesta, área): no se usarán
+            _descartar_temporales(spooled)
+
+    _publicar("ticket_created", ticket_id, uid,
+              asunto=asunto, estado="PENDIENTE", creado_en=datetime.now(),
+              solicitante_nombre=nombre, area=(session.get("profile") or {}).get("area_name"))
 
-    return jsonify({"ok": True, "id": ticket_id}), 201
+    # Adjuntos: validación, normalización y registro fuera de la petición
+    for tmp_path, _ in spooled:
+        uploads.submit(tmp_path, _tickets_upload_dir(), _registrar_adjunto(ticket_id))
+
+    return jsonify({"ok": True, "id": ticket_id, "adjuntos_en_proceso": len(spooled)}), 201
 
 @app.get("/api/tipos-solicitud")
 @login_required
 def api_tipos_solicitud():
-    cur = conexion.connection.cursor()
-    try:
-        cur.execute("""
-            SELECT id, nombre, slug, orden
-            FROM tipos_solicitud
-            WHERE activo=1
-            ORDER BY orden ASC, id ASC
-        """)
-        rows = cur.fetchall()
-    finally:
-        cur.close()
-    return jsonify(serialize_rows(rows)), 200
+    def load():
+        cur = conexion.connection.cursor()
+        try:
+            cur.execute("""
+                SELECT id, nombre, slug, orden
+                FROM tipos_solicitud
+                WHERE activo=1
+                ORDER BY orden ASC, id ASC
+            """)
+            return cur.fetchall()
+        finally:
+            cur.close()
+    return _catalog_response("tipos", load)
 
 @app.get("/api/sugerencias")
 @login_required
@@ -394,29 +1128,32 @@ def api_sugerencias():
     if not tipo and not tipo_id:
         return jsonify([]), 200
 
-    cur = conexion.connection.cursor()
-    try:
-        if tipo_id:
-            cur.execute("""
-                SELECT s.id, s.texto, s.orden
-                FROM sugerencias_problema s
-                JOIN tipos_solicitud t ON t.id = s.tipo_id
-                WHERE s.activo=1 AND t.activo=1 AND t.id=%s
-                ORDER BY s.orden ASC, s.id ASC
-            """, (tipo_id,))
-        else:
-            cur.execute("""
-                SELECT s.id, s.texto, s.orden
-                FROM sugerencias_problema s
-                JOIN tipos_solicitud t ON t.id = s.tipo_id
-                WHERE s.activo=1 AND t.activo=1
-                  AND (t.slug=%s OR t.nombre=%s)
-                ORDER BY s.orden ASC, s.id ASC
-            """, (tipo, tipo))
-        rows = cur.fetchall()
-    finally:
-        cur.close()
-    return jsonify(serialize_rows(rows)), 200
+    def load():
+        cur = conexion.connection.cursor()
+        try:
+            if tipo_id:
+                cur.execute("""
+                    SELECT s.id, s.texto, s.orden
+                    FROM sugerencias_problema s
+                    JOIN tipos_solicitud t ON t.id = s.tipo_id
+                    WHERE s.activo=1 AND t.activo=1 AND t.id=%s
+                    ORDER BY s.orden ASC, s.id ASC
+                """, (tipo_id,))
+            else:
+                cur.execute("""
+                    SELECT s.id, s.texto, s.orden
+                    FROM sugerencias_problema s
+                    JOIN tipos_solicitud t ON t.id = s.tipo_id
+                    WHERE s.activo=1 AND t.activo=1
+                      AND (t.slug=%s OR t.nombre=%s)
+                    ORDER BY s.orden ASC, s.id ASC
+                """, (tipo, tipo))
+            return cur.fetchall()
+        finally:
+            cur.close()
+
+    key = f"sugerencias:id:{tipo_id}" if tipo_id else f"sugerencias:tipo:{tipo}"
+    return _catalog_response(key, load)
 
 # ====================== Técnico (vistas) ======================
 @app.route("/tecnico", endpoint="tecnico_disponibles")
@@ -437,21 +1174,84 @@ def tecnico_asignados():
 def tecnico_historial():
     return render_template("tecnico/historial.html", user=session.get("username"))
 
-# Servir evidencias con login
+# Servir evidencias con login (?size=thumb|medium sirve un derivado WebP cacheado en disco)
 @app.get("/uploads/tickets/<path:fname>")
 @login_required
 def serve_ticket_upload(fname):
-    base_dir = os.path.join(app.root_path, app.config['UPLOAD_FOLDER'], "tickets")
-    return send_from_directory(base_dir, fname)
+    base_dir = _tickets_upload_dir()
+    size = (request.args.get("size") or "").lower()
+    path = safe_join(base_dir, fname)
+    if not path or not os.path.isfile(path):
+        abort(404)
+    # Sin soporte WebP (o sin Pillow) se sirve el original
+    en_proceso = False
+    if size in DERIVATIVE_SIZES and "image/webp" in (request.headers.get("Accept") or ""):
+        dest = derivative_path(base_dir, os.path.basename(path), size)
+        if os.path.isfile(dest):
+            path = dest
+        else:
+            # Adjunto anterior a los derivados: se genera en el pool de uploads
+            # y mientras tanto va el original, sin bloquear la petición
+            en_proceso = uploads.queue_derivative(path, dest, DERIVATIVE_SIZES[size])
+    resp = _send_upload(path)
+    if size:
+        resp.vary.add("Accept")
+    if en_proceso:
+        # Que el navegador vuelva a pedirlo: la próxima vez ya habrá derivado
+        resp.cache_control.immutable = False
+        resp.cache_control.max_age = 0
+        resp.cache_control.no_cache = True
+    return resp
 
 # ====================== Técnico (APIs) ======================
-def _group_concat_asignados_sql():
-    return """(
-        SELECT GROUP_CONCAT(u.username ORDER BY u.username SEPARATOR ', ')
-        FROM ticket_tecnicos tt
-        JOIN users u ON u.id = tt.user_id
-        WHERE tt.ticket_id = t.id
-    ) AS asignados"""
+TECNICO_SCOPES = ("disponibles", "asignados", "historial")
+
+def _tecnico_scope_query(scope: str, uid: int, cursor=None, limit: int = LIST_DEFAULT_LIMIT, q: str = ""):
+    """
+    SQL + params de una página del scope del técnico (disponibles por defecto).
+    Pide limit+1 filas para saber si hay página siguiente (ver _paginate).
+    """
+    if scope in ("asignados", "historial"):
+        estados = "('PENDIENTE','EN_CURSO')" if scope == "asignados" else "('RESUELTO','CANCELADO')"
+        join = "JOIN ticket_tecnicos mine ON mine.ticket_id = t.id AND mine.user_id = %s"
+        where = f"t.estado IN {estados}"
+        params = [uid]
+    else:
+        join = ""
+        where = """t.estado='PENDIENTE'
+          AND NOT EXISTS (SELECT 1 FROM ticket_tecnicos x WHERE x.ticket_id=t.id)"""
+        params = []
+
+    extra, extra_params = _list_filters_sql(cursor, q)
+    sql = f"""
+        SELECT t.id, t.asunto, t.estado, t.creado_en,
+               t.solicitante_nombre, a.nombre AS area
+        FROM tickets t
+        LEFT JOIN areas a ON a.id = t.area_id
+        {join}
+        WHERE {where}{extra}
+        ORDER BY t.creado_en DESC, t.id DESC
+        LIMIT %s
+    """
+    return sql, (*params, *extra_params, limit + 1)
+
+def _tecnico_scope_counts(cur, uid: int) -> dict:
+    """Contadores de los tres scopes en una sola consulta agregada."""
+    cur.execute("""
+        SELECT
+          (SELECT COUNT(*)
+             FROM tickets d
+            WHERE d.estado='PENDIENTE'
+              AND NOT EXISTS (SELECT 1 FROM ticket_tecnicos x WHERE x.ticket_id=d.id)
+          ) AS disponibles,
+          COALESCE(SUM(t.estado IN ('PENDIENTE','EN_CURSO')), 0) AS asignados,
+          COALESCE(SUM(t.estado IN ('RESUELTO','CANCELADO')), 0) AS historial
+        FROM ticket_tecnicos mine
+        JOIN tickets t ON t.id = mine.ticket_id
+        WHERE mine.user_id = %s
+    """, (uid,))
+    row = cur.fetchone() or {}
+    return {s: int(row.get(s) or 0) for s in TECNICO_SCOPES}
 
 @app.get("/api/tecnico/tickets")
 @login_required
@@ -459,108 +1259,153 @@ def _group_concat_asignados_sql():
 def api_tecnico_tickets():
     scope = (request.args.get("scope") or "disponibles").lower()
     uid = session["user_id"]
+    try:
+        cursor, limit, q = _list_args()
+    except ValueError:
+        return jsonify({"ok": False, "msg": "cursor inválido"}), 400
 
     cur = conexion.connection.cursor()
     try:
-        if scope == "asignados":
-            sql = f"""
-                SELECT t.id, t.asunto, t.descripcion, t.estado, t.creado_en,
-                       t.solicitante_nombre, a.nombre AS area, {_group_concat_asignados_sql()}
-                FROM tickets t
-                LEFT JOIN areas a ON a.id = t.area_id
-                JOIN ticket_tecnicos mine
-                  ON mine.ticket_id = t.id AND mine.user_id = %s
-                WHERE t.estado IN ('PENDIENTE','EN_CURSO')
-                ORDER BY t.creado_en DESC
-                LIMIT 300
-            """
-            params = (uid,)
-        elif scope == "historial":
-            sql = f"""
-                SELECT t.id, t.asunto, t.descripcion, t.estado, t.creado_en,
-                       t.solicitante_nombre, a.nombre AS area, {_group_concat_asignados_sql()}
-                FROM tickets t
-                LEFT JOIN areas a ON a.id = t.area_id
-                JOIN ticket_tecnicos mine
-                  ON mine.ticket_id = t.id AND mine.user_id = %s
-                WHERE t.estado IN ('RESUELTO','CANCELADO')
-                ORDER BY t.creado_en DESC
-                LIMIT 300
-            """
-            params = (uid,)
-        else:
-            sql = f"""
-                SELECT t.id, t.asunto, t.descripcion, t.estado, t.creado_en,
-                       t.solicitante_nombre, a.nombre AS area, {_group_concat_asignados_sql()}
-                FROM tickets t
-                LEFT JOIN areas a ON a.id = t.area_id
-                WHERE t.estado='PENDIENTE'
-                  AND NOT EXISTS (SELECT 1 FROM ticket_tecnicos x WHERE x.ticket_id=t.id)
-                ORDER BY t.creado_en DESC
-                LIMIT 300
-            """
-            params = ()
+        sql, params = _tecnico_scope_query(scope, uid, cursor, limit, q)
         cur.execute(sql, params)
-        rows = cur.fetchall()
+        rows, next_cursor = _paginate(cur.fetchall(), limit)
+        _merge_tecnicos(cur, rows)
     finally:
         cur.close()
 
-    return jsonify(serialize_rows(rows)), 200
+    resp = app.json.stream(rows)
+    if next_cursor:
+        resp.headers["X-Next-Cursor"] = next_cursor
+    return resp, 200
 
-@app.get("/api/tecnicos")
+@app.get("/api/tecnico/dashboard")
 @login_required
 @role_required("TECNICO")
-def api_tecnicos_activos():
+def api_tecnico_dashboard():
+    """Contadores de los tres scopes + primera página del scope activo en una sola llamada."""
+    scope = (request.args.get("scope") or "disponibles").lower()
+    if scope not in TECNICO_SCOPES:
+        scope = "disponibles"
+    uid = session["user_id"]
+    try:
+        cursor, limit, q = _list_args()
+    except ValueError:
+        return jsonify({"ok": False, "msg": "cursor inválido"}), 400
+
     cur = conexion.connection.cursor()
     try:
-        cur.execute("""
-            SELECT u.id, u.username
-            FROM users u
-            JOIN roles r ON r.id = u.role_id
-            WHERE r.nombre = 'TECNICO' AND u.is_active = 1
-            ORDER BY u.username ASC
-        """)
-        rows = cur.fetchall()
+        counts = _tecnico_scope_counts(cur, uid)
+        sql, params = _tecnico_scope_query(scope, uid, cursor, limit, q)
+        cur.execute(sql, params)
+        rows, next_cursor = _paginate(cur.fetchall(), limit)
+        _merge_tecnicos(cur, rows)
     finally:
         cur.close()
-    return jsonify(serialize_rows(rows)), 200
 
-@app.get("/api/tecnico/tickets/<int:tid>")
+    return jsonify({
+        "ok": True,
+        "scope": scope,
+        "counts": counts,
+        "tickets": rows,
+        "next_cursor": next_cursor
+    }), 200
+
+@app.get("/api/tecnicos")
 @login_required
 @role_required("TECNICO")
-def api_tecnico_ticket_detalle(tid):
+def api_tecnicos_activos():
+    def load():
+        cur = conexion.connection.cursor()
+        try:
+            cur.execute("""
+                SELECT u.id, u.username
+                FROM users u
+                JOIN roles r ON r.id = u.role_id
+                WHERE r.nombre = 'TECNICO' AND u.is_active = 1
+                ORDER BY u.username ASC
+            """)
+            return cur.fetchall()
+        finally:
+            cur.close()
+    return _catalog_response("tecnicos", load)
+
+# ---- Detalle de ticket (técnico y solicitante) ----
+# Primero una cabecera que trae tickets.version; si el cliente ya tiene esa
+# versión (If-None-Match) se responde 304 sin consultar notas, técnicos ni
+# adjuntos. Con ?notes_since=<id de nota> solo se devuelven las notas nuevas.
+def _detalle_cabecera(cur, tid: int):
+    cur.execute("""
+        SELECT t.id, t.usuario_id, t.asunto, t.descripcion, t.estado, t.creado_en,
+               t.cerrado_en, t.solicitante_nombre, t.version, a.nombre AS area,
+               (SELECT MIN(e.id) FROM encuestas e WHERE e.ticket_id = t.id) AS encuesta_id
+        FROM tickets t
+        LEFT JOIN areas a ON a.id = t.area_id
+        WHERE t.id=%s
+        LIMIT 1
+    """, (tid,))
+    return cur.fetchone()
+
+def _detalle_notas(cur, tid: int, since=None):
+    sql = """
+        SELECT n.id, n.texto, n.creado_en, u.username AS autor
+        FROM ticket_notas n
+        JOIN users u ON u.id = n.usuario_id
+        WHERE n.ticket_id=%s
+    """
+    params = [tid]
+    if since is not None:
+        sql += " AND n.id > %s"
+        params.append(since)
+    cur.execute(sql + " ORDER BY n.creado_en DESC, n.id DESC", tuple(params))
+    return cur.fetchall() or []
+
+def _detalle_respuesta(body, etag):
+    """JSON del detalle (o 304 si body es None) con la versión del ticket como ETag."""
+    resp = jsonify(body) if body is not None else app.response_class(status=304)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+def _ticket_detalle(tid: int, solicitante: bool = False):
+    """
+    Detalle compartido por ambos roles: {"ok", "ticket", "notas", "asignados",
+    "adjuntos"}, o {"ok", "version", "notas"} con ?notes_since=. El
+    solicitante solo puede ver sus propios tickets y sin lo interno: las
+    notas son de trabajo entre técnicos, así que no recibe `notas` ni
+    `version` (la ETag sigue valiendo) e ignora ?notes_since=.
+    """
+    raw_since = "" if solicitante else (request.args.get("notes_since") or "").strip()
+    try:
+        since = int(raw_since) if raw_since else None
+    except ValueError:
+        return jsonify({"ok": False, "msg": "notes_since inválido"}), 400
+
     cur = conexion.connection.cursor()
     try:
-        cur.execute(f"""
-            SELECT t.id, t.asunto, t.descripcion, t.estado, t.creado_en,
-                   t.solicitante_nombre, a.nombre AS area, {_group_concat_asignados_sql()}
-            FROM tickets t
-            LEFT JOIN areas a ON a.id = t.area_id
-            WHERE t.id=%s
-            LIMIT 1
-        """, (tid,))
-        head = cur.fetchone()
+        head = _detalle_cabecera(cur, tid)
+        if not head:
+            return jsonify({"ok": False, "msg": "Ticket no encontrado"}), 404
+        if solicitante and head["usuario_id"] != session["user_id"]:
+            return jsonify({"ok": False, "msg": "No autorizado"}), 403
 
-        try:
-            cur.execute("""
-                SELECT n.id, n.texto, n.creado_en, u.username AS autor
-                FROM ticket_notas n
-                JOIN users u ON u.id = n.usuario_id
-                WHERE n.ticket_id=%s
-                ORDER BY n.creado_en DESC
-            """, (tid,))
-            notas = cur.fetchall()
-        except Exception:
-            notas = []
+        etag = f"{tid}.{head['version']}"
+        if request.if_none_match.contains_weak(etag):
+            return _detalle_respuesta(None, etag)
+
+        notas = None if solicitante else _detalle_notas(cur, tid, since)
+        if since is not None:
+            return _detalle_respuesta({
+                "ok": True, "version": head["version"], "notas": notas
+            }, etag)
 
         cur.execute("""
-            SELECT u.id, u.username
+            SELECT u.id, u.username, tt.creado_en
             FROM ticket_tecnicos tt
             JOIN users u ON u.id = tt.user_id
             WHERE tt.ticket_id=%s
             ORDER BY u.username ASC
         """, (tid,))
-        asignados = cur.fetchall()
+        asignados = cur.fetchall() or []
 
         cur.execute("""
             SELECT id, ruta
@@ -569,53 +1414,126 @@ def api_tecnico_ticket_detalle(tid):
             ORDER BY id ASC
         """, (tid,))
         raw_adj = cur.fetchall() or []
-
-        adjuntos = []
-        for a in raw_adj:
-            fname = os.path.basename(a.get("ruta") or "")
-            if fname:
-                adjuntos.append({
-                    "id": a["id"],
-                    "name": fname,
-                    "url": url_for("serve_ticket_upload", fname=fname)
-                })
-
     finally:
         cur.close()
 
-    if not head:
-        return jsonify({"ok": False, "msg": "Ticket no encontrado"}), 404
-
-    return jsonify({
+    adjuntos = []
+    for a in raw_adj:
+        fname = os.path.basename(a.get("ruta") or "")
+        if fname:
+            adjuntos.append(_adjunto_json(a["id"], fname))
+
+    fechas = [f for f in (a.pop("creado_en") for a in asignados) if f]
+    asignado_en = min(fechas) if fechas else None
+    creado_en, cerrado_en = head["creado_en"], head["cerrado_en"]
+    head["asignados"] = ", ".join(x["username"] for x in asignados) or None
+    head["tecnico_principal"] = asignados[0]["username"] if asignados else None
+    head["asignado_en"] = asignado_en
+    head["t_servicio"] = _fmt_hms((cerrado_en - creado_en) if (cerrado_en and creado_en) else None, None)
+    head["t_atencion"] = _fmt_hms((cerrado_en - asignado_en) if (cerrado_en and asignado_en) else None, None)
+    head["encuestada"] = 1 if head.pop("encuesta_id") else None
+
+    if solicitante:
+        for k in ("version", "usuario_id"):
+            head.pop(k)
+        return _detalle_respuesta({
+            "ok": True,
+            "ticket": head,
+            "asignados": asignados,
+            "adjuntos": adjuntos
+        }, etag)
+    return _detalle_respuesta({
         "ok": True,
-        "ticket": serialize_rows([head])[0],
-        "notas": serialize_rows(notas),
-        "asignados": serialize_rows(asignados),
+        "ticket": head,
+        "notas": notas,
+        "asignados": asignados,
         "adjuntos": adjuntos
-    }), 200
+    }, etag)
+
+@app.get("/api/tecnico/tickets/<int:tid>")
+@login_required
+@role_required("TECNICO")
+def api_tecnico_ticket_detalle(tid):
+    return _ticket_detalle(tid)
 
 @app.post("/api/tecnico/tickets/<int:tid>/tomar")
 @login_required
 @role_required("TECNICO")
 def api_tecnico_tomar_ticket(tid):
+    """
+    Toma el ticket. Con ?modo=cas (compare-and-swap) solo gana quien lo
+    reclama mientras sigue PENDIENTE y sin dueño; los demás reciben 409 con el
+    dueño actual. Sin modo se mantiene el comportamiento de co-asignación.
+    """
     uid = session["user_id"]
+    if (request.args.get("modo") or "").lower() == "cas":
+        return _tomar_ticket_cas(tid, uid)
+
     cur = conexion.connection.cursor()
     try:
+        antes = _rollup_claves(cur, [tid], lock=True)
+        disponible = tid in _disponibles(cur, [tid])
         cur.execute("""
             INSERT IGNORE INTO ticket_tecnicos (ticket_id, user_id)
             VALUES (%s, %s)
         """, (tid, uid))
+        if cur.rowcount == 1:
+            _rollup_tecnicos(cur, antes, [(tid, uid)])
         cur.execute("""
             UPDATE tickets
                SET estado = IF(estado='PENDIENTE', 'EN_CURSO', estado),
-                   asignado_a = COALESCE(asignado_a, %s)
+                   asignado_a = COALESCE(asignado_a, %s),
+                   version = version + 1
              WHERE id = %s
         """, (uid, tid))
+        _rollup_aplicar(cur, antes, _rollup_claves(cur, [tid]))
         conexion.connection.commit()
+        owner = _ticket_owner(cur, tid)
     finally:
         cur.close()
+    _publicar("ticket_taken", tid, owner, tecnico_id=uid, tecnico=session.get("username"),
+              disponible=disponible)
     return jsonify({"ok": True}), 200
 
+def _tomar_ticket_cas(tid: int, uid: int):
+    """
+    Un solo viaje a la BD: el procedimiento tomar_ticket_cas (migrations/0007)
+    hace el UPDATE condicional, el alta en ticket_tecnicos, los deltas de los
+    rollups y el COMMIT, y devuelve el solicitante para el evento.
+    """
+    conn = conexion.connection
+    cur = conn.cursor()
+    try:
+        cur.execute("CALL tomar_ticket_cas(%s, %s)", (tid, uid))
+        res = cur.fetchone()
+        while cur.nextset():  # estado final del CALL
+            pass
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    if not res:
+        return jsonify({"ok": False, "msg": "Ticket no encontrado"}), 404
+    if not res["ok"]:
+        if res["asignado_a"] is not None:
+            msg = f"El ticket ya fue tomado por {res['username'] or 'otro técnico'}."
+        else:
+            msg = f"El ticket ya no está disponible (estado {res['estado']})."
+        return jsonify({
+            "ok": False,
+            "msg": msg,
+            "estado": res["estado"],
+            "asignado_a": res["asignado_a"],
+            "asignado_username": res["username"]
+        }), 409
+
+    _ticket_owners.set(tid, res["usuario_id"])
+    _publicar("ticket_taken", tid, res["usuario_id"], tecnico_id=uid, tecnico=session.get("username"),
+              disponible=bool(res["disponible"]))
+    return jsonify({"ok": True, "asignado_a": uid}), 200
+
 @app.post("/api/tecnico/tickets/<int:tid>/asignar")
 @login_required
 @role_required("TECNICO")
@@ -633,16 +1551,29 @@ def api_tecnico_asignar_otro(tid):
         if not cur.fetchone():
             return jsonify({"ok": False, "msg": "No autorizado"}), 403
 
-        for t_id in otros:
-            cur.execute("""
+        existentes = _pares_existentes(cur, [tid], otros)
+        nuevos = [(tid, t_id) for t_id in dict.fromkeys(otros) if (tid, t_id) not in existentes]
+        if nuevos:
+            cur.executemany("""
                 INSERT IGNORE INTO ticket_tecnicos (ticket_id, user_id)
                 VALUES (%s, %s)
-            """, (tid, t_id))
+            """, nuevos)
+            _rollup_tecnicos(cur, _rollup_claves(cur, [tid]), nuevos)
+            _tocar_tickets(cur, [tid])
         conexion.connection.commit()
     finally:
         cur.close()
+    _olvidar_resumen(tid)
     return jsonify({"ok": True}), 200
 
+def _validar_estado(estado: str, nota: str):
+    """Mensaje de error para un cambio de estado de técnico, o None si es válido."""
+    if estado not in ("EN_CURSO", "RESUELTO", "CANCELADO"):
+        return "Estado inválido"
+    if estado == "RESUELTO" and not nota:
+        return "Observaciones obligatorias para resolver."
+    return None
+
 @app.patch("/api/tecnico/tickets/<int:tid>/estado")
 @login_required
 @role_required("TECNICO")
@@ -652,10 +1583,9 @@ def api_tecnico_cambiar_estado(tid):
     estado = (payload.get("estado") or "").upper()
     nota   = (payload.get("nota") or "").strip()
 
-    if estado not in ("EN_CURSO", "RESUELTO", "CANCELADO"):
-        return jsonify({"ok": False, "msg": "Estado inválido"}), 400
-    if estado == "RESUELTO" and not nota:
-        return jsonify({"ok": False, "msg": "Observaciones obligatorias para resolver."}), 400
+    error = _validar_estado(estado, nota)
+    if error:
+        return jsonify({"ok": False, "msg": error}), 400
 
     cur = conexion.connection.cursor()
     try:
@@ -663,14 +1593,16 @@ def api_tecnico_cambiar_estado(tid):
         if not cur.fetchone():
             return jsonify({"ok": False, "msg": "No autorizado"}), 403
 
+        antes = _rollup_claves(cur, [tid], lock=True)
         if estado in ("RESUELTO","CANCELADO"):
             cur.execute("""
                 UPDATE tickets
-                   SET estado=%s, cerrado_en=NOW()
+                   SET estado=%s, cerrado_en=NOW(), version = version + 1
                  WHERE id=%s
             """, (estado, tid))
         else:
-            cur.execute("UPDATE tickets SET estado=%s WHERE id=%s", (estado, tid))
+            cur.execute("UPDATE tickets SET estado=%s, version = version + 1 WHERE id=%s", (estado, tid))
+        _rollup_aplicar(cur, antes, _rollup_claves(cur, [tid]))
 
         if nota:
             cur.execute("""
@@ -679,9 +1611,14 @@ def api_tecnico_cambiar_estado(tid):
             """, (tid, uid, nota))
 
         conexion.connection.commit()
+        owner = _ticket_owner(cur, tid)
     finally:
         cur.close()
 
+    _publicar("state_changed", tid, owner, estado=estado, tecnico_id=uid)
+    if nota:
+        _publicar("note_added", tid, owner, tecnico_id=session["user_id"],
+                  autor=session.get("username"), creado_en=datetime.now())
     return jsonify({"ok": True}), 200
 
 @app.post("/api/tecnico/tickets/<int:tid>/nota")
@@ -698,11 +1635,157 @@ def api_tecnico_agregar_nota(tid):
             INSERT INTO ticket_notas (ticket_id, usuario_id, texto)
             VALUES (%s, %s, %s)
         """, (tid, session["user_id"], texto))
+        _tocar_tickets(cur, [tid])
         conexion.connection.commit()
+        owner = _ticket_owner(cur, tid)
     finally:
         cur.close()
+    _publicar("note_added", tid, owner, tecnico_id=session["user_id"],
+              autor=session.get("username"), creado_en=datetime.now())
     return jsonify({"ok": True}), 201
 
+# ---- Operaciones masivas ----
+BULK_ACCIONES = ("tomar", "asignar", "estado", "nota")
+
+@app.post("/api/tecnico/tickets/bulk")
+@login_required
+@role_required("TECNICO")
+def api_tecnico_bulk():
+    """
+    Aplica una misma acción a varios tickets en una sola transacción:
+      {"accion": "tomar",   "ticket_ids": [...]}
+      {"accion": "asignar", "ticket_ids": [...], "usuario_ids": [...]}
+      {"accion": "estado",  "ticket_ids": [...], "estado": "RESUELTO", "nota": "..."}
+      {"accion": "nota",    "ticket_ids": [...], "texto": "..."}
+    Las reglas son las de las rutas por ticket; los tickets que no las cumplen
+    se informan en `resultados` (en el orden recibido) sin abortar el resto.
+    """
+    uid = session["user_id"]
+    data = request.get_json(force=True) or {}
+    accion = (data.get("accion") or "").lower()
+    if accion not in BULK_ACCIONES:
+        return jsonify({"ok": False, "msg": "Acción inválida"}), 400
+
+    ids_raw = data.get("ticket_ids") or []
+    ids = to_int_list(ids_raw) if isinstance(ids_raw, list) else None
+    if not ids:
+        return jsonify({"ok": False, "msg": "ticket_ids inválidos"}), 400
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > BULK_MAX_TICKETS:
+        return jsonify({"ok": False, "msg": f"Máximo {BULK_MAX_TICKETS} tickets por operación."}), 400
+
+    estado = (data.get("estado") or "").upper()
+    nota = (data.get("nota") or "").strip()
+    texto = (data.get("texto") or "").strip()
+    otros = []
+    if accion == "asignar":
+        otros_raw = data.get("usuario_ids") or []
+        otros = to_int_list(otros_raw) if isinstance(otros_raw, list) else None
+        if otros is None:
+            return jsonify({"ok": False, "msg": "usuario_ids inválidos"}), 400
+    elif accion == "estado":
+        error = _validar_estado(estado, nota)
+        if error:
+            return jsonify({"ok": False, "msg": error}), 400
+    elif accion == "nota" and not texto:
+        return jsonify({"ok": False, "msg": "Texto requerido"}), 400
+
+    conn = conexion.connection
+    cur = conn.cursor()
+    try:
+        # Un solo SELECT bloqueante trae estado, dueño y si el técnico ya está asignado
+        cur.execute(f"""
+            SELECT t.id, t.estado, t.usuario_id, tt.user_id IS NOT NULL AS mio
+            FROM tickets t
+            LEFT JOIN ticket_tecnicos tt ON tt.ticket_id = t.id AND tt.user_id = %s
+            WHERE t.id IN ({_in_placeholders(ids)})
+            FOR UPDATE
+        """, (uid, *ids))
+        tickets = {r["id"]: r for r in cur.fetchall() or []}
+
+        resultados, aplicar = [], []
+        for tid in ids:
+            t = tickets.get(tid)
+            if not t:
+                resultados.append({"id": tid, "ok": False, "msg": "Ticket no encontrado"})
+            elif accion in ("asignar", "estado") and not t["mio"]:
+                resultados.append({"id": tid, "ok": False, "msg": "No autorizado"})
+            else:
+                resultados.append({"id": tid, "ok": True})
+                aplicar.append(tid)
+
+        if aplicar:
+            marcas = _in_placeholders(aplicar)
+            antes = _rollup_claves(cur, aplicar) if accion != "nota" else {}  # ya bloqueadas arriba
+            if accion == "tomar":
+                disponibles = _disponibles(cur, aplicar)
+                nuevos = [(tid, uid) for tid in aplicar if not tickets[tid]["mio"]]
+                if nuevos:
+                    cur.executemany("""
+                        INSERT IGNORE INTO ticket_tecnicos (ticket_id, user_id)
+                        VALUES (%s, %s)
+                    """, nuevos)
+                    _rollup_tecnicos(cur, antes, nuevos)
+                cur.execute(f"""
+                    UPDATE tickets
+                       SET estado = IF(estado='PENDIENTE', 'EN_CURSO', estado),
+                           asignado_a = COALESCE(asignado_a, %s),
+                           version = version + 1
+                     WHERE id IN ({marcas})
+                """, (uid, *aplicar))
+                _rollup_aplicar(cur, antes, _rollup_claves(cur, aplicar))
+            elif accion == "asignar" and otros:
+                existentes = _pares_existentes(cur, aplicar, otros)
+                nuevos = [(tid, t_id) for tid in aplicar for t_id in dict.fromkeys(otros)
+                          if (tid, t_id) not in existentes]
+                if nuevos:
+                    cur.executemany("""
+                        INSERT IGNORE INTO ticket_tecnicos (ticket_id, user_id)
+                        VALUES (%s, %s)
+                    """, nuevos)
+                    _rollup_tecnicos(cur, antes, nuevos)
+                    _tocar_tickets(cur, list(dict.fromkeys(tid for tid, _ in nuevos)))
+            elif accion == "estado":
+                cierre = ", cerrado_en=NOW()" if estado in ("RESUELTO", "CANCELADO") else ""
+                cur.execute(f"""
+                    UPDATE tickets SET estado=%s{cierre}, version = version + 1
+                    WHERE id IN ({marcas})
+                """, (estado, *aplicar))
+                _rollup_aplicar(cur, antes, _rollup_claves(cur, aplicar))
+            texto_nota = nota if accion == "estado" else texto if accion == "nota" else ""
+            if texto_nota:
+                cur.executemany("""
+                    INSERT INTO ticket_notas (ticket_id, usuario_id, texto)
+                    VALUES (%s, %s, %s)
+                """, [(tid, uid, texto_nota) for tid in aplicar])
+                if accion == "nota":
+                    _tocar_tickets(cur, aplicar)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    ahora = datetime.now()
+    for tid in aplicar:
+        _olvidar_resumen(tid)
+        owner = tickets[tid]["usuario_id"]
+        if accion == "tomar":
+            _publicar("ticket_taken", tid, owner, tecnico_id=uid, tecnico=session.get("username"),
+                      disponible=tid in disponibles)
+        elif accion == "estado":
+            _publicar("state_changed", tid, owner, estado=estado, tecnico_id=uid)
+        if (accion == "estado" and nota) or accion == "nota":
+            _publicar("note_added", tid, owner, tecnico_id=uid,
+                      autor=session.get("username"), creado_en=ahora)
+
+    return jsonify({
+        "ok": True,
+        "aplicados": len(aplicar),
+        "resultados": resultados
+    }), 200
+
 @app.post("/api/tecnico/tickets/<int:tid>/evidencia")
 @login_required
 @role_required("TECNICO")
@@ -711,40 +1794,80 @@ def api_tecnico_subir_evidencia(tid):
     cur = conexion.connection.cursor()
     try:
         cur.execute("SELECT 1 FROM ticket_tecnicos WHERE ticket_id=%s AND user_id=%s", (tid, uid))
-        if not cur.fetchone():
-            return jsonify({"ok": False, "msg": "No autorizado"}), 403
+        autorizado = cur.fetchone()
+    finally:
+        cur.close()
+    if not autorizado:
+        return jsonify({"ok": False, "msg": "No autorizado"}), 403
 
-        files = request.files.getlist("imagenes")
-        if not files:
-            return jsonify({"ok": False, "msg": "No se enviaron imágenes."}), 400
+    files = request.files.getlist("imagenes")
+    if not files:
+        return jsonify({"ok": False, "msg": "No se enviaron imágenes."}), 400
+
+    spooled = _spool_imagenes(files, 3)
+    if not spooled:
+        return jsonify({"ok": False, "msg": "Archivos inválidos."}), 400
+
+    # Validación, normalización y registro aquí mismo (el cliente recibe las
+    # URLs finales, nombradas por contenido); los derivados van al pool.
+    urls, rechazados = [], []
+    for tmp_path, nombre in spooled:
+        path = uploads.process(tmp_path, _tickets_upload_dir(), _registrar_adjunto(tid))
+        if path:
+            urls.append(url_for("serve_ticket_upload", fname=os.path.basename(path)))
+        else:
+            rechazados.append(nombre)
+    if not urls:
+        return jsonify({"ok": False, "msg": "Archivos inválidos.", "rechazados": rechazados}), 400
 
-        saved_urls = []
-        subdir = os.path.join(app.root_path, app.config['UPLOAD_FOLDER'], "tickets")
-        os.makedirs(subdir, exist_ok=True)
+    return jsonify({"ok": True, "urls": urls, "count": len(urls), "rechazados": rechazados}), 201
 
-        now = datetime.now().strftime("%Y%m%d%H%M%S")
-        count = 0
-        for f in files:
-            if count >= 3: break
-            if not f or not (f.mimetype or "").startswith("image/"):
-                continue
-            name, ext = os.path.splitext(f.filename or "img")
-            safe_base = re.sub(r'[^a-zA-Z0-9._-]+','_', name)[:40]
-            fname = f"{tid}_{now}_{count}{ext.lower()}"
-            path = os.path.join(subdir, fname)
-            f.save(path)
-            cur.execute("INSERT INTO ticket_attachments (ticket_id, ruta) VALUES (%s, %s)", (tid, path))
-            saved_urls.append(url_for("serve_ticket_upload", fname=fname))
-            count += 1
-
-        if count == 0:
-            return jsonify({"ok": False, "msg": "Archivos inválidos."}), 400
+# ====================== Stream de tickets (SSE) ======================
+@app.get("/api/stream/tickets")
+@login_required
+def api_stream_tickets():
+    """
+    Server-Sent Events: ticket_created, ticket_taken, state_changed, note_added.
+    Técnicos reciben todo; solicitantes solo los eventos de sus tickets.
+    No usa BD: el stream no retiene conexiones del pool, pero sí un hilo del
+    worker (un greenlet bajo gevent); pasado SSE_MAX_STREAMS responde 503 y
+    el cliente reintenta más tarde. Ver la configuración SSE_* arriba.
+    """
+    uid, role = session["user_id"], session.get("role")
+    if role == "TECNICO":
+        accepts = lambda ev: True
+    elif role == "SOLICITANTE":
+        accepts = lambda ev: ev["owner"] == uid
+    else:
+        return jsonify({"ok": False, "msg": "No autorizado"}), 403
 
-        conexion.connection.commit()
-        return jsonify({"ok": True, "urls": saved_urls, "count": count}), 201
+    last_id = request.headers.get("Last-Event-ID", type=int)
+    try:
+        sub = bus.subscribe(accepts, last_id)
+    except BusFull:
+        resp = jsonify({"ok": False, "msg": "Demasiadas conexiones en vivo, intenta más tarde."})
+        resp.status_code = 503
+        resp.headers["Retry-After"] = "30"
+        return resp
+    heartbeat = app.config['SSE_HEARTBEAT']
+
+    def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                ev = sub.get(heartbeat)
+                if ev is None:
+                    yield ": ping\n\n"
+                    continue
+                data = app.json.dumps(ev["data"])
+                yield f"id: {ev['id']}\nevent: {ev['type']}\ndata: {data}\n\n"
+        finally:
+            bus.unsubscribe(sub)
 
-    finally:
-        cur.close()
+    resp = app.response_class(stream(), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
 
 # ====================== Encuesta ======================
 @app.get("/api/encuestas/pending")
@@ -753,24 +1876,15 @@ def api_tecnico_subir_evidencia(tid):
 def api_encuestas_pending():
     incluir_cancelados = False  # cambia a True si también quieres obligar en CANCELADO
     rows = _encuestas_pendientes(session["user_id"], incluir_cancelados=incluir_cancelados)
-    return jsonify({"ok": True, "count": len(rows), "tickets": serialize_rows(rows)}), 200
+    return jsonify({"ok": True, "count": len(rows), "tickets": rows}), 200
 
 @app.route("/solicitante/encuesta/<int:ticket_id>")
 @login_required
 @role_required("SOLICITANTE")
 def solicitante_encuesta_view(ticket_id):
-    # Ticket + área + tipo + técnicos
     cur = conexion.connection.cursor()
     try:
-        cur.execute("""
-            SELECT t.id, t.usuario_id, t.estado, t.creado_en, t.cerrado_en,
-                   t.solicitante_nombre, t.asunto AS tipo_servicio, a.nombre AS area_nombre
-            FROM tickets t
-            LEFT JOIN areas a ON a.id = t.area_id
-            WHERE t.id=%s
-            LIMIT 1
-        """, (ticket_id,))
-        t = cur.fetchone()
+        t = _ticket_resumen(cur, ticket_id)
     finally:
         cur.close()
 
@@ -780,59 +1894,76 @@ def solicitante_encuesta_view(ticket_id):
         return "No autorizado", 403
     if t["estado"] not in ("RESUELTO","CANCELADO"):
         return "La encuesta está disponible cuando el ticket está RESUELTO o CANCELADO.", 400
-
-    # Evitar duplicado
-    cur = conexion.connection.cursor()
-    try:
-        cur.execute("SELECT id FROM encuestas WHERE ticket_id=%s", (ticket_id,))
-        e = cur.fetchone()
-    finally:
-        cur.close()
-    if e:
+    if t["encuesta_id"]:
         return "Este ticket ya tiene encuesta registrada.", 409
 
-    # Momento de asignación + técnicos
-    cur = conexion.connection.cursor()
-    try:
-        cur.execute("""
-            SELECT MIN(creado_en) AS asignado_en
-            FROM ticket_tecnicos
-            WHERE ticket_id=%s
-        """, (ticket_id,))
-        tt = cur.fetchone() or {}
-
-        cur.execute("""
-            SELECT GROUP_CONCAT(u.username ORDER BY u.username SEPARATOR ', ') AS tecnicos
-            FROM ticket_tecnicos tt
-            JOIN users u ON u.id = tt.user_id
-            WHERE tt.ticket_id=%s
-        """, (ticket_id,))
-        tech = cur.fetchone() or {}
-    finally:
-        cur.close()
-
-    asignado_en = tt.get("asignado_en")
-    creado_en   = t["creado_en"]
-    cerrado_en  = t["cerrado_en"]
-
-    hora_solicitud = creado_en.strftime("%Y-%m-%d %H:%M:%S") if creado_en else "-"
-    hora_cierre    = cerrado_en.strftime("%Y-%m-%d %H:%M:%S") if cerrado_en else "-"
-    t_tecnico      = _fmt_hms((cerrado_en - asignado_en) if (cerrado_en and asignado_en) else None)
-
     return render_template(
         "solicitante/encuesta.html",
         folio=ticket_id,
         ticket_id=ticket_id,
-        solicitante=t["solicitante_nombre"],
-        area_nombre=t["area_nombre"] or "-",
+        solicitante=t["solicitante"],
+        area_nombre=t["area_nombre"],
         estado=t["estado"],
-        hora_solicitud=hora_solicitud,
-        hora_cierre=hora_cierre,
-        t_tecnico=t_tecnico,
-        tipo_servicio=t["tipo_servicio"] or "-",
-        tecnicos_str=(tech.get("tecnicos") or "-")
+        hora_solicitud=t["hora_solicitud"],
+        hora_cierre=t["hora_cierre"],
+        t_tecnico=t["t_atencion"] or "",
+        tipo_servicio=t["tipo_servicio"],
+        tecnicos_str=t["tecnicos_str"]
     )
 
+# Resumen del ticket para la encuesta (vista, envío y PDF). Caché corto por
+# ticket: la vista y el envío que le sigue comparten una sola consulta.
+_resumenes = TTLCache(maxsize=2000, ttl=float(os.getenv("SUMMARY_CACHE_TTL", "30")))
+metrics.add_gauges("madi_cache_resumenes", _resumenes.stats, counters=CACHE_COUNTERS)
+
+def _olvidar_resumen(tid: int):
+    _resumenes.discard(tid)
+
+def _ticket_resumen(cur, ticket_id: int, cache: bool = True):
+    """
+    Ticket + área + técnicos + primer momento de asignación + encuesta
+    existente, en una consulta. Devuelve un dict (no modificar: puede venir
+    del caché) o None si el ticket no existe.
+    """
+    if cache:
+        return _resumenes.get_or_set(ticket_id, lambda: _ticket_resumen(cur, ticket_id, cache=False))
+
+    cur.execute("""
+        SELECT t.id, t.usuario_id, t.area_id, t.estado, t.creado_en, t.cerrado_en,
+               t.solicitante_nombre, t.asunto AS tipo_servicio, a.nombre AS area_nombre,
+               MIN(tt.creado_en) AS asignado_en,
+               GROUP_CONCAT(u.username ORDER BY u.username SEPARATOR ', ') AS tecnicos,
+               (SELECT MIN(e.id) FROM encuestas e WHERE e.ticket_id = t.id) AS encuesta_id
+        FROM tickets t
+        LEFT JOIN areas a ON a.id = t.area_id
+        LEFT JOIN ticket_tecnicos tt ON tt.ticket_id = t.id
+        LEFT JOIN users u ON u.id = tt.user_id
+        WHERE t.id=%s
+        GROUP BY t.id, a.nombre
+    """, (ticket_id,))
+    t = cur.fetchone()
+    if not t:
+        return None
+
+    creado_en, cerrado_en, asignado_en = t["creado_en"], t["cerrado_en"], t["asignado_en"]
+    return {
+        "folio": ticket_id,
+        "usuario_id": t["usuario_id"],
+        "area_id": t["area_id"],
+        "estado": t["estado"],
+        "solicitante": t["solicitante_nombre"],
+        "area_nombre": t["area_nombre"] or "-",
+        "tipo_servicio": t["tipo_servicio"] or "-",
+        "tecnicos_str": t["tecnicos"] or "-",
+        "hora_solicitud": creado_en.strftime("%Y-%m-%d %H:%M:%S") if creado_en else "-",
+        "hora_cierre": cerrado_en.strftime("%Y-%m-%d %H:%M:%S") if cerrado_en else "-",
+        # creación → cierre y asignación → cierre
+        "t_servicio": _fmt_hms((cerrado_en - creado_en) if (cerrado_en and creado_en) else None, None),
+        "t_atencion": _fmt_hms((cerrado_en - asignado_en) if (cerrado_en and asignado_en) else None, None),
+        "atendida": "si" if t["estado"] == "RESUELTO" else "no",
+        "encuesta_id": t["encuesta_id"],
+    }
+
 @app.post("/api/encuestas")
 @login_required
 @role_required("SOLICITANTE")
@@ -843,75 +1974,25 @@ def api_encuestas_create():
         if not ticket_id:
             return jsonify(ok=False, error="Falta ticket_id"), 400
 
-        # Datos del ticket y reglas
+        # Datos del ticket y reglas (normalmente ya en caché desde la vista)
         cur = conexion.connection.cursor()
         try:
-            cur.execute("""
-                SELECT usuario_id, estado, creado_en, cerrado_en
-                FROM tickets
-                WHERE id=%s
-                LIMIT 1
-            """, (ticket_id,))
-            t = cur.fetchone()
-            if not t:
-                cur.close(); return jsonify(ok=False, error="Ticket no encontrado"), 404
-            if t["usuario_id"] != session["user_id"]:
-                cur.close(); return jsonify(ok=False, error="No autorizado"), 403
-            if t["estado"] not in ("RESUELTO","CANCELADO"):
-                cur.close(); return jsonify(ok=False, error="Solo permitido con ticket RESUELTO o CANCELADO"), 400
-
-            # Única encuesta por ticket
-            cur.execute("SELECT id FROM encuestas WHERE ticket_id=%s", (ticket_id,))
-            if cur.fetchone():
-                cur.close(); return jsonify(ok=False, error="Este ticket ya tiene encuesta"), 409
-        except:
-            cur.close(); raise
-
-        # Primer momento de asignación
-        cur2 = conexion.connection.cursor()
-        try:
-            cur2.execute("""
-                SELECT MIN(creado_en) AS asignado_en
-                FROM ticket_tecnicos
-                WHERE ticket_id=%s
-            """, (ticket_id,))
-            asg = cur2.fetchone() or {}
+            t = _ticket_resumen(cur, ticket_id)
         finally:
-            cur2.close()
-
-        creado_en   = t["creado_en"]
-        cerrado_en  = t["cerrado_en"]
-        asignado_en = asg.get("asignado_en")
-
-        def _fmt(delta):
-            if not delta: return None
-            s = int(delta.total_seconds()); s = max(s,0)
-            h, rem = divmod(s, 3600)
-            m, s2  = divmod(rem, 60)
-            return f"{h:02d}:{m:02d}:{s2:02d}"
-
-        t_servicio = _fmt((cerrado_en - creado_en) if (cerrado_en and creado_en) else None)      # creación → cierre
-        t_atencion = _fmt((cerrado_en - asignado_en) if (cerrado_en and asignado_en) else None)  # asignación → cierre
-        atendida   = 'si' if t["estado"] == 'RESUELTO' else 'no'
-
-        # Calificaciones (1–5) y Sí/No
-        def _s15_key(k):
-            try:
-                v = int(f.get(k, ""))
-                return v if 1 <= v <= 5 else None
-            except: return None
-
-        p2 = _s15_key("p2")
-        p3 = _s15_key("p3")
-        p4 = _s15_key("p4")
-
-        q_rapidez             = _s15_key("q_rapidez")
-        q_resolucion_efectiva = _s15_key("q_resolucion_efectiva")
-        q_satis_solucion      = _s15_key("q_satis_solucion")
-        q_satis_web           = _s15_key("q_satis_web")
-
-        q_identificacion = (f.get("q_identificacion") or "").lower()
-        if q_identificacion not in ("si","no"): q_identificacion = None
+            cur.close()
+        if not t:
+            return jsonify(ok=False, error="Ticket no encontrado"), 404
+        if t["usuario_id"] != session["user_id"]:
+            return jsonify(ok=False, error="No autorizado"), 403
+        if t["estado"] not in ("RESUELTO","CANCELADO"):
+            return jsonify(ok=False, error="Solo permitido con ticket RESUELTO o CANCELADO"), 400
+        if t["encuesta_id"]:
+            return jsonify(ok=False, error="Este ticket ya tiene encuesta"), 409
+
+        # Calificaciones (1–5)
+        p2 = score_1_5(f.get("p2"))
+        p3 = score_1_5(f.get("p3"))
+        p4 = score_1_5(f.get("p4"))
 
         # Campo obligatorio: sugerencias
         sugerencias = (f.get("q_sugerencias") or "").strip()
@@ -921,41 +2002,43 @@ def api_encuestas_create():
         # Comentarios generales (OPCIONAL)
         comentarios = (f.get("comentarios") or "").strip()
 
-        # Empaquetamos TODO en 'descripcion' (no cambiamos esquema)
-        partes = [f"SUGERENCIAS:\n{sugerencias}"]
-        if comentarios:
-            partes.append(f"COMENTARIOS:\n{comentarios}")
-        extras = {
-            "p2": p2, "p3": p3, "p4": p4,
-            "q_rapidez": q_rapidez,
-            "q_resolucion_efectiva": q_resolucion_efectiva,
-            "q_satis_solucion": q_satis_solucion,
-            "q_satis_web": q_satis_web,
-            "q_identificacion": q_identificacion,
-            "t_servicio": t_servicio,
-            "t_atencion": t_atencion
-        }
-        partes.append("RESPUESTAS:\n" + str(extras))
-        descripcion_final = "\n\n---\n\n".join(partes)
-
-        # Inserción básica en encuestas
+        # descripcion conserva el texto libre; las respuestas van a encuesta_respuestas
+        descripcion_final = build_descripcion(sugerencias, comentarios)
+        answers = dict(f.items(), sugerencias=sugerencias, comentarios=comentarios)
+
         cur = conexion.connection.cursor()
-        cur.execute("""
-            INSERT INTO encuestas
-                (ticket_id, nombre,
-                 t_servicio, t_atencion,
-                 p2, p3, p4,
-                 atendida, descripcion)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
-        """, (
-            ticket_id, None,
-            t_servicio, t_atencion,
-            p2, p3, p4,
-            atendida, descripcion_final
-        ))
-        conexion.connection.commit()
-        encuesta_id = cur.lastrowid
-        cur.close()
+        try:
+            # Única encuesta por ticket: el resumen puede venir del caché, la
+            # comprobación definitiva va en el propio INSERT
+            cur.execute("""
+                INSERT INTO encuestas
+                    (ticket_id, nombre,
+                     t_servicio, t_atencion,
+                     p2, p3, p4,
+                     atendida, descripcion)
+                SELECT %s,%s,%s,%s,%s,%s,%s,%s,%s FROM DUAL
+                WHERE NOT EXISTS (SELECT 1 FROM encuestas WHERE ticket_id=%s)
+            """, (
+                ticket_id, None,
+                t["t_servicio"], t["t_atencion"],
+                p2, p3, p4,
+                t["atendida"], descripcion_final,
+                ticket_id
+            ))
+            if cur.rowcount == 0:
+                conexion.connection.rollback()
+                _olvidar_resumen(ticket_id)
+                return jsonify(ok=False, error="Este ticket ya tiene encuesta"), 409
+            encuesta_id = cur.lastrowid
+            _guardar_respuestas(cur, [_respuestas_fila(
+                encuesta_id, ticket_id, t["area_id"], datetime.now(), answers)])
+            _tocar_tickets(cur, [ticket_id])
+            conexion.connection.commit()
+        finally:
+            cur.close()
+        _olvidar_resumen(ticket_id)
+
+        reports.submit(encuesta_id, lambda: _encuesta_pdf_datos(encuesta_id))
 
         return jsonify(ok=True, encuesta_id=encuesta_id), 201
 
@@ -963,6 +2046,12 @@ def api_encuestas_create():
         conexion.connection.rollback()
         return jsonify(ok=False, error=str(e)), 500
 
+@app.get("/api/solicitante/tickets/<int:tid>/detalle")
+@login_required
+@role_required("SOLICITANTE")
+def api_solicitante_ticket_detalle(tid):
+    return _ticket_detalle(tid, solicitante=True)
+
 # Evidencias para la galería de encuesta
 @app.get("/api/solicitante/tickets/<int:tid>/evidencias")
 @login_required
@@ -995,14 +2084,525 @@ def api_solicitante_evidencias(tid):
     for a in raw:
         fname = os.path.basename(a.get("ruta") or "")
         if fname:
-            out.append({
-                "id": a["id"],
-                "name": fname,
-                "url": url_for("serve_ticket_upload", fname=fname)
-            })
+            out.append(_adjunto_json(a["id"], fname))
 
     return jsonify({"ok": True, "evidencias": out}), 200
 
+# ====================== Admin (vistas) ======================
+@app.route("/admin/dashboard")
+@login_required
+@role_required("ADMIN")
+def admin_dashboard():
+    return render_template("admin/admin_dashboard.html")
+
+@app.route("/admin/surveys")
+@login_required
+@role_required("ADMIN")
+def admin_surveys():
+    return render_template("admin/admin_surveys.html")
+
+@app.route("/admin/profiles")
+@login_required
+@role_required("ADMIN")
+def admin_profiles():
+    estado = profiler.estado()
+    activo = bool(estado["rate"]) and estado["hasta"] > datetime.now().timestamp()
+    return render_template("admin/admin_profiles.html", perfiles=profiler.listado(), estado=estado,
+                           activo=activo, hasta=datetime.fromtimestamp(estado["hasta"]).strftime("%H:%M"))
+
+# ====================== Admin (APIs) ======================
+@app.get("/api/admin/metrics")
+@login_required
+@role_required("ADMIN")
+def api_admin_metrics():
+    """
+    KPIs del mes (?month=YYYY-MM, por defecto el actual) desde los rollups
+    diarios: total, open, unassigned, closed, by_area, by_technician y
+    last6_months. El mes es el de creación del ticket.
+    """
+    try:
+        inicio, fin = _mes_rango(request.args.get("month") or date.today().strftime("%Y-%m"))
+    except ValueError:
+        return jsonify({"ok": False, "msg": "month inválido (YYYY-MM)"}), 400
+    desde6 = _meses_atras(inicio, 5)
+    abiertos = _in_placeholders(ESTADOS_ABIERTOS)
+
+    cur = conexion.connection.cursor()
+    try:
+        cur.execute(f"""
+            SELECT COALESCE(SUM(n), 0) AS total,
+                   COALESCE(SUM(IF(estado IN ({abiertos}), n, 0)), 0) AS open,
+                   COALESCE(SUM(IF(estado IN ({abiertos}) AND asignado = 0, n, 0)), 0) AS unassigned,
+                   COALESCE(SUM(IF(estado IN ('RESUELTO', 'CANCELADO'), n, 0)), 0) AS closed
+            FROM metricas_tickets_dia
+            WHERE dia >= %s AND dia < %s
+        """, (*ESTADOS_ABIERTOS, *ESTADOS_ABIERTOS, inicio, fin))
+        kpis = {k: int(v) for k, v in cur.fetchone().items()}
+
+        cur.execute("""
+            SELECT COALESCE(a.nombre, 'Sin área') AS area, SUM(m.n) AS count
+            FROM metricas_tickets_dia m
+            LEFT JOIN areas a ON a.id = m.area_id
+            WHERE m.dia >= %s AND m.dia < %s
+            GROUP BY m.area_id, a.nombre
+            HAVING count > 0
+            ORDER BY count DESC
+        """, (inicio, fin))
+        by_area = [{"area": r["area"], "count": int(r["count"])} for r in cur.fetchall() or []]
+
+        cur.execute("""
+            SELECT u.username AS technician, SUM(m.n) AS count
+            FROM metricas_tecnicos_dia m
+            JOIN users u ON u.id = m.user_id
+            WHERE m.dia >= %s AND m.dia < %s
+            GROUP BY m.user_id, u.username
+            HAVING count > 0
+            ORDER BY count DESC
+        """, (inicio, fin))
+        by_technician = [{"technician": r["technician"], "count": int(r["count"])}
+                         for r in cur.fetchall() or []]
+
+        cur.execute("""
+            SELECT DATE_FORMAT(dia, '%%Y-%%m') AS month, SUM(n) AS count
+            FROM metricas_tickets_dia
+            WHERE dia >= %s AND dia < %s
+            GROUP BY month
+        """, (desde6, fin))
+        por_mes = {r["month"]: int(r["count"]) for r in cur.fetchall() or []}
+    finally:
+        cur.close()
+
+    last6 = [_meses_atras(inicio, k).strftime("%Y-%m") for k in range(5, -1, -1)]
+    return jsonify(dict(
+        kpis,
+        month=inicio.strftime("%Y-%m"),
+        by_area=by_area,
+        by_technician=by_technician,
+        last6_months=[{"month": m, "count": por_mes.get(m, 0)} for m in last6],
+    )), 200
+
+@app.get("/api/admin/surveys")
+@login_required
+@role_required("ADMIN")
+def api_admin_surveys():
+    """
+    Encuestas del mes (?month=YYYY-MM) y opcionalmente de un área (?area_id=),
+    más recientes primero, con los promedios por área precalculados del mes.
+    """
+    try:
+        inicio, fin = _mes_rango(request.args.get("month") or date.today().strftime("%Y-%m"))
+        area_id = request.args.get("area_id", type=int)
+        limit = max(1, min(int(request.args.get("limit", LIST_MAX_LIMIT)), LIST_MAX_LIMIT))
+    except ValueError:
+        return jsonify({"ok": False, "msg": "Parámetros inválidos"}), 400
+
+    where, params = ["r.creado_en >= %s", "r.creado_en < %s"], [inicio, fin]
+    if area_id is not None:
+        where.append("r.area_id = %s")
+        params.append(area_id)
+
+    cur = conexion.connection.cursor()
+    try:
+        cur.execute(f"""
+            SELECT r.encuesta_id, r.ticket_id, r.creado_en, r.rating,
+                   r.sugerencias, r.comentarios, a.nombre AS area
+            FROM encuesta_respuestas r
+            LEFT JOIN areas a ON a.id = r.area_id
+            WHERE {" AND ".join(where)}
+            ORDER BY r.creado_en DESC, r.encuesta_id DESC
+            LIMIT %s
+        """, (*params, limit))
+        rows = cur.fetchall() or []
+
+        cur.execute(f"""
+            SELECT p.area_id, a.nombre AS area, p.n, p.calificadas,
+                   ROUND(p.suma / NULLIF(p.calificadas, 0), 2) AS rating
+            FROM encuestas_promedios_mes p
+            LEFT JOIN areas a ON a.id = p.area_id
+            WHERE p.mes = %s {"AND p.area_id = %s" if area_id is not None else ""}
+            ORDER BY a.nombre
+        """, (inicio, area_id) if area_id is not None else (inicio,))
+        promedios = cur.fetchall() or []
+    finally:
+        cur.close()
+
+    surveys = [{
+        "id": r["encuesta_id"],
+        "ticket_id": r["ticket_id"],
+        "created_at": r["creado_en"].isoformat() if r["creado_en"] else None,
+        "area": r["area"],
+        "rating": float(r["rating"]) if r["rating"] is not None else None,
+        "comments": "\n\n".join(x for x in (r["sugerencias"], r["comentarios"]) if x),
+        "pdf_url": url_for("api_admin_survey_pdf", eid=r["encuesta_id"])
+                   if reports.exists(r["encuesta_id"]) else None,
+    } for r in rows]
+    calificadas = sum(p["calificadas"] for p in promedios)
+    total = sum(float(p["rating"]) * p["calificadas"] for p in promedios if p["rating"] is not None)
+    return jsonify({
+        "ok": True,
+        "month": inicio.strftime("%Y-%m"),
+        "surveys": surveys,
+        "promedios": promedios,
+        "rating": round(total / calificadas, 2) if calificadas else None,
+    }), 200
+
+@app.get("/api/admin/surveys/<int:eid>/pdf")
+@login_required
+@role_required("ADMIN")
+def api_admin_survey_pdf(eid):
+    """PDF ya generado; si aún no existe se encola y se responde 202."""
+    if reports.exists(eid):
+        resp = _send_upload(reports.path(eid))
+        resp.headers["Content-Disposition"] = f'inline; filename="encuesta_{eid}.pdf"'
+        return resp
+    if not reports.available:
+        return jsonify({"ok": False, "msg": "Generación de PDF no disponible (falta reportlab)."}), 503
+    reports.submit(eid, lambda: _encuesta_pdf_datos(eid))
+    return jsonify({"ok": True, "pendiente": True}), 202
+
+@app.get("/api/admin/surveys/export.zip")
+@login_required
+@role_required("ADMIN")
+def api_admin_surveys_zip():
+    """
+    PDFs del mes (?month=, ?area_id=) en un ZIP. Los que falten se encolan y se
+    responde 202 con cuántos quedan: el cliente reintenta hasta recibir el ZIP.
+    Los que agotaron REPORT_MAX_ATTEMPTS no se esperan: el ZIP sale sin ellos,
+    con un manifiesto que los lista y el encabezado X-Encuestas-Fallidas.
+    """
+    try:
+        inicio, fin = _mes_rango(request.args.get("month") or date.today().strftime("%Y-%m"))
+        area_id = request.args.get("area_id", type=int)
+    except ValueError:
+        return jsonify({"ok": False, "msg": "Parámetros inválidos"}), 400
+    if not reports.available:
+        return jsonify({"ok": False, "msg": "Generación de PDF no disponible (falta reportlab)."}), 503
+
+    cur = conexion.connection.cursor()
+    try:
+        cur.execute(f"""
+            SELECT encuesta_id
+            FROM encuesta_respuestas
+            WHERE creado_en >= %s AND creado_en < %s {"AND area_id = %s" if area_id is not None else ""}
+            ORDER BY encuesta_id
+        """, (inicio, fin, area_id) if area_id is not None else (inicio, fin))
+        ids = [r["encuesta_id"] for r in cur.fetchall() or []]
+    finally:
+        cur.close()
+
+    fallidas = [eid for eid in ids if reports.failed(eid)]
+    faltan = [eid for eid in ids if not reports.exists(eid) and eid not in fallidas]
+    for eid in faltan:
+        reports.submit(eid, lambda eid=eid: _encuesta_pdf_datos(eid))
+    if faltan:
+        return jsonify({"ok": True, "pendientes": len(faltan), "total": len(ids),
+                        "fallidas": len(fallidas)}), 202
+
+    # Los PDF ya están comprimidos: ZIP_STORED solo los concatena
+    tmp = tempfile.TemporaryFile()
+    with zipfile.ZipFile(tmp, "w", zipfile.ZIP_STORED) as zf:
+        for eid in ids:
+            if eid not in fallidas:
+                zf.write(reports.path(eid), f"encuesta_{eid}.pdf")
+        if fallidas:
+            zf.writestr("FALLIDAS.txt", "No se pudo generar el PDF de estas encuestas:\n"
+                        + "".join(f"encuesta {eid}\n" for eid in fallidas))
+    tmp.seek(0)
+    sufijo = f"_area{area_id}" if area_id is not None else ""
+    resp = send_file(tmp, mimetype="application/zip", as_attachment=True,
+                     download_name=f"encuestas_{inicio:%Y-%m}{sufijo}.zip")
+    resp.headers["X-Encuestas-Fallidas"] = str(len(fallidas))
+    return resp
+
+@app.get("/api/admin/logs")
+@login_required
+@role_required("ADMIN")
+def api_admin_logs():
+    """Bitácora reciente: últimas notas de tickets (más nuevas primero)."""
+    try:
+        limit = max(1, min(int(request.args.get("limit", 50)), LIST_MAX_LIMIT))
+    except ValueError:
+        return jsonify({"ok": False, "msg": "limit inválido"}), 400
+
+    cur = conexion.connection.cursor()
+    try:
+        cur.execute("""
+            SELECT n.id, n.ticket_id, n.texto, n.creado_en, u.username
+            FROM ticket_notas n
+            JOIN users u ON u.id = n.usuario_id
+            ORDER BY n.id DESC
+            LIMIT %s
+        """, (limit,))
+        rows = cur.fetchall() or []
+    finally:
+        cur.close()
+
+    return jsonify([{
+        "id": r["id"],
+        "ticket_id": r["ticket_id"],
+        "created_at": r["creado_en"].strftime("%Y-%m-%d %H:%M") if r["creado_en"] else "",
+        "message": f"{r['username']} en #{r['ticket_id']}: {r['texto']}",
+    } for r in rows]), 200
+
+# ====================== Admin / Monitoreo ======================
+@app.get("/api/admin/db/pool")
+@login_required
+@role_required("ADMIN")
+def api_admin_db_pool():
+    return jsonify({"ok": True, "pool": conexion.stats()}), 200
+
+@app.get("/api/admin/cache")
+@login_required
+@role_required("ADMIN")
+def api_admin_cache_stats():
+    return jsonify({"ok": True, "catalogos": catalog_cache.stats()}), 200
+
+@app.get("/api/admin/db/slow")
+@login_required
+@role_required("ADMIN")
+def api_admin_db_slow():
+    """Últimas sentencias que superaron SLOW_QUERY_MS en este proceso (más nuevas primero)."""
+    return jsonify({"ok": True, "umbral_ms": metrics.slow_ms, "consultas": metrics.slow_queries()}), 200
+
+# ---- Perfilado ----
+@app.get("/api/admin/profiler")
+@login_required
+@role_required("ADMIN")
+def api_admin_profiler_estado():
+    return jsonify({"ok": True, "estado": profiler.estado()}), 200
+
+@app.post("/api/admin/profiler")
+@login_required
+@role_required("ADMIN")
+def api_admin_profiler_configurar():
+    """
+    {"rate": 0.05, "endpoints": ["api_mis_tickets"], "minutos": 10} perfila el
+    5% de esas rutas durante 10 minutos (sin endpoints: todas); rate 0 apaga.
+    """
+    data = request.get_json(silent=True) or {}
+    endpoints = data.get("endpoints") or []
+    if not isinstance(endpoints, list) or any(e not in app.view_functions for e in endpoints):
+        return jsonify({"ok": False, "msg": "endpoints inválidos"}), 400
+    try:
+        estado = profiler.configurar(float(data.get("rate") or 0), endpoints,
+                                     float(data.get("minutos") or 10))
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "msg": "rate/minutos inválidos"}), 400
+    return jsonify({"ok": True, "estado": estado}), 200
+
+@app.post("/api/admin/profiler/token")
+@login_required
+@role_required("ADMIN")
+def api_admin_profiler_token():
+    """Encabezado firmado para perfilar peticiones concretas (curl -H ...)."""
+    return jsonify({"ok": True, "header": "X-Profile", "valor": profiler.token(),
+                    "ttl": profiler.token_ttl}), 200
+
+@app.get("/api/admin/profiles/<endpoint>/<pid>.<ext>")
+@login_required
+@role_required("ADMIN")
+def api_admin_profile_file(endpoint, pid, ext):
+    """Perfil guardado: .folded (pilas plegadas para flamegraph) o .json (spans de BD)."""
+    path = profiler.archivo(endpoint, pid, "." + ext)
+    if not path:
+        abort(404)
+    mimetype = "application/json" if ext == "json" else "text/plain"
+    return send_file(path, mimetype=mimetype, as_attachment=ext == "folded",
+                     download_name=f"{endpoint}_{pid}.{ext}")
+
+# ====================== Métricas (Prometheus) ======================
+@app.get("/metrics")
+def prometheus_metrics():
+    token = app.config['METRICS_TOKEN']
+    if token:
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+            abort(401)
+    elif request.remote_addr not in app.config['METRICS_ALLOW_IPS']:
+        abort(404)
+    return app.response_class(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.post("/api/admin/cache/invalidate")
+@login_required
+@role_required("ADMIN")
+def api_admin_cache_invalidate():
+    prefix = ((request.get_json(silent=True) or {}).get("prefix") or "").strip() or None
+    n = invalidate_catalogs(prefix)
+    return jsonify({"ok": True, "invalidadas": n}), 200
+
+# ====================== CLI: almacenamiento de adjuntos ======================
+@app.cli.command("uploads-dedupe")
+@click.option("--dry-run", is_flag=True, help="Solo muestra el ahorro, no modifica nada.")
+def uploads_dedupe_command(dry_run):
+    """Migra uploads/tickets a nombres por contenido y elimina copias idénticas."""
+    base_dir = _tickets_upload_dir()
+    groups = plan_dedupe(base_dir)
+    ahorro = sum(os.path.getsize(os.path.join(base_dir, n)) for names in groups.values() for n in names[1:])
+    renombrar = sum(1 for blob, names in groups.items() if names != [blob])
+    click.echo(f"{sum(map(len, groups.values()))} archivos → {len(groups)} blobs; "
+               f"{renombrar} grupos a migrar; ahorro {ahorro / 1024 / 1024:.1f} MB")
+    if dry_run:
+        return
+
+    # 1) Disco: cada blob se crea junto al original (enlace o copia), sin borrar
+    #    nada; 2) BD en una transacción; 3) recién entonces se borran los nombres
+    #    viejos y sus derivados. Si la BD falla solo quedan blobs sin filas,
+    #    que uploads-gc recoge.
+    for blob, names in groups.items():
+        if blob not in names:
+            origen, nueva = os.path.join(base_dir, names[0]), os.path.join(base_dir, blob)
+            try:
+                os.link(origen, nueva)
+            except OSError:
+                shutil.copy2(origen, nueva)
+
+    with conexion.borrow() as conn:
+        cur = conn.cursor()
+        try:
+            for blob, names in groups.items():
+                nueva = os.path.join(base_dir, blob)
+                for name in names:
+                    if name == blob:
+                        continue
+                    cur.execute("""
+                        UPDATE tickets SET version = version + 1
+                        WHERE id IN (SELECT ticket_id FROM ticket_attachments WHERE archivo = %s)
+                    """, (name,))
+                    cur.execute("""
+                        UPDATE ticket_attachments SET ruta=%s, archivo=%s
+                        WHERE archivo = %s
+                    """, (nueva, blob, name))
+            # Dos copias idénticas en el mismo ticket quedan como filas repetidas
+            # del mismo blob: se conserva la más antigua (MIN(id))
+            cur.execute("""
+                DELETE a FROM ticket_attachments a
+                JOIN ticket_attachments b
+                  ON b.ticket_id = a.ticket_id AND b.archivo = a.archivo AND b.id < a.id
+            """)
+            if cur.rowcount:
+                click.echo(f"Filas de adjuntos repetidas eliminadas: {cur.rowcount}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    for blob, names in groups.items():
+        for name in names:
+            if name != blob:
+                remove_with_derivatives(base_dir, name)
+    click.echo("Listo.")
+
+@app.cli.command("uploads-gc")
+@click.option("--grace", default=60, show_default=True,
+              help="Minutos: no toca blobs modificados hace menos (subidas en curso).")
+def uploads_gc_command(grace):
+    """Borra blobs de uploads/tickets que ya no referencia ninguna fila."""
+    base_dir = _tickets_upload_dir()
+    # El worker escribe (o reutiliza y toca) el blob antes de insertar su fila
+    limite = time.time() - grace * 60
+    borrados = 0
+    with conexion.borrow() as conn:
+        cur = conn.cursor()
+        try:
+            for name in sorted(os.listdir(base_dir)):
+                path = os.path.join(base_dir, name)
+                if not os.path.isfile(path) or os.path.getmtime(path) > limite:
+                    continue
+                if _liberar_blob(cur, name):
+                    borrados += 1
+        finally:
+            cur.close()
+    click.echo(f"Blobs eliminados: {borrados}")
+
+# ====================== CLI: esquema ======================
+@app.cli.command("db-migrate")
+@click.option("--status", "solo_estado", is_flag=True, help="Solo lista aplicadas y pendientes.")
+@click.option("--to", "target", type=int, default=None, help="Aplica hasta esta versión.")
+def db_migrate_command(solo_estado, target):
+    """Aplica las migraciones pendientes de migrations/."""
+    with conexion.borrow() as conn:
+        if solo_estado:
+            for version, nombre, aplicado_en in migrations.status(conn):
+                click.echo(f"{version:04d}_{nombre}  {aplicado_en or 'pendiente'}")
+            return
+        try:
+            hechas = migrations.migrate(conn, target=target, echo=click.echo)
+        except migrations.MigrationError as e:
+            raise click.ClickException(str(e))
+    click.echo(f"Migraciones aplicadas: {len(hechas)}")
+
+# ====================== CLI: métricas ======================
+@app.cli.command("metrics-rebuild")
+def metrics_rebuild_command():
+    """Recalcula desde cero los rollups diarios del dashboard."""
+    with conexion.borrow() as conn:
+        cur = conn.cursor()
+        try:
+            # DELETE + INSERT ... SELECT en una transacción: los deltas concurrentes esperan
+            cur.execute("DELETE FROM metricas_tickets_dia")
+            cur.execute("""
+                INSERT INTO metricas_tickets_dia (dia, area_id, estado, asignado, n)
+                SELECT DATE(creado_en), COALESCE(area_id, 0), estado,
+                       asignado_a IS NOT NULL, COUNT(*)
+                FROM tickets
+                GROUP BY DATE(creado_en), COALESCE(area_id, 0), estado, asignado_a IS NOT NULL
+            """)
+            dias = cur.rowcount
+            cur.execute("DELETE FROM metricas_tecnicos_dia")
+            cur.execute("""
+                INSERT INTO metricas_tecnicos_dia (dia, user_id, n)
+                SELECT DATE(t.creado_en), tt.user_id, COUNT(*)
+                FROM ticket_tecnicos tt
+                JOIN tickets t ON t.id = tt.ticket_id
+                GROUP BY DATE(t.creado_en), tt.user_id
+            """)
+            tecnicos = cur.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+    click.echo(f"Rollups recalculados: {dias} filas en metricas_tickets_dia, "
+               f"{tecnicos} en metricas_tecnicos_dia")
+
+# ====================== CLI: encuestas ======================
+@app.cli.command("surveys-migrate")
+@click.option("--dry-run", is_flag=True, help="Solo cuenta lo que se migraría.")
+def surveys_migrate_command(dry_run):
+    """Migra a encuesta_respuestas las encuestas guardadas como texto."""
+    with conexion.borrow() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                SELECT e.id, e.ticket_id, e.p2, e.p3, e.p4, e.descripcion,
+                       COALESCE(e.creado_en, t.cerrado_en, t.creado_en) AS creado_en, t.area_id
+                FROM encuestas e
+                JOIN tickets t ON t.id = e.ticket_id
+                LEFT JOIN encuesta_respuestas r ON r.encuesta_id = e.id
+                WHERE r.encuesta_id IS NULL
+                ORDER BY e.id
+            """)
+            filas = []
+            for e in cur.fetchall() or []:
+                answers = parse_descripcion(e["descripcion"])
+                for k in ("p2", "p3", "p4"):
+                    answers[k] = e[k] if e[k] is not None else answers.get(k)
+                filas.append(_respuestas_fila(e["id"], e["ticket_id"], e["area_id"],
+                                              e["creado_en"], answers))
+            click.echo(f"Encuestas por migrar: {len(filas)}")
+            if dry_run or not filas:
+                return
+            _guardar_respuestas(cur, filas)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+    click.echo("Listo.")
+
 # -------- Main --------
 if __name__ == "__main__":
     app.run(debug=True, port=5000)      
\ No newline at end of file
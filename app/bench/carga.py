@@ -0,0 +1,264 @@
+# bench/carga.py — Latencia, consultas por petición y throughput de rutas reales
+#
+# Uso (desde app/):
+#   python -m bench.carga --tickets 50000 --threads 1 8 --requests 400 \
+#       --out bench_results/$(git rev-parse --short HEAD).json
+#   python -m bench.carga ... --compare bench_results/<commit anterior>.json
+#
+# Siembra BENCH_DB (por defecto madi_carga, ver bench/seed.py) y, para cada
+# escenario y cada nivel de concurrencia, lanza --requests peticiones con el
+# test client de Flask repartidas entre N hilos. Mide latencia (p50/p95/p99),
+# sentencias SQL por petición y peticiones por segundo; el resultado se
+# guarda en JSON para comparar entre commits. Los escenarios de escritura
+# consumen datos sembrados (solicitantes sin tickets, tickets sin encuesta),
+# así que el volumen sembrado acota cuántas peticiones pueden hacer.
+import argparse, json, os, random, statistics, subprocess, sys, threading, time
+from collections import Counter
+from datetime import datetime
+from queue import Empty, Queue
+
+import MySQLdb.cursors
+
+BENCH_DB = os.getenv("BENCH_DB", "madi_carga")
+os.environ["MYSQL_DB"] = BENCH_DB  # antes de importar app: config lee el entorno
+
+from bench.seed import drop, seed  # noqa: E402
+
+_local = threading.local()
+
+
+class CountingCursor(MySQLdb.cursors.DictCursor):
+    """
+    DictCursor que cuenta sentencias por hilo (una petición del test client = un
+    hilo). executemany cuenta una vez, igual que _TimedCursor en db.py, aunque
+    MySQLdb lo resuelva con varias llamadas a execute.
+    """
+    _in_many = False
+
+    def execute(self, query, args=None):
+        if not self._in_many:
+            _local.queries = getattr(_local, "queries", 0) + 1
+        return super().execute(query, args)
+
+    def executemany(self, query, args):
+        _local.queries = getattr(_local, "queries", 0) + 1
+        self._in_many = True
+        try:
+            return super().executemany(query, args)
+        finally:
+            self._in_many = False
+
+
+def percentile(values, p):
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not values:
+        return None
+    k = max(0, min(len(values) - 1, int(round(p / 100 * len(values) + 0.5)) - 1))
+    return values[k]
+
+
+# ---- escenarios ----
+# Cada escenario devuelve (usuario, método, url, kwargs) o None si se agotó su pool.
+def escenarios(datos, max_tickets):
+    rnd_lock = threading.Lock()
+    rnd = random.Random(99)
+    tecnicos = [(uid, name, "TECNICO") for uid, name in datos["tecnicos"]]
+    solicitantes = [(uid, name, "SOLICITANTE") for uid, name in datos["solicitantes"]]
+    nombres = dict(datos["solicitantes"])
+
+    crear = Queue()
+    for uid, name in datos["vacios"]:
+        for _ in range(max_tickets):
+            crear.put((uid, name, "SOLICITANTE"))
+    encuestar = Queue()
+    for tid, uid in datos["sin_encuesta"]:
+        encuestar.put((tid, (uid, nombres[uid], "SOLICITANTE")))
+
+    def pick(seq):
+        with rnd_lock:
+            return rnd.choice(seq)
+
+    def tecnico_tickets():
+        scope = pick(("disponibles", "asignados", "historial"))
+        return pick(tecnicos), "get", f"/api/tecnico/tickets?scope={scope}", {}
+
+    def mis_tickets():
+        estado = pick(("", "FINALIZADOS"))
+        # la mitad de las veces el solicitante con más tickets (páginas completas)
+        user = solicitantes[0] if pick((0, 1)) else pick(solicitantes)
+        return user, "get", f"/api/mis-tickets?estado={estado}", {}
+
+    def overview():
+        user = solicitantes[0] if pick((0, 1)) else pick(solicitantes)
+        return user, "get", "/api/solicitante/overview", {}
+
+    def crear_ticket():
+        try:
+            user = crear.get_nowait()
+        except Empty:
+            return None
+        return user, "post", "/api/tickets", {"json": {
+            "tipo": "Tipo 1", "descripcion": "Carga", "solicitante_nombre": user[1]}}
+
+    def encuesta():
+        try:
+            tid, user = encuestar.get_nowait()
+        except Empty:
+            return None
+        return user, "post", "/api/encuestas", {"data": {
+            "ticket_id": tid, "q_sugerencias": "Carga", "q_rapidez": "5",
+            "q_resolucion_efectiva": "4", "q_satis_solucion": "4", "p2": "5"}}
+
+    return {
+        "tecnico_tickets": tecnico_tickets,
+        "mis_tickets": mis_tickets,
+        "overview": overview,
+        "crear_ticket": crear_ticket,
+        "encuesta": encuesta,
+    }
+
+
+def correr(app, escenario, n_requests, n_threads):
+    """Lanza hasta n_requests peticiones del escenario con n_threads hilos."""
+    lat, queries, codigos = [], [], Counter()
+    lock = threading.Lock()
+    restantes = [n_requests]
+
+    def worker():
+        clientes = {}
+        while True:
+            with lock:
+                if restantes[0] <= 0:
+                    return
+                restantes[0] -= 1
+            paso = escenario()
+            if paso is None:
+                return
+            (uid, name, role), method, url, kw = paso
+            client = clientes.get(uid)
+            if client is None:
+                client = clientes[uid] = app.test_client()
+                with client.session_transaction() as s:
+                    s["user_id"], s["username"], s["role"] = uid, name, role
+            _local.queries = 0
+            t0 = time.perf_counter()
+            r = getattr(client, method)(url, **kw)
+            ms = (time.perf_counter() - t0) * 1000
+            with lock:
+                lat.append(ms)
+                queries.append(_local.queries)
+                codigos[r.status_code] += 1
+
+    hilos = [threading.Thread(target=worker) for _ in range(n_threads)]
+    t0 = time.perf_counter()
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    total_s = time.perf_counter() - t0
+
+    lat.sort()
+    return {
+        "threads": n_threads,
+        "requests": len(lat),
+        "status": {str(k): v for k, v in sorted(codigos.items())},
+        "errors": sum(v for k, v in codigos.items() if k >= 500),
+        "p50_ms": round(percentile(lat, 50), 2) if lat else None,
+        "p95_ms": round(percentile(lat, 95), 2) if lat else None,
+        "p99_ms": round(percentile(lat, 99), 2) if lat else None,
+        "mean_ms": round(statistics.fmean(lat), 2) if lat else None,
+        "max_ms": round(lat[-1], 2) if lat else None,
+        "rps": round(len(lat) / total_s, 1) if total_s else None,
+        "queries_per_request": round(statistics.fmean(queries), 2) if queries else None,
+        "queries_max": max(queries) if queries else None,
+    }
+
+
+def commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(actual, anterior_path):
+    with open(anterior_path, encoding="utf-8") as fh:
+        anterior = json.load(fh)
+    print(f"\nComparación con {anterior_path} ({anterior.get('commit') or '?'}):")
+    for clave, r in actual["resultados"].items():
+        a = anterior.get("resultados", {}).get(clave)
+        if not a or not a.get("p95_ms") or not r.get("p95_ms"):
+            continue
+        dp95 = (r["p95_ms"] - a["p95_ms"]) / a["p95_ms"] * 100
+        dq = (r["queries_per_request"] or 0) - (a["queries_per_request"] or 0)
+        print(f"  {clave:28s} p95 {a['p95_ms']:8.1f} → {r['p95_ms']:8.1f} ms ({dp95:+.0f}%)  "
+              f"consultas/pet {dq:+.2f}  rps {a['rps']} → {r['rps']}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de carga de rutas de MADI")
+    ap.add_argument("--tickets", type=int, default=20000)
+    ap.add_argument("--tecnicos", type=int, default=40)
+    ap.add_argument("--solicitantes", type=int, default=500)
+    ap.add_argument("--vacios", type=int, default=500, help="Solicitantes sin tickets (para POST /api/tickets).")
+    ap.add_argument("--notas", type=float, default=1.0, help="Notas promedio por ticket atendido.")
+    ap.add_argument("--adjuntos", type=float, default=0.3, help="Proporción de tickets con adjunto.")
+    ap.add_argument("--encuestas", type=float, default=0.7, help="Proporción de cerrados con encuesta.")
+    ap.add_argument("--requests", type=int, default=300, help="Peticiones por escenario y nivel.")
+    ap.add_argument("--threads", type=int, nargs="+", default=[1, 8])
+    ap.add_argument("--escenarios", nargs="+", default=None)
+    ap.add_argument("--warmup", type=int, default=20)
+    ap.add_argument("--out", default=None, help="Ruta del JSON de resultados.")
+    ap.add_argument("--compare", default=None, help="JSON de una corrida anterior.")
+    ap.add_argument("--keep", action="store_true", help="No borra la base al terminar.")
+    args = ap.parse_args()
+
+    volumenes = dict(tickets=args.tickets, tecnicos=args.tecnicos, solicitantes=args.solicitantes,
+                     vacios=args.vacios, notas=args.notas, adjuntos=args.adjuntos,
+                     encuestas=args.encuestas)
+    print(f"Sembrando {BENCH_DB}: {volumenes}")
+    t0 = time.perf_counter()
+    datos = seed(BENCH_DB, **volumenes)
+    print(f"  {datos['volumenes']} en {time.perf_counter() - t0:.1f} s")
+
+    from app import app, MAX_TOTAL_TICKETS
+    app.config["MYSQL_CURSORCLASS"] = CountingCursor
+    app.config["TESTING"] = True
+    pasos = escenarios(datos, MAX_TOTAL_TICKETS)
+    elegidos = args.escenarios or list(pasos)
+
+    resultados = {}
+    try:
+        for nombre in elegidos:
+            if nombre in ("tecnico_tickets", "mis_tickets", "overview") and args.warmup:
+                correr(app, pasos[nombre], args.warmup, 1)
+            for n in args.threads:
+                r = correr(app, pasos[nombre], args.requests, n)
+                resultados[f"{nombre}@{n}"] = r
+                print(f"{nombre:16s} hilos={n:<3d} n={r['requests']:<5d} "
+                      f"p50={r['p50_ms']} p95={r['p95_ms']} p99={r['p99_ms']} ms  "
+                      f"consultas/pet={r['queries_per_request']}  rps={r['rps']}  status={r['status']}")
+    finally:
+        if not args.keep:
+            drop(BENCH_DB)
+
+    salida = {
+        "commit": commit_actual(),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "volumenes": datos["volumenes"],
+        "parametros": dict(volumenes, requests=args.requests, threads=args.threads),
+        "resultados": resultados,
+    }
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(salida, fh, indent=2, ensure_ascii=False)
+        print(f"\nResultados en {args.out}")
+    if args.compare:
+        comparar(salida, args.compare)
+    sys.exit(1 if any(r["errors"] for r in resultados.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# bench/carrera_tomar.py — N técnicos reclaman el mismo ticket a la vez
+#
+# Uso (desde app/, contra una BD de desarrollo):
+#   python -m bench.carrera_tomar --ticket-id 120 --tecnicos 3,4,5,6 --rondas 50
+#
+# El ticket debe estar PENDIENTE y sin asignar. En cada ronda se devuelve a
+# ese estado, todos los hilos llaman a POST /tomar?modo=cas detrás de una
+# barrera y se comprueba que hubo exactamente un 200 y el resto 409.
+# La verificación automática equivalente está en tests/test_concurrencia.py.
+import argparse, sys, threading, time
+from collections import Counter
+
+from app import app, conexion, _rollup_claves, _rollup_aplicar
+
+
+def reset(ticket_id):
+    """Devuelve el ticket a PENDIENTE sin técnicos, deshaciendo los deltas de los rollups."""
+    with app.app_context(), conexion.borrow() as conn:
+        cur = conn.cursor()
+        try:
+            antes = _rollup_claves(cur, [ticket_id], lock=True)
+            cur.execute("SELECT user_id FROM ticket_tecnicos WHERE ticket_id=%s", (ticket_id,))
+            tecnicos = [r["user_id"] for r in cur.fetchall() or []]
+            if tecnicos and ticket_id in antes:
+                cur.executemany("""
+                    UPDATE metricas_tecnicos_dia SET n = n - 1 WHERE dia=%s AND user_id=%s
+                """, [(antes[ticket_id][0], uid) for uid in tecnicos])
+            cur.execute("DELETE FROM ticket_tecnicos WHERE ticket_id=%s", (ticket_id,))
+            cur.execute("UPDATE tickets SET estado='PENDIENTE', asignado_a=NULL WHERE id=%s", (ticket_id,))
+            _rollup_aplicar(cur, antes, _rollup_claves(cur, [ticket_id]))
+            conn.commit()
+        finally:
+            cur.close()
+
+
+def ronda(ticket_id, tecnicos):
+    barrera = threading.Barrier(len(tecnicos))
+    codigos, lat = Counter(), []
+    lock = threading.Lock()
+
+    def reclamar(uid):
+        client = app.test_client()
+        with client.session_transaction() as s:
+            s["user_id"] = uid
+            s["role"] = "TECNICO"
+        barrera.wait()
+        t0 = time.perf_counter()
+        r = client.post(f"/api/tecnico/tickets/{ticket_id}/tomar?modo=cas")
+        with lock:
+            codigos[r.status_code] += 1
+            lat.append((time.perf_counter() - t0) * 1000)
+
+    hilos = [threading.Thread(target=reclamar, args=(uid,)) for uid in tecnicos]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    return codigos, lat
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Carrera de reclamo de un ticket")
+    ap.add_argument("--ticket-id", type=int, required=True)
+    ap.add_argument("--tecnicos", required=True, help="ids de usuarios TECNICO separados por coma")
+    ap.add_argument("--rondas", type=int, default=20)
+    args = ap.parse_args()
+    tecnicos = [int(x) for x in args.tecnicos.split(",") if x.strip()]
+
+    fallos, lat_total = 0, []
+    for i in range(args.rondas):
+        reset(args.ticket_id)
+        codigos, lat = ronda(args.ticket_id, tecnicos)
+        lat_total += lat
+        if codigos[200] != 1 or codigos[409] != len(tecnicos) - 1:
+            fallos += 1
+            print(f"ronda {i}: {dict(codigos)}")
+
+    lat_total.sort()
+    p50 = lat_total[len(lat_total) // 2]
+    p95 = lat_total[int(len(lat_total) * 0.95) - 1]
+    print(f"{args.rondas} rondas × {len(tecnicos)} técnicos · p50={p50:.1f} ms p95={p95:.1f} ms · "
+          f"rondas con más de un ganador o sin ganador: {fallos}")
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == "__main__":
+    main()
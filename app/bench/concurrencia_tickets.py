@@ -0,0 +1,66 @@
+# bench/concurrencia_tickets.py — POST /api/tickets concurrentes del mismo usuario
+#
+# Uso (desde app/, contra una BD de desarrollo):
+#   python -m bench.concurrencia_tickets --user-id 7 --threads 20
+#
+# Lanza N envíos simultáneos con el test client de Flask para un SOLICITANTE
+# existente (con área asignada y sin encuestas pendientes) y comprueba que el
+# total de tickets del usuario nunca supera MAX_TOTAL_TICKETS.
+import argparse, sys, threading
+from collections import Counter
+
+from app import app, conexion, MAX_TOTAL_TICKETS
+
+
+def total_tickets(uid):
+    with app.app_context():
+        cur = conexion.connection.cursor()
+        try:
+            cur.execute("SELECT COUNT(*) AS c FROM tickets WHERE usuario_id=%s", (uid,))
+            return int(cur.fetchone()["c"])
+        finally:
+            cur.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Carrera de creación de tickets")
+    ap.add_argument("--user-id", type=int, required=True)
+    ap.add_argument("--threads", type=int, default=20)
+    args = ap.parse_args()
+
+    antes = total_tickets(args.user_id)
+    permitidos = max(0, MAX_TOTAL_TICKETS - antes)
+    barrera = threading.Barrier(args.threads)
+    codigos = Counter()
+    lock = threading.Lock()
+
+    def enviar(i):
+        client = app.test_client()
+        with client.session_transaction() as s:
+            s["user_id"] = args.user_id
+            s["role"] = "SOLICITANTE"
+        barrera.wait()
+        r = client.post("/api/tickets", json={
+            "tipo": "Prueba de concurrencia",
+            "descripcion": f"envío {i}",
+            "solicitante_nombre": "bench",
+        })
+        with lock:
+            codigos[r.status_code] += 1
+
+    hilos = [threading.Thread(target=enviar, args=(i,)) for i in range(args.threads)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    despues = total_tickets(args.user_id)
+    print(f"límite={MAX_TOTAL_TICKETS} antes={antes} después={despues} respuestas={dict(codigos)}")
+
+    ok = despues <= max(antes, MAX_TOTAL_TICKETS) and codigos[201] == permitidos
+    print("OK: el límite se respetó" if ok else "FALLO: se rebasó el límite")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
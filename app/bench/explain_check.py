@@ -0,0 +1,185 @@
+# bench/explain_check.py — EXPLAIN de cada consulta que ejecutan las rutas
+#
+# Uso (desde app/):
+#   python -m bench.explain_check --tickets 20000
+#
+# Crea una base temporal (BENCH_DB, por defecto madi_explain) en el MySQL de
+# MYSQL_HOST/MYSQL_USER/MYSQL_PASSWORD (ver bench/seed.py) y recorre las
+# rutas con el test client de Flask registrando cada sentencia. Luego ejecuta
+# EXPLAIN de cada una y falla (exit 1) si alguna recorre completa (type=ALL)
+# una tabla grande.
+import argparse, os, sys
+from collections import defaultdict
+
+import MySQLdb
+import MySQLdb.cursors
+
+BENCH_DB = os.getenv("BENCH_DB", "madi_explain")
+os.environ["MYSQL_DB"] = BENCH_DB  # antes de importar app: config lee el entorno
+
+from bench.seed import PASSWORD, connect, drop, seed  # noqa: E402
+
+# Tablas que crecen con el uso; catálogos y rollups acotados no cuentan
+BIG_TABLES = {"tickets", "ticket_tecnicos", "ticket_notas", "ticket_attachments",
+              "encuestas", "encuesta_respuestas", "users"}
+
+
+class RecordingCursor(MySQLdb.cursors.DictCursor):
+    """DictCursor que recuerda cada sentencia distinta y la ruta que la lanzó."""
+    seen = {}
+
+    def execute(self, query, args=None):
+        # Solo lo que corre dentro de una petición: los comandos CLI (rebuilds) no cuentan
+        from flask import has_request_context, request
+        if has_request_context():
+            key = " ".join(str(query).split())
+            RecordingCursor.seen.setdefault(key, (query, args, request.endpoint))
+        return super().execute(query, args)
+
+
+def ids_para_rutas(datos):
+    """Técnico, ticket abierto, ticket cerrado sin encuesta con su dueño y un solicitante vacío."""
+    nombres = dict(datos["solicitantes"])
+    # el primer solicitante concentra tickets: sus listados tienen varias páginas
+    principal = datos["solicitantes"][0][0]
+    cerrado, dueno = next((p for p in datos["sin_encuesta"] if p[1] == principal),
+                          datos["sin_encuesta"][0])
+    return dict(tecnico=datos["tecnicos"][0][1], abierto=datos["abiertos"][0],
+                cerrado=cerrado, solicitante=nombres[dueno], nuevo=datos["vacios"][0][1])
+
+
+def client_for(app, username):
+    c = app.test_client()
+    r = c.post("/login", json={"user": username, "pass": PASSWORD})
+    assert r.status_code == 200, (username, r.status_code, r.get_data(as_text=True))
+    return c
+
+
+def exercise(app, ids):
+    """Recorre las rutas de lectura y algunas escrituras de cada rol."""
+    checks = []
+
+    def hit(c, method, url, **kw):
+        r = getattr(c, method)(url, **kw)
+        checks.append((method.upper(), url, r.status_code))
+        return r
+
+    tec = client_for(app, ids["tecnico"])
+    for scope in ("disponibles", "asignados", "historial"):
+        r = hit(tec, "get", f"/api/tecnico/tickets?scope={scope}")
+        nxt = r.headers.get("X-Next-Cursor")
+        if nxt:
+            hit(tec, "get", f"/api/tecnico/tickets?scope={scope}&cursor={nxt}")
+        hit(tec, "get", f"/api/tecnico/tickets?scope={scope}&q=Asunto 1")
+    hit(tec, "get", "/api/tecnico/dashboard")
+    hit(tec, "get", "/api/tecnicos")
+    hit(tec, "get", f"/api/tecnico/tickets/{ids['abierto']}")
+    hit(tec, "get", f"/api/tecnico/tickets/{ids['abierto']}?notes_since=1")
+    hit(tec, "post", f"/api/tecnico/tickets/{ids['abierto']}/tomar?modo=cas")
+    hit(tec, "post", f"/api/tecnico/tickets/{ids['abierto']}/nota", json={"texto": "bench"})
+    hit(tec, "post", f"/api/tecnico/tickets/{ids['abierto']}/asignar", json={"usuario_ids": [3, 4]})
+    hit(tec, "patch", f"/api/tecnico/tickets/{ids['abierto']}/estado",
+        json={"estado": "RESUELTO", "nota": "bench"})
+    hit(tec, "post", "/api/tecnico/tickets/bulk",
+        json={"accion": "nota", "ticket_ids": [1, 2, 3], "texto": "bench"})
+
+    sol = client_for(app, ids["solicitante"])
+    hit(sol, "get", "/api/session/me")
+    hit(sol, "get", "/api/tipos-solicitud")
+    hit(sol, "get", "/api/sugerencias?tipo_id=1")
+    hit(sol, "get", "/api/sugerencias?tipo=tipo-1")
+    for estado in ("", "FINALIZADOS", "RESUELTO"):
+        r = hit(sol, "get", f"/api/mis-tickets?estado={estado}")
+        nxt = r.headers.get("X-Next-Cursor")
+        if nxt:
+            hit(sol, "get", f"/api/mis-tickets?estado={estado}&cursor={nxt}")
+    hit(sol, "get", "/api/tickets/total/limit")
+    hit(sol, "get", "/api/solicitante/overview")
+    hit(sol, "get", "/api/encuestas/pending")
+    hit(sol, "get", f"/solicitante/encuesta/{ids['cerrado']}")
+    hit(sol, "get", f"/api/solicitante/tickets/{ids['cerrado']}/evidencias")
+    hit(sol, "get", f"/api/solicitante/tickets/{ids['cerrado']}/detalle")
+    hit(sol, "post", "/api/encuestas", data={"ticket_id": ids["cerrado"], "q_sugerencias": "bench",
+                                             "q_rapidez": "5", "p2": "4"})
+
+    nuevo = client_for(app, ids["nuevo"])
+    hit(nuevo, "post", "/api/tickets", json={"tipo": "Tipo 1", "descripcion": "bench",
+                                            "solicitante_nombre": "bench"})
+
+    adm = client_for(app, "admin")
+    hit(adm, "get", "/api/admin/metrics")
+    hit(adm, "get", "/api/admin/surveys")
+    hit(adm, "get", "/api/admin/surveys?area_id=1")
+    hit(adm, "get", "/api/admin/logs?limit=50")
+    return checks
+
+
+def explain_all(seen):
+    """[(endpoint, tabla, filas, sql)] de las sentencias con type=ALL sobre tablas grandes."""
+    conn = connect(BENCH_DB)
+    cur = conn.cursor()
+    malos, revisadas = [], 0
+    try:
+        for query, args, endpoint in seen.values():
+            verb = str(query).lstrip().split(None, 1)[0].upper()
+            if verb not in ("SELECT", "UPDATE", "DELETE", "INSERT"):
+                continue
+            if verb == "INSERT" and "SELECT" not in str(query).upper():
+                continue
+            try:
+                cur.execute("EXPLAIN " + str(query), args)
+            except MySQLdb.Error as e:
+                print(f"  (sin EXPLAIN) {endpoint}: {e}")
+                continue
+            revisadas += 1
+            for row in cur.fetchall() or []:
+                tabla = row.get("table") or ""
+                if row.get("type") == "ALL" and tabla in BIG_TABLES:
+                    malos.append((endpoint, tabla, row.get("rows"), " ".join(str(query).split())))
+    finally:
+        cur.close()
+        conn.close()
+    return malos, revisadas
+
+
+def main():
+    ap = argparse.ArgumentParser(description="EXPLAIN de las consultas de las rutas")
+    ap.add_argument("--tickets", type=int, default=20000)
+    ap.add_argument("--keep", action="store_true", help="No borra la base al terminar.")
+    args = ap.parse_args()
+
+    print(f"Sembrando {BENCH_DB} con {args.tickets} tickets…")
+    ids = ids_para_rutas(seed(BENCH_DB, tickets=args.tickets))
+
+    from app import app
+    app.config["MYSQL_CURSORCLASS"] = RecordingCursor
+    app.config["TESTING"] = True
+    runner = app.test_cli_runner()
+    for cmd in ("metrics-rebuild", "surveys-migrate"):
+        res = runner.invoke(args=[cmd])
+        print(res.output.strip())
+
+    checks = exercise(app, ids)
+    fallidas = [c for c in checks if c[2] >= 500]
+    for method, url, code in fallidas:
+        print(f"  {code} {method} {url}")
+
+    malos, revisadas = explain_all(RecordingCursor.seen)
+    por_ruta = defaultdict(list)
+    for endpoint, tabla, filas, sql in malos:
+        por_ruta[endpoint].append((tabla, filas, sql))
+    for endpoint, items in sorted(por_ruta.items()):
+        print(f"\n[{endpoint}]")
+        for tabla, filas, sql in items:
+            print(f"  type=ALL en {tabla} (~{filas} filas): {sql[:160]}")
+
+    print(f"\n{len(checks)} peticiones, {revisadas} sentencias con EXPLAIN, "
+          f"{len(malos)} recorridos completos, {len(fallidas)} respuestas 5xx")
+
+    if not args.keep:
+        drop(BENCH_DB)
+    sys.exit(1 if malos or fallidas else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# bench/json_bench.py — Micro-benchmark de la serialización de listados
+#
+# Uso (desde app/):
+#   python -m bench.json_bench --rows 300 --desc 1200
+#
+# Compara, sobre filas sintéticas con la forma de un listado de tickets, el
+# camino anterior (serialize_rows + jsonify del proveedor de Flask) con
+# FastJSONProvider: jsonify, streaming por tramos y, si orjson está
+# instalado, el mismo proveedor con json estándar. No necesita base de datos.
+import argparse, json, random, statistics, time
+from datetime import datetime, date, timedelta
+
+from flask import Flask, jsonify
+
+import fastjson
+from fastjson import FastJSONProvider
+
+
+def serialize_rows(rows):
+    """Helper previo: copia cada fila convirtiendo fechas con strftime."""
+    out = []
+    for r in rows:
+        d = {}
+        for k, v in r.items():
+            if isinstance(v, (datetime, date)):
+                d[k] = v.strftime("%Y-%m-%d %H:%M:%S")
+            else:
+                d[k] = v
+        out.append(d)
+    return out
+
+
+def filas(n, desc_len, seed=7):
+    rnd = random.Random(seed)
+    base = datetime(2025, 1, 1, 8, 0, 0)
+    palabras = ("impresora", "red", "correo", "equipo", "no", "enciende", "acceso", "área", "urgente")
+    rows = []
+    for i in range(n):
+        texto = ""
+        while len(texto) < desc_len:
+            texto += rnd.choice(palabras) + " "
+        creado = base + timedelta(minutes=37 * i)
+        rows.append({
+            "id": 100000 - i,
+            "asunto": f"Tipo {i % 12}",
+            "descripcion": texto[:desc_len],
+            "estado": rnd.choice(("PENDIENTE", "EN_CURSO", "RESUELTO")),
+            "creado_en": creado,
+            "cerrado_en": creado + timedelta(hours=3) if i % 3 == 0 else None,
+            "solicitante_nombre": f"Solicitante {i}",
+            "area": f"Área {i % 30}",
+            "asignados": "tec001, tec002" if i % 2 else None,
+        })
+    return rows
+
+
+def medir(fn, repeat):
+    fn()  # calentamiento
+    tiempos = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(tiempos), min(tiempos)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Micro-benchmark de serialización JSON")
+    ap.add_argument("--rows", type=int, default=300)
+    ap.add_argument("--desc", type=int, default=1200, help="Caracteres de descripcion por fila.")
+    ap.add_argument("--repeat", type=int, default=200)
+    ap.add_argument("--out", default=None, help="Ruta del JSON de resultados.")
+    args = ap.parse_args()
+
+    rows = filas(args.rows, args.desc)
+    viejo = Flask("viejo")
+    nuevo = Flask("nuevo")
+    nuevo.json = FastJSONProvider(nuevo)
+
+    # Mismo contenido (salvo orden de claves) en ambos caminos
+    with viejo.app_context():
+        ref = json.loads(jsonify(serialize_rows(rows)).get_data())
+    with nuevo.app_context():
+        assert json.loads(jsonify(rows).get_data()) == ref
+        assert json.loads(b"".join(nuevo.json.iter_array(rows))) == ref
+
+    casos = {}
+
+    def anterior():
+        with viejo.app_context():
+            jsonify(serialize_rows(rows)).get_data()
+    casos["serialize_rows + jsonify"] = anterior
+
+    def rapido():
+        with nuevo.app_context():
+            jsonify(rows).get_data()
+    casos[f"FastJSONProvider ({'orjson' if fastjson.orjson else 'json'})"] = rapido
+
+    def stream():
+        for _ in nuevo.json.iter_array(rows):
+            pass
+    casos["FastJSONProvider stream"] = stream
+
+    resultados = {}
+    for nombre, fn in casos.items():
+        resultados[nombre] = medir(fn, args.repeat)
+
+    if fastjson.orjson is not None:
+        guardado, fastjson.orjson = fastjson.orjson, None
+        try:
+            resultados["FastJSONProvider (json, sin orjson)"] = medir(rapido, args.repeat)
+        finally:
+            fastjson.orjson = guardado
+
+    base = resultados["serialize_rows + jsonify"][0]
+    tam = len(jsonify_size(nuevo, rows))
+    print(f"{args.rows} filas, descripcion de {args.desc} caracteres, {tam / 1024:.0f} KB de JSON")
+    for nombre, (mediana, minimo) in resultados.items():
+        print(f"  {nombre:38s} mediana {mediana:7.2f} ms  mín {minimo:7.2f} ms  x{base / mediana:4.1f}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump({"rows": args.rows, "desc": args.desc, "bytes": tam,
+                       "resultados": {k: {"mediana_ms": round(m, 3), "min_ms": round(n, 3)}
+                                      for k, (m, n) in resultados.items()}},
+                      fh, indent=2, ensure_ascii=False)
+
+
+def jsonify_size(app, rows):
+    with app.app_context():
+        return jsonify(rows).get_data()
+
+
+if __name__ == "__main__":
+    main()
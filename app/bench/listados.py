@@ -0,0 +1,216 @@
+# bench/listados.py — subconsultas correlacionadas vs. página + IN (...) por lote
+#
+# Uso (desde app/):
+#   python -m bench.listados --tickets 10000 100000 --page 50 --reps 20
+#
+# Crea una base temporal (BENCH_DB, por defecto madi_bench) en el MySQL
+# configurado por MYSQL_HOST/MYSQL_USER/MYSQL_PASSWORD, siembra tickets,
+# técnicos y encuestas, y mide ambas variantes del listado del técnico
+# (scope "asignados") y de /api/mis-tickets.
+import argparse, os, random, statistics, time
+from datetime import datetime, timedelta
+
+import MySQLdb
+import MySQLdb.cursors
+
+from app import _merge_tecnicos
+
+BENCH_DB = os.getenv("BENCH_DB", "madi_bench")
+
+SCHEMA = [
+    "CREATE TABLE areas (id INT PRIMARY KEY AUTO_INCREMENT, nombre VARCHAR(120))",
+    "CREATE TABLE users (id INT PRIMARY KEY AUTO_INCREMENT, username VARCHAR(80))",
+    """CREATE TABLE tickets (
+         id INT PRIMARY KEY AUTO_INCREMENT, usuario_id INT, area_id INT,
+         solicitante_nombre VARCHAR(120), asunto VARCHAR(180), estado VARCHAR(20),
+         creado_en DATETIME,
+         KEY ix_usuario (usuario_id, estado, creado_en),
+         KEY ix_estado (estado, creado_en))""",
+    """CREATE TABLE ticket_tecnicos (
+         ticket_id INT, user_id INT, creado_en DATETIME,
+         PRIMARY KEY (ticket_id, user_id), KEY ix_user (user_id, ticket_id))""",
+    "CREATE TABLE encuestas (id INT PRIMARY KEY AUTO_INCREMENT, ticket_id INT, KEY ix_ticket (ticket_id))",
+]
+
+OLD_TECNICO = """
+    SELECT t.id, t.asunto, t.estado, t.creado_en, t.solicitante_nombre, a.nombre AS area,
+           (SELECT GROUP_CONCAT(u.username ORDER BY u.username SEPARATOR ', ')
+              FROM ticket_tecnicos tt JOIN users u ON u.id = tt.user_id
+             WHERE tt.ticket_id = t.id) AS asignados
+    FROM tickets t
+    LEFT JOIN areas a ON a.id = t.area_id
+    JOIN ticket_tecnicos mine ON mine.ticket_id = t.id AND mine.user_id = %s
+    WHERE t.estado IN ('PENDIENTE','EN_CURSO')
+    ORDER BY t.creado_en DESC, t.id DESC
+    LIMIT %s
+"""
+
+NEW_TECNICO = """
+    SELECT t.id, t.asunto, t.estado, t.creado_en, t.solicitante_nombre, a.nombre AS area
+    FROM tickets t
+    LEFT JOIN areas a ON a.id = t.area_id
+    JOIN ticket_tecnicos mine ON mine.ticket_id = t.id AND mine.user_id = %s
+    WHERE t.estado IN ('PENDIENTE','EN_CURSO')
+    ORDER BY t.creado_en DESC, t.id DESC
+    LIMIT %s
+"""
+
+OLD_MIS = """
+    SELECT t.id, t.asunto, t.estado, t.creado_en, t.solicitante_nombre, a.nombre AS area,
+           (SELECT u.username FROM ticket_tecnicos tt JOIN users u ON u.id = tt.user_id
+             WHERE tt.ticket_id = t.id ORDER BY u.username ASC LIMIT 1) AS tecnico,
+           (SELECT GROUP_CONCAT(u2.username ORDER BY u2.username SEPARATOR ', ')
+              FROM ticket_tecnicos tt2 JOIN users u2 ON u2.id = tt2.user_id
+             WHERE tt2.ticket_id = t.id) AS tecnicos,
+           (SELECT 1 FROM encuestas e WHERE e.ticket_id = t.id LIMIT 1) AS encuestada
+    FROM tickets t
+    LEFT JOIN areas a ON a.id = t.area_id
+    WHERE t.usuario_id = %s AND t.estado IN ('RESUELTO','CANCELADO')
+    ORDER BY t.creado_en DESC, t.id DESC
+    LIMIT %s
+"""
+
+NEW_MIS = """
+    SELECT t.id, t.asunto, t.estado, t.creado_en, t.solicitante_nombre, a.nombre AS area
+    FROM tickets t
+    LEFT JOIN areas a ON a.id = t.area_id
+    WHERE t.usuario_id = %s AND t.estado IN ('RESUELTO','CANCELADO')
+    ORDER BY t.creado_en DESC, t.id DESC
+    LIMIT %s
+"""
+
+
+class CountingCursor(MySQLdb.cursors.DictCursor):
+    """DictCursor que cuenta las sentencias ejecutadas."""
+    executed = 0
+
+    def execute(self, query, args=None):
+        CountingCursor.executed += 1
+        return super().execute(query, args)
+
+
+def connect(db=None):
+    kw = dict(
+        host=os.getenv("MYSQL_HOST", "localhost"),
+        user=os.getenv("MYSQL_USER", "root"),
+        passwd=os.getenv("MYSQL_PASSWORD", ""),
+        cursorclass=CountingCursor,
+        charset="utf8mb4",
+    )
+    if db:
+        kw["db"] = db
+    return MySQLdb.connect(**kw)
+
+
+def seed(n_tickets, n_tecnicos=40, n_solicitantes=500):
+    conn = connect()
+    cur = conn.cursor()
+    cur.execute(f"DROP DATABASE IF EXISTS {BENCH_DB}")
+    cur.execute(f"CREATE DATABASE {BENCH_DB}")
+    cur.execute(f"USE {BENCH_DB}")
+    for ddl in SCHEMA:
+        cur.execute(ddl)
+
+    rnd = random.Random(1234)
+    cur.executemany("INSERT INTO areas (nombre) VALUES (%s)", [(f"Área {i}",) for i in range(30)])
+    cur.executemany("INSERT INTO users (username) VALUES (%s)",
+                    [(f"tec{i:03d}",) for i in range(n_tecnicos)] +
+                    [(f"sol{i:04d}",) for i in range(n_solicitantes)])
+
+    base = datetime(2024, 1, 1)
+    estados = ["PENDIENTE", "EN_CURSO", "RESUELTO", "CANCELADO"]
+    tickets, asign, encs = [], [], []
+    for tid in range(1, n_tickets + 1):
+        # el solicitante 1 concentra el 5% para que su listado tenga páginas completas
+        uid = n_tecnicos + (1 if rnd.random() < 0.05 else rnd.randint(1, n_solicitantes))
+        est = rnd.choice(estados)
+        tickets.append((uid, rnd.randint(1, 30), f"Solicitante {uid}", f"Asunto {tid}", est,
+                        base + timedelta(minutes=tid)))
+        if est != "PENDIENTE" or rnd.random() < 0.5:
+            for tec in rnd.sample(range(1, n_tecnicos + 1), rnd.randint(1, 3)):
+                asign.append((tid, tec, base + timedelta(minutes=tid + 5)))
+        if est in ("RESUELTO", "CANCELADO") and rnd.random() < 0.7:
+            encs.append((tid,))
+
+    for i in range(0, len(tickets), 5000):
+        cur.executemany("""INSERT INTO tickets
+            (usuario_id, area_id, solicitante_nombre, asunto, estado, creado_en)
+            VALUES (%s,%s,%s,%s,%s,%s)""", tickets[i:i + 5000])
+    for i in range(0, len(asign), 5000):
+        cur.executemany("INSERT IGNORE INTO ticket_tecnicos (ticket_id, user_id, creado_en) VALUES (%s,%s,%s)",
+                        asign[i:i + 5000])
+    for i in range(0, len(encs), 5000):
+        cur.executemany("INSERT INTO encuestas (ticket_id) VALUES (%s)", encs[i:i + 5000])
+    conn.commit()
+    cur.execute("ANALYZE TABLE tickets, ticket_tecnicos, encuestas")
+    cur.fetchall()
+    cur.close()
+    conn.close()
+    return n_tecnicos + 1
+
+
+def measure(fn, reps):
+    times, queries = [], 0
+    for _ in range(reps):
+        CountingCursor.executed = 0
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+        queries = CountingCursor.executed
+    return statistics.median(times), max(times), queries
+
+
+def run(n_tickets, page, reps):
+    solicitante = seed(n_tickets)
+    conn = connect(BENCH_DB)
+    tecnico = 1
+
+    def old_tecnico():
+        cur = conn.cursor()
+        cur.execute(OLD_TECNICO, (tecnico, page))
+        cur.fetchall()
+        cur.close()
+
+    def new_tecnico():
+        cur = conn.cursor()
+        cur.execute(NEW_TECNICO, (tecnico, page))
+        _merge_tecnicos(cur, list(cur.fetchall()))
+        cur.close()
+
+    def old_mis():
+        cur = conn.cursor()
+        cur.execute(OLD_MIS, (solicitante, page))
+        cur.fetchall()
+        cur.close()
+
+    def new_mis():
+        cur = conn.cursor()
+        cur.execute(NEW_MIS, (solicitante, page))
+        _merge_tecnicos(cur, list(cur.fetchall()), key="tecnicos", principal="tecnico", encuestas=True)
+        cur.close()
+
+    print(f"\n== {n_tickets:,} tickets · página {page} · {reps} repeticiones ==")
+    print(f"{'listado':<28}{'sentencias':>11}{'p50 ms':>10}{'max ms':>10}")
+    for name, fn in (("tecnico/asignados (antes)", old_tecnico),
+                     ("tecnico/asignados (lote)", new_tecnico),
+                     ("mis-tickets (antes)", old_mis),
+                     ("mis-tickets (lote)", new_mis)):
+        fn()  # calentar caché de InnoDB
+        p50, worst, queries = measure(fn, reps)
+        print(f"{name:<28}{queries:>11}{p50:>10.2f}{worst:>10.2f}")
+    print("Nota: 'antes' es 1 sentencia pero ejecuta 1-3 subconsultas dependientes por fila.")
+    conn.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de listados: subconsultas vs. lote")
+    ap.add_argument("--tickets", type=int, nargs="+", default=[10_000, 100_000])
+    ap.add_argument("--page", type=int, default=50)
+    ap.add_argument("--reps", type=int, default=20)
+    args = ap.parse_args()
+    for n in args.tickets:
+        run(n, args.page, args.reps)
+
+
+if __name__ == "__main__":
+    main()
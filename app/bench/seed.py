@@ -0,0 +1,136 @@
+# bench/seed.py — Base de pruebas sembrada para los benchmarks
+#
+# Crea BENCH_DB desde cero en el MySQL/MariaDB de MYSQL_HOST/MYSQL_USER/
+# MYSQL_PASSWORD, le aplica migrations/ y la llena con volúmenes configurables
+# de usuarios, tickets, notas, adjuntos y encuestas. La semilla es fija: dos
+# corridas con los mismos parámetros generan los mismos datos.
+import os, random
+from datetime import datetime, timedelta
+
+import MySQLdb
+import MySQLdb.cursors
+from werkzeug.security import generate_password_hash
+
+import migrations
+
+PASSWORD = "bench"
+ESTADOS = ("PENDIENTE", "EN_CURSO", "RESUELTO", "CANCELADO")
+
+
+def connect(db=None):
+    kw = dict(
+        host=os.getenv("MYSQL_HOST", "localhost"),
+        user=os.getenv("MYSQL_USER", "root"),
+        passwd=os.getenv("MYSQL_PASSWORD", ""),
+        port=int(os.getenv("MYSQL_PORT", "3306")),
+        cursorclass=MySQLdb.cursors.DictCursor,
+        charset="utf8mb4",
+    )
+    if db:
+        kw["db"] = db
+    return MySQLdb.connect(**kw)
+
+
+def drop(db):
+    conn = connect()
+    cur = conn.cursor()
+    cur.execute(f"DROP DATABASE IF EXISTS {db}")
+    cur.close()
+    conn.close()
+
+
+def seed(db, tickets=20000, tecnicos=40, solicitantes=500, vacios=50,
+         notas=1.0, adjuntos=0.3, encuestas=0.7, seed_value=1234):
+    """
+    Siembra `db` y devuelve los ids útiles para recorrer las rutas:
+      admin, tecnicos [(id, username)], solicitantes [(id, username)] con tickets,
+      vacios [(id, username)] sin tickets (pueden crear), abiertos [ticket_id]
+      PENDIENTE sin asignar, sin_encuesta [(ticket_id, usuario_id)] cerrados sin encuesta.
+    `notas` es el promedio de notas por ticket atendido; `adjuntos` y
+    `encuestas` son proporciones (de tickets y de tickets cerrados).
+    """
+    drop(db)
+    conn = connect()
+    cur = conn.cursor()
+    cur.execute(f"CREATE DATABASE {db} CHARACTER SET utf8mb4")
+    cur.close()
+    conn.close()
+
+    conn = connect(db)
+    migrations.migrate(conn, echo=lambda *_: None)
+    cur = conn.cursor()
+    cur.execute("SELECT id, nombre FROM roles")
+    roles = {r["nombre"]: r["id"] for r in cur.fetchall()}
+
+    rnd = random.Random(seed_value)
+    pw = generate_password_hash(PASSWORD)
+    cur.executemany("INSERT INTO areas (nombre) VALUES (%s)", [(f"Área {i}",) for i in range(30)])
+    cur.executemany("INSERT INTO tipos_solicitud (nombre, slug, orden) VALUES (%s, %s, %s)",
+                    [(f"Tipo {i}", f"tipo-{i}", i) for i in range(12)])
+    cur.executemany("INSERT INTO sugerencias_problema (tipo_id, texto, orden) VALUES (%s, %s, %s)",
+                    [(1 + i % 12, f"Sugerencia {i}", i) for i in range(60)])
+
+    users = [("admin", pw, roles["ADMIN"], None)]
+    users += [(f"tec{i:03d}", pw, roles["TECNICO"], None) for i in range(tecnicos)]
+    users += [(f"sol{i:05d}", pw, roles["SOLICITANTE"], 1 + i % 30) for i in range(solicitantes + vacios)]
+    cur.executemany("INSERT INTO users (username, password_hash, role_id, area_id) VALUES (%s,%s,%s,%s)",
+                    users)
+    cur.execute("SELECT id, username FROM users ORDER BY id")
+    ids = [(r["id"], r["username"]) for r in cur.fetchall()]
+    admin, tecs_u = ids[0], ids[1:1 + tecnicos]
+    sols_u, vacios_u = ids[1 + tecnicos:1 + tecnicos + solicitantes], ids[1 + tecnicos + solicitantes:]
+    tec_ids = [i for i, _ in tecs_u]
+
+    base = datetime.now() - timedelta(minutes=tickets + 60)
+    filas, asign, notas_f, adj_f, encs, abiertos, sin_encuesta = [], [], [], [], [], [], []
+    for tid in range(1, tickets + 1):
+        # el primer solicitante concentra el 5% para que su listado tenga páginas completas
+        uid = sols_u[0][0] if rnd.random() < 0.05 else rnd.choice(sols_u)[0]
+        est = rnd.choice(ESTADOS)
+        creado = base + timedelta(minutes=tid)
+        tecs = []
+        if est != "PENDIENTE" or rnd.random() < 0.5:
+            tecs = rnd.sample(tec_ids, min(len(tec_ids), rnd.randint(1, 3)))
+        cerrado = creado + timedelta(minutes=30) if est in ("RESUELTO", "CANCELADO") else None
+        filas.append((uid, rnd.randint(1, 30), f"Solicitante {uid}", f"Asunto {tid}",
+                      f"Descripción del ticket {tid}", est, tecs[0] if tecs else None, creado, cerrado))
+        for tec in tecs:
+            asign.append((tid, tec, creado + timedelta(minutes=5)))
+        if tecs:
+            for k in range(int(notas) + (1 if rnd.random() < notas % 1 else 0)):
+                notas_f.append((tid, rnd.choice(tecs), f"Nota {k} del ticket {tid}",
+                                creado + timedelta(minutes=10 + k)))
+        if rnd.random() < adjuntos:
+            adj_f.append((tid, f"{tid:064x}.jpg", f"{tid:064x}.jpg"))
+        if cerrado:
+            if rnd.random() < encuestas:
+                encs.append((tid, rnd.randint(1, 5), "si" if est == "RESUELTO" else "no",
+                             "SUGERENCIAS:\nninguna", cerrado + timedelta(hours=1)))
+            else:
+                sin_encuesta.append((tid, uid))
+        elif est == "PENDIENTE" and not tecs:
+            abiertos.append(tid)
+
+    def bulk(sql, rows):
+        for i in range(0, len(rows), 5000):
+            cur.executemany(sql, rows[i:i + 5000])
+
+    bulk("""INSERT INTO tickets (usuario_id, area_id, solicitante_nombre, asunto, descripcion,
+                                 estado, asignado_a, creado_en, cerrado_en)
+            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)""", filas)
+    bulk("INSERT INTO ticket_tecnicos (ticket_id, user_id, creado_en) VALUES (%s,%s,%s)", asign)
+    bulk("INSERT INTO ticket_notas (ticket_id, usuario_id, texto, creado_en) VALUES (%s,%s,%s,%s)", notas_f)
+    bulk("INSERT INTO ticket_attachments (ticket_id, ruta, archivo) VALUES (%s,%s,%s)", adj_f)
+    bulk("""INSERT INTO encuestas (ticket_id, p2, atendida, descripcion, creado_en)
+            VALUES (%s,%s,%s,%s,%s)""", encs)
+    conn.commit()
+    cur.execute("ANALYZE TABLE tickets, ticket_tecnicos, ticket_notas, ticket_attachments, encuestas, users")
+    cur.fetchall()
+    cur.close()
+    conn.close()
+
+    return dict(admin=admin, tecnicos=tecs_u, solicitantes=sols_u, vacios=vacios_u,
+                abiertos=abiertos, sin_encuesta=sin_encuesta,
+                volumenes=dict(tickets=len(filas), asignaciones=len(asign), notas=len(notas_f),
+                               adjuntos=len(adj_f), encuestas=len(encs),
+                               usuarios=len(users)))
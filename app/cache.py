@@ -0,0 +1,83 @@
+# cache.py — Caché en proceso con TTL y expulsión LRU
+#
+# Pensado para catálogos casi estáticos (tipos de solicitud, sugerencias,
+# técnicos activos). Cada proceso/worker mantiene su propia copia; las
+# invalidaciones son locales al proceso.
+import threading, time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Caché clave→valor con caducidad (ttl, segundos) y tamaño máximo (maxsize);
+    al llenarse expulsa la entrada usada hace más tiempo.
+    """
+
+    def __init__(self, maxsize=256, ttl=300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = dict(hits=0, misses=0, expirations=0, evictions=0, invalidations=0)
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self._stats["misses"] += 1
+                return default
+            expires, value = item
+            if expires <= now:
+                del self._data[key]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return default
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def get_or_set(self, key, loader, ttl=None):
+        """Devuelve el valor cacheado o lo calcula con loader() y lo guarda."""
+        _miss = object()
+        value = self.get(key, _miss)
+        if value is _miss:
+            value = loader()
+            self.set(key, value, ttl)
+        return value
+
+    def discard(self, key) -> bool:
+        """Borra una clave concreta (de cualquier tipo); True si existía."""
+        with self._lock:
+            if self._data.pop(key, None) is None:
+                return False
+            self._stats["invalidations"] += 1
+            return True
+
+    def invalidate(self, prefix=None) -> int:
+        """Borra todo, o solo las claves (str) que empiezan por `prefix`."""
+        with self._lock:
+            if prefix is None:
+                keys = list(self._data)
+            else:
+                keys = [k for k in self._data if isinstance(k, str) and k.startswith(prefix)]
+            for k in keys:
+                del self._data[k]
+            self._stats["invalidations"] += len(keys)
+            return len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats, size=len(self._data), maxsize=self.maxsize, ttl=self.ttl)
+        total = out["hits"] + out["misses"]
+        out["hit_ratio"] = round(out["hits"] / total, 4) if total else 0.0
+        return out
@@ -0,0 +1,265 @@
+# db.py — Pool de conexiones MySQL con checkout por petición
+#
+# Sustituye a flask_mysqldb.MySQL manteniendo la misma API que usan las rutas
+# (`conexion.connection.cursor()`, `.commit()`, `.rollback()`), pero las
+# conexiones se reutilizan entre peticiones en lugar de abrirse y cerrarse
+# en cada contexto. Los cursores avisan de cada sentencia y su duración a los
+# oyentes registrados con add_query_listener (métricas, log de lentas).
+import threading, time
+from contextlib import contextmanager
+from queue import LifoQueue, Empty
+
+import MySQLdb
+import MySQLdb.cursors
+from flask import g
+
+
+class PoolTimeout(Exception):
+    """No hubo conexión libre dentro de MYSQL_POOL_TIMEOUT segundos."""
+
+
+class _TimedCursor:
+    """
+    Mezcla para la clase de cursor: mide execute/executemany y llama a cada
+    oyente con (sql, segundos). executemany cuenta como una sola sentencia
+    aunque MySQLdb la resuelva con varios execute.
+    """
+    _listeners = ()
+    _in_many = False
+
+    def execute(self, query, args=None):
+        if self._in_many:
+            return super().execute(query, args)
+        t0 = time.perf_counter()
+        try:
+            return super().execute(query, args)
+        finally:
+            self._notify(query, time.perf_counter() - t0)
+
+    def executemany(self, query, args):
+        t0 = time.perf_counter()
+        self._in_many = True
+        try:
+            return super().executemany(query, args)
+        finally:
+            self._in_many = False
+            self._notify(query, time.perf_counter() - t0)
+
+    def _notify(self, query, seconds):
+        for fn in self._listeners:
+            fn(query, seconds)
+
+
+class _Entry:
+    __slots__ = ("conn", "created", "last_used")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created = self.last_used = time.monotonic()
+
+
+class ConnectionPool:
+    """
+    Pool LIFO de conexiones MySQLdb.
+    - size: conexiones que se mantienen abiertas.
+    - max_overflow: conexiones extra temporales bajo carga (se cierran al devolverse).
+    - recycle: segundos de vida máxima de una conexión (-1 = sin límite).
+    - pre_ping: hace ping() antes de entregar una conexión ociosa.
+    - timeout: segundos de espera por una conexión antes de PoolTimeout.
+    """
+
+    def __init__(self, connect, size=5, max_overflow=10, recycle=3600, pre_ping=True, timeout=10.0):
+        self._connect = connect
+        self.size = size
+        self.max_overflow = max_overflow
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.timeout = timeout
+        self._idle = LifoQueue()
+        self._lock = threading.Lock()
+        self._open = 0
+        self._stats = dict(checkouts=0, timeouts=0, created=0, recycled=0,
+                           ping_failures=0, wait_ms=0.0)
+
+    # ---- ciclo de vida ----
+    def _new_entry(self):
+        conn = self._connect()
+        with self._lock:
+            self._stats["created"] += 1
+        return _Entry(conn)
+
+    def _discard(self, entry):
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._open -= 1
+
+    def _reserve_slot(self) -> bool:
+        with self._lock:
+            if self._open < self.size + self.max_overflow:
+                self._open += 1
+                return True
+            return False
+
+    def _fresh(self, entry):
+        """Descarta la conexión si superó `recycle` o no responde al ping."""
+        if self.recycle >= 0 and time.monotonic() - entry.created > self.recycle:
+            with self._lock:
+                self._stats["recycled"] += 1
+            return False
+        if self.pre_ping:
+            try:
+                entry.conn.ping()
+            except Exception:
+                with self._lock:
+                    self._stats["ping_failures"] += 1
+                return False
+        return True
+
+    def checkout(self):
+        t0 = time.monotonic()
+        deadline = t0 + self.timeout
+        while True:
+            nueva = False
+            try:
+                entry = self._idle.get_nowait()
+            except Empty:
+                if self._reserve_slot():
+                    try:
+                        entry = self._new_entry()
+                    except Exception:
+                        with self._lock:
+                            self._open -= 1
+                        raise
+                    nueva = True
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        with self._lock:
+                            self._stats["timeouts"] += 1
+                        raise PoolTimeout(f"Sin conexiones libres tras {self.timeout}s")
+                    try:
+                        entry = self._idle.get(timeout=remaining)
+                    except Empty:
+                        continue
+
+            if not nueva and not self._fresh(entry):
+                self._discard(entry)
+                continue
+
+            with self._lock:
+                self._stats["checkouts"] += 1
+                self._stats["wait_ms"] += (time.monotonic() - t0) * 1000
+            return entry
+
+    def checkin(self, entry):
+        try:
+            # Deja la conexión limpia (sin transacción abierta) para el siguiente uso
+            entry.conn.rollback()
+        except Exception:
+            self._discard(entry)
+            return
+        entry.last_used = time.monotonic()
+        with self._lock:
+            overflow = self._open > self.size
+        if overflow:
+            self._discard(entry)
+        else:
+            self._idle.put(entry)
+
+    def dispose(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except Empty:
+                return
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out["wait_ms"] = round(out["wait_ms"], 2)
+            out.update(size=self.size, max_overflow=self.max_overflow, open=self._open)
+        out["idle"] = self._idle.qsize()
+        out["in_use"] = out["open"] - out["idle"]
+        return out
+
+
+class MySQLPool:
+    """
+    Extensión Flask: una conexión del pool por petición en `conexion.connection`,
+    devuelta al pool en el teardown del contexto.
+    """
+
+    def __init__(self, app=None):
+        self.pool = None
+        self._listeners = []
+        self._timed = {}
+        if app is not None:
+            self.init_app(app)
+
+    def add_query_listener(self, fn):
+        """fn(sql, segundos) tras cada sentencia de cualquier cursor del pool."""
+        self._listeners.append(fn)
+
+    def _cursorclass(self, base):
+        cls = self._timed.get(base)
+        if cls is None:
+            cls = self._timed[base] = type(f"Timed{base.__name__}", (_TimedCursor, base),
+                                           {"_listeners": self._listeners})
+        return cls
+
+    def init_app(self, app):
+        cfg = app.config
+
+        def connect():
+            # MYSQL_CURSORCLASS: nombre en MySQLdb.cursors o la clase misma
+            cursorclass = cfg.get("MYSQL_CURSORCLASS", "DictCursor")
+            if isinstance(cursorclass, str):
+                cursorclass = getattr(MySQLdb.cursors, cursorclass)
+            cursorclass = self._cursorclass(cursorclass)
+            return MySQLdb.connect(
+                host=cfg["MYSQL_HOST"],
+                user=cfg["MYSQL_USER"],
+                passwd=cfg["MYSQL_PASSWORD"],
+                db=cfg["MYSQL_DB"],
+                port=int(cfg.get("MYSQL_PORT", 3306)),
+                charset=cfg.get("MYSQL_CHARSET", "utf8mb4"),
+                cursorclass=cursorclass,
+                connect_timeout=int(cfg.get("MYSQL_CONNECT_TIMEOUT", 10)),
+            )
+
+        self.pool = ConnectionPool(
+            connect,
+            size=int(cfg.get("MYSQL_POOL_SIZE", 5)),
+            max_overflow=int(cfg.get("MYSQL_POOL_MAX_OVERFLOW", 10)),
+            recycle=int(cfg.get("MYSQL_POOL_RECYCLE", 3600)),
+            pre_ping=bool(cfg.get("MYSQL_POOL_PRE_PING", True)),
+            timeout=float(cfg.get("MYSQL_POOL_TIMEOUT", 10)),
+        )
+        app.teardown_appcontext(self._teardown)
+
+    @property
+    def connection(self):
+        entry = g.get("_db_entry")
+        if entry is None:
+            entry = g._db_entry = self.pool.checkout()
+        return entry.conn
+
+    @contextmanager
+    def borrow(self):
+        """Conexión del pool fuera de una petición (hilos de fondo, CLI)."""
+        entry = self.pool.checkout()
+        try:
+            yield entry.conn
+        finally:
+            self.pool.checkin(entry)
+
+    def _teardown(self, exc):
+        entry = g.pop("_db_entry", None)
+        if entry is not None:
+            self.pool.checkin(entry)
+
+    def stats(self) -> dict:
+        return self.pool.stats()
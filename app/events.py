@@ -0,0 +1,100 @@
+# events.py — Bus de eventos en proceso para el stream SSE de tickets
+#
+# Las rutas publican después del COMMIT (ticket creado, tomado, cambio de
+# estado, nota) y cada conexión SSE recibe los eventos que le corresponden
+# según su filtro. Cada worker tiene su propio bus: con varios procesos, cada
+# cliente ve los eventos publicados en el proceso que atiende su stream.
+#
+# Cada stream abierto ocupa un hilo del worker mientras dura (el generador es
+# síncrono), o un greenlet si el worker es gevent con monkey patching: Queue y
+# Lock son las de la stdlib y ceden al hub. `max_subscribers` acota cuántos
+# acepta el proceso (app.py lo deriva de WEB_THREADS / SSE_ASYNC).
+import itertools, threading
+from collections import deque
+from queue import Queue, Full, Empty
+
+
+class BusFull(Exception):
+    """Se alcanzó max_subscribers: el stream debe rechazarse."""
+
+
+class Subscription:
+    def __init__(self, accepts, maxsize):
+        self.accepts = accepts
+        self.queue = Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def push(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except Full:
+            # Cliente lento: se descarta el más antiguo para no bloquear a quien publica
+            try:
+                self.queue.get_nowait()
+            except Empty:
+                pass
+            self.dropped += 1
+            self.queue.put_nowait(event)
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except Empty:
+            return None
+
+
+class EventBus:
+    """
+    Publicación/suscripción con historial corto (para Last-Event-ID).
+    Un evento es {"id", "type", "data", "owner"}; `owner` es el usuario_id del
+    solicitante del ticket y sirve para filtrar, no se envía al cliente.
+    """
+
+    def __init__(self, history=500, queue_size=100, max_subscribers=None):
+        self._ids = itertools.count(1)
+        self._history = deque(maxlen=history)
+        self._subs = set()
+        self._lock = threading.Lock()
+        self._queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.rejected = 0
+
+    def publish(self, type_, data, owner=None):
+        with self._lock:
+            event = {"id": next(self._ids), "type": type_, "data": data, "owner": owner}
+            self._history.append(event)
+            subs = list(self._subs)
+        for sub in subs:
+            if sub.accepts(event):
+                sub.push(event)
+        return event
+
+    def subscribe(self, accepts, last_id=None):
+        """
+        Registra un suscriptor; si hay last_id, reencola lo que se perdió.
+        BusFull si ya hay max_subscribers.
+        """
+        sub = Subscription(accepts, self._queue_size)
+        with self._lock:
+            if self.max_subscribers is not None and len(self._subs) >= self.max_subscribers:
+                self.rejected += 1
+                raise BusFull(self.max_subscribers)
+            self._subs.add(sub)
+            missed = [e for e in self._history if last_id is not None and e["id"] > last_id]
+        for event in missed:
+            if accepts(event):
+                sub.push(event)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subs.discard(sub)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "subscribers": len(self._subs),
+                "history": len(self._history),
+                "dropped": sum(s.dropped for s in self._subs),
+                "rejected": self.rejected,
+            }
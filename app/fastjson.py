@@ -0,0 +1,101 @@
+# fastjson.py — Proveedor JSON de Flask sin copias por fila y con arreglos en streaming
+#
+# Las filas del DictCursor se pasan tal cual a jsonify: datetime/date salen
+# como "YYYY-MM-DD HH:MM:SS" (el formato de siempre de las APIs) desde el
+# propio encoder, sin construir un dict nuevo por fila. Con orjson instalado
+# la codificación es nativa y va directo a bytes; sin él se usa json de la
+# biblioteca estándar con el mismo formato.
+#
+#   app.json = FastJSONProvider(app)
+#   return app.json.stream(rows)   # arreglo grande codificado por tramos
+#                                  # (las filas ya en memoria; el JSON no)
+import dataclasses, decimal, uuid
+from datetime import date, datetime
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se usa json estándar
+    orjson = None
+
+STREAM_CHUNK = 100
+
+if orjson is not None:
+    # datetime/date pasan por _default (orjson los escribiría en ISO con "T");
+    # claves no str (ids de área, estados) como hace json estándar
+    _ORJSON_OPTS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+def fmt_datetime(value) -> str:
+    """datetime/date → "YYYY-MM-DD HH:MM:SS" (una fecha sola, a medianoche)."""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ", timespec="seconds")
+    return value.isoformat() + " 00:00:00"
+
+
+def _default(o):
+    """Tipos que no son JSON nativo; los mismos que acepta el proveedor de Flask."""
+    if isinstance(o, date):  # incluye datetime
+        return fmt_datetime(o)
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    default = staticmethod(_default)
+    ensure_ascii = False
+    sort_keys = False
+
+    @property
+    def native(self) -> bool:
+        return orjson is not None
+
+    def dumps_bytes(self, obj) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(obj, default=_default, option=_ORJSON_OPTS)
+        return super().dumps(obj).encode("utf-8")
+
+    def dumps(self, obj, **kwargs) -> str:
+        if orjson is not None and not kwargs:
+            return self.dumps_bytes(obj).decode("utf-8")
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if orjson is None or (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)  # salida indentada
+        # Mismas formas que jsonify: un valor, varios (lista) o kwargs (dict)
+        if args and kwargs:
+            raise TypeError("app.json.response() takes either args or kwargs, not both")
+        if len(args) == 1:
+            obj = args[0]
+        else:
+            obj = list(args) if args else (kwargs or None)
+        return self._app.response_class(self.dumps_bytes(obj), mimetype=self.mimetype)
+
+    def iter_array(self, rows, chunk: int = STREAM_CHUNK):
+        """Genera el arreglo JSON de `rows` por tramos de `chunk` filas."""
+        yield b"["
+        for i in range(0, len(rows), chunk):
+            part = self.dumps_bytes(list(rows[i:i + chunk]))
+            yield (b"," if i else b"") + part[1:-1]
+        yield b"]"
+
+    def stream(self, rows, chunk: int = STREAM_CHUNK):
+        """
+        Respuesta con el arreglo codificado de forma incremental: el texto
+        JSON se genera y envía por tramos, sin armar el documento completo.
+        Las filas sí están en memoria (las rutas las traen con fetchall y las
+        paginan con LIMIT); lo que se ahorra es la copia codificada entera.
+        """
+        return self._app.response_class(self.iter_array(rows, chunk), mimetype=self.mimetype)
@@ -0,0 +1,242 @@
+# metrics.py — Métricas por ruta en formato Prometheus y log de consultas lentas
+#
+# Por cada petición se acumulan (en g) sentencias SQL, tiempo en BD, la
+# sentencia más lenta y el tiempo de login_required/role_required. Al cerrar
+# la petición se vuelcan a contadores e histogramas por endpoint que
+# GET /metrics expone en el formato de texto de Prometheus. Las sentencias
+# (y peticiones) que superan SLOW_QUERY_MS se registran en el log "metrics";
+# las sentencias además en un anillo en memoria. Cada proceso/worker lleva
+# sus propios contadores.
+import logging, threading, time
+from collections import deque
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+log = logging.getLogger(__name__)
+
+# Segundos: latencia de la petición
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Sentencias SQL por petición
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+BACKGROUND = "background"  # sentencias fuera de una petición (workers, CLI)
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, le in enumerate(self.buckets):
+            if value <= le:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        acc = 0
+        for le, n in zip(self.buckets, self.counts):
+            acc += n
+            yield f'{name}_bucket{{{labels},le="{le:g}"}} {acc}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f"{name}_sum{{{labels}}} {self.sum:.6f}"
+        yield f"{name}_count{{{labels}}} {self.count}"
+
+
+class _RequestStats:
+    __slots__ = ("start", "queries", "db_s", "auth_s", "slowest", "status")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_s = 0.0
+        self.auth_s = 0.0
+        self.slowest = (0.0, None)
+        self.status = None
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _sql_corto(sql, n=300) -> str:
+    return " ".join(str(sql).split())[:n]
+
+
+class Metrics:
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._requests = {}   # (endpoint, method, status) → n
+        self._latency = {}    # endpoint → _Histogram
+        self._queries = {}    # endpoint → _Histogram
+        self._db_s = {}       # endpoint → segundos en BD
+        self._auth_s = {}     # endpoint → segundos en login_required/role_required
+        self._slow_n = {}     # endpoint → sentencias lentas
+        self._bg = dict(queries=0, db_s=0.0)
+        self._gauges = []
+        self.server_timing = False
+        self.slow_ms = 200.0
+        self.slow_log = deque(maxlen=100)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.slow_ms = float(app.config.get("SLOW_QUERY_MS", 200))
+        self.slow_log = deque(maxlen=int(app.config.get("SLOW_QUERY_LOG_SIZE", 100)))
+        self.server_timing = bool(app.config.get("METRICS_SERVER_TIMING", False))
+        app.before_request(self._before)
+        app.after_request(self._after)
+        app.teardown_request(self._teardown)
+
+    # ---- por petición ----
+    @staticmethod
+    def _stats():
+        st = g.get("_metricas")
+        if st is None:
+            st = g._metricas = _RequestStats()
+        return st
+
+    def _before(self):
+        g._metricas = _RequestStats()
+
+    def _after(self, resp):
+        st = self._stats()
+        st.status = resp.status_code
+        if self.server_timing:
+            total = (time.perf_counter() - st.start) * 1000
+            resp.headers["Server-Timing"] = (
+                f'db;dur={st.db_s * 1000:.1f};desc="{st.queries} consultas", '
+                f"auth;dur={st.auth_s * 1000:.2f}, app;dur={total:.1f}"
+            )
+        return resp
+
+    def _teardown(self, exc):
+        st = g.pop("_metricas", None)
+        if st is None:
+            return
+        seconds = time.perf_counter() - st.start
+        endpoint = request.endpoint or "unmatched"
+        status = st.status if st.status is not None else 500
+        key = (endpoint, request.method, status)
+        with self._lock:
+            self._requests[key] = self._requests.get(key, 0) + 1
+            h = self._latency.get(endpoint)
+            if h is None:
+                h = self._latency[endpoint] = _Histogram(LATENCY_BUCKETS)
+            h.observe(seconds)
+            h = self._queries.get(endpoint)
+            if h is None:
+                h = self._queries[endpoint] = _Histogram(QUERY_BUCKETS)
+            h.observe(st.queries)
+            self._db_s[endpoint] = self._db_s.get(endpoint, 0.0) + st.db_s
+            self._auth_s[endpoint] = self._auth_s.get(endpoint, 0.0) + st.auth_s
+        # Petición lenta: su resumen, con la sentencia que más tardó
+        if seconds * 1000 >= self.slow_ms and st.slowest[1] is not None:
+            log.info("%s %s %.0f ms, %d consultas (%.0f ms en BD); la más lenta %.0f ms: %s",
+                     request.method, endpoint, seconds * 1000, st.queries, st.db_s * 1000,
+                     st.slowest[0] * 1000, _sql_corto(st.slowest[1], 200))
+
+    def observe_query(self, sql, seconds):
+        """Oyente del pool (MySQLPool.add_query_listener)."""
+        if has_request_context():
+            st = self._stats()
+            st.queries += 1
+            st.db_s += seconds
+            if seconds > st.slowest[0]:
+                st.slowest = (seconds, sql)
+            endpoint = request.endpoint or "unmatched"
+        else:
+            endpoint = BACKGROUND
+            with self._lock:
+                self._bg["queries"] += 1
+                self._bg["db_s"] += seconds
+        if seconds * 1000 >= self.slow_ms:
+            with self._lock:
+                self._slow_n[endpoint] = self._slow_n.get(endpoint, 0) + 1
+                self.slow_log.append(dict(endpoint=endpoint, ms=round(seconds * 1000, 1),
+                                          sql=_sql_corto(sql), at=time.time()))
+            log.warning("Consulta lenta (%.0f ms) en %s: %s", seconds * 1000, endpoint, _sql_corto(sql))
+
+    @contextmanager
+    def auth(self):
+        """Cronometra las comprobaciones de login_required/role_required."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            if has_request_context():
+                self._stats().auth_s += time.perf_counter() - t0
+
+    # ---- exposición ----
+    def add_gauges(self, prefix, loader, counters=()):
+        """
+        loader() → {nombre: número}; se publica como gauges <prefix>_<nombre>.
+        Los nombres en `counters` son acumulados que solo crecen (checkouts,
+        hits...): salen como counters <prefix>_<nombre>_total.
+        """
+        self._gauges.append((prefix, loader, frozenset(counters)))
+
+    def slow_queries(self):
+        with self._lock:
+            return list(reversed(self.slow_log))
+
+    def render(self) -> str:
+        """Todas las métricas en el formato de texto de Prometheus (0.0.4)."""
+        out = []
+        with self._lock:
+            out += ["# HELP madi_http_requests_total Peticiones atendidas.",
+                    "# TYPE madi_http_requests_total counter"]
+            for (ep, method, status), n in sorted(self._requests.items()):
+                out.append(f'madi_http_requests_total{{endpoint="{_label(ep)}",method="{method}",'
+                           f'status="{status}"}} {n}')
+
+            out += ["# HELP madi_http_request_duration_seconds Latencia por endpoint.",
+                    "# TYPE madi_http_request_duration_seconds histogram"]
+            for ep, h in sorted(self._latency.items()):
+                out += h.lines("madi_http_request_duration_seconds", f'endpoint="{_label(ep)}"')
+
+            out += ["# HELP madi_db_queries_per_request Sentencias SQL por petición.",
+                    "# TYPE madi_db_queries_per_request histogram"]
+            for ep, h in sorted(self._queries.items()):
+                out += h.lines("madi_db_queries_per_request", f'endpoint="{_label(ep)}"')
+
+            out += ["# HELP madi_db_seconds_total Tiempo en BD por endpoint.",
+                    "# TYPE madi_db_seconds_total counter"]
+            for ep, s in sorted(self._db_s.items()):
+                out.append(f'madi_db_seconds_total{{endpoint="{_label(ep)}"}} {s:.6f}')
+            out.append(f'madi_db_seconds_total{{endpoint="{BACKGROUND}"}} {self._bg["db_s"]:.6f}')
+            out += ["# HELP madi_db_background_queries_total Sentencias fuera de peticiones.",
+                    "# TYPE madi_db_background_queries_total counter",
+                    f"madi_db_background_queries_total {self._bg['queries']}"]
+
+            out += ["# HELP madi_auth_seconds_total Tiempo en login_required/role_required.",
+                    "# TYPE madi_auth_seconds_total counter"]
+            for ep, s in sorted(self._auth_s.items()):
+                out.append(f'madi_auth_seconds_total{{endpoint="{_label(ep)}"}} {s:.6f}')
+
+            out += [f"# HELP madi_db_slow_queries_total Sentencias de {self.slow_ms:g} ms o más.",
+                    "# TYPE madi_db_slow_queries_total counter"]
+            for ep, n in sorted(self._slow_n.items()):
+                out.append(f'madi_db_slow_queries_total{{endpoint="{_label(ep)}"}} {n}')
+
+        for prefix, loader, counters in self._gauges:
+            try:
+                values = loader()
+            except Exception:
+                log.exception("No se pudieron leer las métricas %s", prefix)
+                continue
+            for name, value in sorted(values.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                if name in counters:
+                    out += [f"# TYPE {prefix}_{name}_total counter", f"{prefix}_{name}_total {value}"]
+                else:
+                    out += [f"# TYPE {prefix}_{name} gauge", f"{prefix}_{name} {value}"]
+        return "\n".join(out) + "\n"
@@ -0,0 +1,94 @@
+-- Esquema base de MADI. IF NOT EXISTS: en instalaciones existentes solo
+-- registra la versión; los índices de consulta van en 0002.
+
+CREATE TABLE IF NOT EXISTS roles (
+    id     INT         NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    nombre VARCHAR(40) NOT NULL,
+    UNIQUE KEY ux_roles_nombre (nombre)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT IGNORE INTO roles (nombre) VALUES ('ADMIN'), ('TECNICO'), ('SOLICITANTE');
+
+CREATE TABLE IF NOT EXISTS areas (
+    id     INT          NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    nombre VARCHAR(120) NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS users (
+    id            INT          NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    username      VARCHAR(80)  NOT NULL,
+    email         VARCHAR(190) NULL,
+    password_hash VARCHAR(255) NOT NULL,
+    role_id       INT          NOT NULL,
+    area_id       INT          NULL,
+    is_active     TINYINT(1)   NOT NULL DEFAULT 1,
+    creado_en     DATETIME     NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY ux_users_username (username),
+    KEY ix_users_role (role_id, is_active)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS tipos_solicitud (
+    id     INT          NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    nombre VARCHAR(120) NOT NULL,
+    slug   VARCHAR(120) NOT NULL,
+    orden  INT          NOT NULL DEFAULT 0,
+    activo TINYINT(1)   NOT NULL DEFAULT 1
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS sugerencias_problema (
+    id      INT          NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    tipo_id INT          NOT NULL,
+    texto   VARCHAR(255) NOT NULL,
+    orden   INT          NOT NULL DEFAULT 0,
+    activo  TINYINT(1)   NOT NULL DEFAULT 1,
+    KEY ix_sugerencias_tipo (tipo_id, activo, orden)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS tickets (
+    id                 INT          NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    usuario_id         INT          NOT NULL,
+    area_id            INT          NULL,
+    solicitante_nombre VARCHAR(120) NULL,
+    asunto             VARCHAR(180) NOT NULL,
+    descripcion        TEXT         NULL,
+    estado             VARCHAR(20)  NOT NULL DEFAULT 'PENDIENTE',
+    asignado_a         INT          NULL,
+    creado_en          DATETIME     NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    cerrado_en         DATETIME     NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS ticket_tecnicos (
+    ticket_id INT      NOT NULL,
+    user_id   INT      NOT NULL,
+    creado_en DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (ticket_id, user_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS ticket_notas (
+    id         INT      NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    ticket_id  INT      NOT NULL,
+    usuario_id INT      NOT NULL,
+    texto      TEXT     NOT NULL,
+    creado_en  DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS ticket_attachments (
+    id        INT          NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    ticket_id INT          NOT NULL,
+    ruta      VARCHAR(500) NOT NULL,
+    creado_en DATETIME     NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS encuestas (
+    id          INT         NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    ticket_id   INT         NOT NULL,
+    nombre      VARCHAR(120) NULL,
+    t_servicio  VARCHAR(16) NULL,
+    t_atencion  VARCHAR(16) NULL,
+    p2          TINYINT     NULL,
+    p3          TINYINT     NULL,
+    p4          TINYINT     NULL,
+    atendida    VARCHAR(2)  NULL,
+    descripcion TEXT        NULL,
+    creado_en   DATETIME    NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,21 @@
+# Índices de las consultas calientes. ensure_index no duplica uno existente
+# que ya empiece por las mismas columnas (p. ej. la PK de ticket_tecnicos).
+from migrations import ensure_index
+
+INDICES = (
+    # mis-tickets / límite por usuario / encuestas pendientes
+    ("tickets", "ix_tickets_usuario_estado_creado", ("usuario_id", "estado", "creado_en")),
+    # listados del técnico por estado, ordenados por fecha
+    ("tickets", "ix_tickets_estado_creado", ("estado", "creado_en")),
+    # técnicos de una página de tickets (IN) y "mis asignados"
+    ("ticket_tecnicos", "ux_tt_ticket_user", ("ticket_id", "user_id"), True),
+    ("ticket_tecnicos", "ix_tt_user_ticket", ("user_id", "ticket_id")),
+    ("encuestas", "ix_encuestas_ticket", ("ticket_id",)),
+    ("ticket_notas", "ix_notas_ticket_creado", ("ticket_id", "creado_en")),
+    ("ticket_attachments", "ix_adjuntos_ticket", ("ticket_id",)),
+)
+
+
+def up(cur):
+    for table, name, columns, *unique in INDICES:
+        ensure_index(cur, table, name, columns, unique=bool(unique and unique[0]))
@@ -0,0 +1,18 @@
+-- Rollups diarios del dashboard de admin (ver "Métricas" en app.py).
+-- Tras aplicarla en una base con datos: flask metrics-rebuild
+
+CREATE TABLE IF NOT EXISTS metricas_tickets_dia (
+    dia      DATE        NOT NULL,
+    area_id  INT         NOT NULL DEFAULT 0,
+    estado   VARCHAR(20) NOT NULL,
+    asignado TINYINT(1)  NOT NULL DEFAULT 0,
+    n        INT         NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, area_id, estado, asignado)
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS metricas_tecnicos_dia (
+    dia     DATE NOT NULL,
+    user_id INT  NOT NULL,
+    n       INT  NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, user_id)
+) ENGINE=InnoDB;
@@ -0,0 +1,28 @@
+-- Respuestas de encuesta estructuradas y promedios por área/mes.
+-- Tras aplicarla en una base con datos: flask surveys-migrate
+
+CREATE TABLE IF NOT EXISTS encuesta_respuestas (
+    encuesta_id           INT          NOT NULL PRIMARY KEY,
+    ticket_id             INT          NOT NULL,
+    area_id               INT          NOT NULL DEFAULT 0,
+    creado_en             DATETIME     NOT NULL,
+    q_rapidez             TINYINT      NULL,
+    q_resolucion_efectiva TINYINT      NULL,
+    q_satis_solucion      TINYINT      NULL,
+    q_satis_web           TINYINT      NULL,
+    q_identificacion      CHAR(2)      NULL,
+    sugerencias           TEXT         NULL,
+    comentarios           TEXT         NULL,
+    rating                DECIMAL(3,2) NULL,
+    KEY idx_resp_creado (creado_en),
+    KEY idx_resp_area_creado (area_id, creado_en)
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS encuestas_promedios_mes (
+    mes         DATE          NOT NULL,
+    area_id     INT           NOT NULL DEFAULT 0,
+    n           INT           NOT NULL DEFAULT 0,
+    calificadas INT           NOT NULL DEFAULT 0,
+    suma        DECIMAL(12,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (mes, area_id)
+) ENGINE=InnoDB;
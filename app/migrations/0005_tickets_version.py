@@ -0,0 +1,8 @@
+# Versión por ticket: cada escritura que cambia lo que muestra el detalle
+# (estado, técnicos, notas, adjuntos, encuesta) la incrementa en su misma
+# transacción; el detalle la usa como ETag.
+from migrations import ensure_column
+
+
+def up(cur):
+    ensure_column(cur, "tickets", "version", "INT UNSIGNED NOT NULL DEFAULT 0")
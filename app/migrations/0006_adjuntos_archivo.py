@@ -0,0 +1,15 @@
+# Nombre del blob de cada adjunto (<sha256><ext>) en su propia columna
+# indexada: el conteo de referencias de uploads-gc / _liberar_blob busca por
+# igualdad en vez de LIKE '%/nombre' sobre `ruta`, que recorría la tabla.
+from migrations import ensure_column, ensure_index
+
+
+def up(cur):
+    ensure_column(cur, "ticket_attachments", "archivo", "VARCHAR(120) NULL")
+    # Último segmento de la ruta, con separador / o \
+    cur.execute(r"""
+        UPDATE ticket_attachments
+           SET archivo = SUBSTRING_INDEX(SUBSTRING_INDEX(ruta, '/', -1), '\\', -1)
+         WHERE archivo IS NULL
+    """)
+    ensure_index(cur, "ticket_attachments", "ix_adjuntos_archivo", ("archivo",))
@@ -0,0 +1,62 @@
+# Reclamo exclusivo de un ticket (POST /tomar?modo=cas) en un solo viaje a la
+# BD: el UPDATE condicional, el alta en ticket_tecnicos, los deltas de los
+# rollups diarios (mismas claves que _rollup_claves/_rollup_aplicar en app.py)
+# y el COMMIT corren dentro del procedimiento. Devuelve una fila:
+#   ganó:   ok=1, usuario_id (solicitante), disponible (no tenía técnicos)
+#   perdió: ok=0 con estado, asignado_a y username actuales
+#   no existe: ninguna fila
+DROP = "DROP PROCEDURE IF EXISTS tomar_ticket_cas"
+
+CREATE = """
+CREATE PROCEDURE tomar_ticket_cas(IN p_ticket INT, IN p_user INT)
+BEGIN
+    DECLARE v_dia DATE;
+    DECLARE v_area INT;
+    DECLARE v_owner INT;
+    DECLARE v_con TINYINT DEFAULT 0;
+    DECLARE v_nuevo INT DEFAULT 0;
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        RESIGNAL;
+    END;
+
+    UPDATE tickets
+       SET estado = 'EN_CURSO', asignado_a = p_user, version = version + 1
+     WHERE id = p_ticket AND estado = 'PENDIENTE' AND asignado_a IS NULL;
+
+    IF ROW_COUNT() = 1 THEN
+        SELECT DATE(creado_en), COALESCE(area_id, 0), usuario_id
+          INTO v_dia, v_area, v_owner
+          FROM tickets
+         WHERE id = p_ticket;
+        SELECT EXISTS (SELECT 1 FROM ticket_tecnicos WHERE ticket_id = p_ticket) INTO v_con;
+        INSERT IGNORE INTO ticket_tecnicos (ticket_id, user_id) VALUES (p_ticket, p_user);
+        SET v_nuevo = ROW_COUNT();
+        -- Antes PENDIENTE sin asignar, ahora EN_CURSO asignado
+        INSERT INTO metricas_tickets_dia (dia, area_id, estado, asignado, n)
+        VALUES (v_dia, v_area, 'PENDIENTE', 0, -1), (v_dia, v_area, 'EN_CURSO', 1, 1)
+        ON DUPLICATE KEY UPDATE n = n + VALUES(n);
+        IF v_nuevo = 1 THEN
+            INSERT INTO metricas_tecnicos_dia (dia, user_id, n)
+            VALUES (v_dia, p_user, 1)
+            ON DUPLICATE KEY UPDATE n = n + 1;
+        END IF;
+        COMMIT;
+        SELECT 1 AS ok, v_owner AS usuario_id, NOT v_con AS disponible,
+               'EN_CURSO' AS estado, p_user AS asignado_a, NULL AS username;
+    ELSE
+        ROLLBACK;
+        SELECT 0 AS ok, t.usuario_id, 0 AS disponible, t.estado, t.asignado_a, u.username
+          FROM tickets t
+          LEFT JOIN users u ON u.id = t.asignado_a
+         WHERE t.id = p_ticket;
+    END IF;
+END
+"""
+
+
+def up(cur):
+    # Sin DELIMITER: el cliente manda el CREATE PROCEDURE completo como una sentencia
+    cur.execute(DROP)
+    cur.execute(CREATE)
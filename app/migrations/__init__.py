@@ -0,0 +1,154 @@
+# migrations — Migraciones de esquema versionadas
+#
+# Cada archivo NNNN_nombre.sql o NNNN_nombre.py de este directorio es una
+# migración; se aplican en orden de versión y se registran en
+# `schema_migrations`. Los .sql son sentencias separadas por ";" al final de
+# línea; los .py definen up(cur). En MySQL el DDL hace COMMIT implícito, así
+# que cada migración debe poder reintentarse si falla a medias (IF NOT EXISTS,
+# ensure_index, ensure_column).
+#
+#   flask db-migrate            # aplica las pendientes
+#   flask db-migrate --status   # lista aplicadas / pendientes
+import importlib.util, os, re
+
+MIGRATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+LOCK_NAME = "madi_schema_migrations"
+
+_FILE_RE = re.compile(r"^(\d{4})_([a-z0-9_]+)\.(sql|py)$")
+
+
+class MigrationError(Exception):
+    """Migración mal formada o que no se pudo aplicar."""
+
+
+def discover(directory=MIGRATIONS_DIR):
+    """[(version, nombre, ruta)] ordenado por versión."""
+    found = {}
+    for fname in sorted(os.listdir(directory)):
+        m = _FILE_RE.match(fname)
+        if not m:
+            continue
+        version = int(m.group(1))
+        if version in found:
+            raise MigrationError(f"Versión duplicada {version}: {fname} y {found[version][1]}")
+        found[version] = (version, m.group(2), os.path.join(directory, fname))
+    return [found[v] for v in sorted(found)]
+
+
+def split_sql(text: str):
+    """Sentencias de un .sql: sin comentarios de línea, separadas por ';' al final de línea."""
+    lines = [ln for ln in text.splitlines() if not ln.strip().startswith("--")]
+    return [s.strip() for s in re.split(r";\s*$", "\n".join(lines), flags=re.M) if s.strip()]
+
+
+def ensure_index(cur, table: str, name: str, columns, unique=False) -> bool:
+    """
+    Crea el índice salvo que ya exista uno (con cualquier nombre) cuyas
+    primeras columnas sean `columns`. Devuelve True si lo creó.
+    """
+    cur.execute("""
+        SELECT index_name, non_unique, GROUP_CONCAT(column_name ORDER BY seq_in_index) AS cols
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s
+        GROUP BY index_name, non_unique
+    """, (table,))
+    wanted = ",".join(columns).lower()
+    for row in cur.fetchall() or []:
+        cols = (_get(row, "cols", 2) or "").lower()
+        if (cols + ",").startswith(wanted + ",") and (not unique or not int(_get(row, "non_unique", 1))):
+            return False
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    cur.execute(f"CREATE {kind} {name} ON {table} ({', '.join(columns)})")
+    return True
+
+
+def ensure_column(cur, table: str, column: str, definition: str) -> bool:
+    """Agrega la columna si no existe (MySQL no tiene ADD COLUMN IF NOT EXISTS). True si la creó."""
+    cur.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (table, column))
+    if cur.fetchone():
+        return False
+    cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return True
+
+
+def _get(row, key, pos):
+    return row[key] if isinstance(row, dict) else row[pos]
+
+
+def _ensure_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version     INT          NOT NULL PRIMARY KEY,
+            nombre      VARCHAR(200) NOT NULL,
+            aplicado_en DATETIME     NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB
+    """)
+
+
+def applied(cur) -> dict:
+    """{version: aplicado_en} de las migraciones ya registradas."""
+    _ensure_table(cur)
+    cur.execute("SELECT version, aplicado_en FROM schema_migrations")
+    return {int(_get(r, "version", 0)): _get(r, "aplicado_en", 1) for r in cur.fetchall() or []}
+
+
+def status(conn):
+    """[(version, nombre, aplicado_en | None)] de todas las migraciones conocidas."""
+    cur = conn.cursor()
+    try:
+        done = applied(cur)
+    finally:
+        cur.close()
+    return [(v, name, done.get(v)) for v, name, _ in discover()]
+
+
+def _apply_one(cur, path):
+    if path.endswith(".sql"):
+        with open(path, encoding="utf-8") as fh:
+            for stmt in split_sql(fh.read()):
+                cur.execute(stmt)
+        return
+    spec = importlib.util.spec_from_file_location(f"_migration_{os.path.basename(path)[:-3]}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if not hasattr(module, "up"):
+        raise MigrationError(f"{os.path.basename(path)} no define up(cur)")
+    module.up(cur)
+
+
+def migrate(conn, target=None, echo=print):
+    """
+    Aplica en orden las migraciones pendientes (hasta `target` inclusive).
+    Un candado con nombre evita que dos procesos migren a la vez.
+    Devuelve las versiones aplicadas.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT GET_LOCK(%s, 60) AS ok", (LOCK_NAME,))
+        if not int(_get(cur.fetchone(), "ok", 0) or 0):
+            raise MigrationError("Otro proceso está aplicando migraciones.")
+        try:
+            done = applied(cur)
+            hechas = []
+            for version, name, path in discover():
+                if version in done or (target is not None and version > target):
+                    continue
+                echo(f"→ {version:04d}_{name}")
+                try:
+                    _apply_one(cur, path)
+                    cur.execute("INSERT INTO schema_migrations (version, nombre) VALUES (%s, %s)",
+                                (version, name))
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    raise MigrationError(f"{version:04d}_{name}: {e}") from e
+                hechas.append(version)
+            return hechas
+        finally:
+            cur.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cur.fetchall()
+    finally:
+        cur.close()
@@ -0,0 +1,231 @@
+# profiler.py — Perfilado por muestreo de peticiones reales, activable en caliente
+#
+# Un administrador activa el modo (fracción de peticiones, endpoints y minutos)
+# o pide un encabezado firmado "X-Profile" para perfilar peticiones concretas.
+# Mientras dura la petición un hilo toma la pila del hilo que la atiende cada
+# PROFILE_INTERVAL_MS (tiempo de reloj: también cuenta la espera en BD o
+# red) y, al terminar, se guardan en PROFILE_DIR/<endpoint>/:
+#   <id>.folded  pilas plegadas "marco;marco;... n" (flamegraph.pl, speedscope)
+#   <id>.json    metadatos y spans de BD (inicio, duración, sentencia)
+# El estado del modo vive en PROFILE_DIR/_estado.json para que todos los
+# workers lo vean.
+import hashlib, hmac, json, os, random, re, sys, threading, time
+from collections import Counter
+from datetime import datetime
+
+from flask import g, has_request_context, request
+
+HEADER = "X-Profile"
+_SAFE = re.compile(r"[^\w.-]")
+
+
+def _marco(code) -> str:
+    name = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return name.replace(";", ",")
+
+
+class _Sampler(threading.Thread):
+    """Muestrea la pila de un hilo hasta stop(); cuenta pilas plegadas."""
+
+    def __init__(self, ident, interval):
+        super().__init__(name="profiler", daemon=True)
+        self.target = ident
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_evt = threading.Event()
+
+    def run(self):
+        while not self._stop_evt.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            if frame is None:
+                continue
+            pila = []
+            while frame is not None:
+                pila.append(_marco(frame.f_code))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(pila))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_evt.set()
+        self.join()
+
+
+class _Captura:
+    __slots__ = ("sampler", "start", "t0", "spans", "motivo")
+
+    def __init__(self, sampler, motivo):
+        self.sampler = sampler
+        self.start = time.time()
+        self.t0 = time.perf_counter()
+        self.spans = []
+        self.motivo = motivo
+
+
+class Profiler:
+    def __init__(self, app=None):
+        self._estado = dict(rate=0.0, endpoints=[], hasta=0)
+        self._estado_mtime = None
+        self._estado_check = 0.0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        cfg = app.config
+        self.dir = cfg.get("PROFILE_DIR") or os.path.join(app.root_path, "profiles")
+        self.interval = float(cfg.get("PROFILE_INTERVAL_MS", 5)) / 1000
+        self.max_por_endpoint = int(cfg.get("PROFILE_MAX_PER_ENDPOINT", 50))
+        self.token_ttl = int(cfg.get("PROFILE_TOKEN_TTL", 900))
+        self._secret = cfg["SECRET_KEY"].encode()
+        os.makedirs(self.dir, exist_ok=True)
+        app.before_request(self._before)
+        app.teardown_request(self._teardown)
+
+    # ---- estado compartido entre workers ----
+    @property
+    def _estado_path(self):
+        return os.path.join(self.dir, "_estado.json")
+
+    def estado(self) -> dict:
+        """Modo activo (releído del disco como mucho una vez por segundo)."""
+        now = time.monotonic()
+        if now - self._estado_check >= 1.0:
+            self._estado_check = now
+            try:
+                mtime = os.path.getmtime(self._estado_path)
+            except OSError:
+                mtime = None
+            if mtime != self._estado_mtime:
+                try:
+                    with open(self._estado_path, encoding="utf-8") as fh:
+                        estado = json.load(fh)
+                except (OSError, ValueError):
+                    estado = dict(rate=0.0, endpoints=[], hasta=0)
+                with self._lock:
+                    self._estado, self._estado_mtime = estado, mtime
+        with self._lock:
+            return dict(self._estado)
+
+    def configurar(self, rate: float, endpoints=(), minutos: float = 10) -> dict:
+        """Activa el muestreo (rate 0 lo apaga) por `minutos`."""
+        estado = dict(rate=max(0.0, min(float(rate), 1.0)),
+                      endpoints=sorted(set(endpoints)),
+                      hasta=time.time() + max(0.0, float(minutos)) * 60)
+        tmp = self._estado_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(estado, fh)
+        os.replace(tmp, self._estado_path)
+        self._estado_check = 0.0
+        return self.estado()
+
+    # ---- encabezado firmado ----
+    def _firma(self, expira: int) -> str:
+        return hmac.new(self._secret, f"perfil:{expira}".encode(), hashlib.sha256).hexdigest()[:32]
+
+    def token(self) -> str:
+        """Valor para el encabezado X-Profile, válido PROFILE_TOKEN_TTL segundos."""
+        expira = int(time.time()) + self.token_ttl
+        return f"{expira}.{self._firma(expira)}"
+
+    def _token_valido(self, value: str) -> bool:
+        expira, _, firma = (value or "").partition(".")
+        if not expira.isdigit() or int(expira) < time.time():
+            return False
+        return hmac.compare_digest(firma, self._firma(int(expira)))
+
+    # ---- por petición ----
+    def _motivo(self):
+        if request.headers.get(HEADER):
+            return "encabezado" if self._token_valido(request.headers[HEADER]) else None
+        estado = self.estado()
+        if not estado["rate"] or estado["hasta"] < time.time() or request.endpoint in (None, "static"):
+            return None
+        if estado["endpoints"] and request.endpoint not in estado["endpoints"]:
+            return None
+        return "muestreo" if random.random() < estado["rate"] else None
+
+    def _before(self):
+        motivo = self._motivo()
+        if motivo is None:
+            return
+        sampler = _Sampler(threading.get_ident(), self.interval)
+        g._perfil = _Captura(sampler, motivo)
+        sampler.start()
+
+    def observe_query(self, sql, seconds):
+        """Oyente del pool: span de BD de la petición perfilada."""
+        if not has_request_context():
+            return
+        cap = g.get("_perfil")
+        if cap is not None:
+            fin = time.perf_counter() - cap.t0
+            cap.spans.append(dict(inicio_ms=round((fin - seconds) * 1000, 2),
+                                  ms=round(seconds * 1000, 2),
+                                  sql=" ".join(str(sql).split())[:500]))
+
+    def _teardown(self, exc):
+        cap = g.pop("_perfil", None)
+        if cap is None:
+            return
+        cap.sampler.stop()
+        ms = (time.perf_counter() - cap.t0) * 1000
+        endpoint = _SAFE.sub("_", request.endpoint or "unmatched")
+        pid = f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}-{random.getrandbits(24):06x}"
+        carpeta = os.path.join(self.dir, endpoint)
+        os.makedirs(carpeta, exist_ok=True)
+        with open(os.path.join(carpeta, pid + ".folded"), "w", encoding="utf-8") as fh:
+            for pila, n in cap.sampler.stacks.most_common():
+                fh.write(f"{pila} {n}\n")
+        meta = dict(id=pid, endpoint=request.endpoint, method=request.method,
+                    path=request.full_path.rstrip("?"), ms=round(ms, 1),
+                    error=repr(exc) if exc else None, motivo=cap.motivo,
+                    inicio=datetime.fromtimestamp(cap.start).isoformat(timespec="seconds"),
+                    intervalo_ms=self.interval * 1000, muestras=cap.sampler.samples,
+                    db_ms=round(sum(s["ms"] for s in cap.spans), 2), spans=cap.spans)
+        with open(os.path.join(carpeta, pid + ".json"), "w", encoding="utf-8") as fh:
+            json.dump(meta, fh, ensure_ascii=False, indent=1)
+        self._podar(carpeta)
+
+    def _podar(self, carpeta):
+        ids = sorted(f[:-5] for f in os.listdir(carpeta) if f.endswith(".json"))
+        for pid in ids[:-self.max_por_endpoint] if len(ids) > self.max_por_endpoint else []:
+            for ext in (".json", ".folded"):
+                try:
+                    os.unlink(os.path.join(carpeta, pid + ext))
+                except FileNotFoundError:
+                    pass
+
+    # ---- consulta ----
+    def listado(self) -> dict:
+        """{endpoint: [metadatos sin spans, más nuevos primero]}"""
+        out = {}
+        for endpoint in sorted(os.listdir(self.dir)):
+            carpeta = os.path.join(self.dir, endpoint)
+            if not os.path.isdir(carpeta):
+                continue
+            perfiles = []
+            for fname in sorted(os.listdir(carpeta), reverse=True):
+                if not fname.endswith(".json"):
+                    continue
+                try:
+                    with open(os.path.join(carpeta, fname), encoding="utf-8") as fh:
+                        meta = json.load(fh)
+                except (OSError, ValueError):
+                    continue
+                meta["consultas"] = len(meta.pop("spans", []))
+                perfiles.append(meta)
+            if perfiles:
+                out[endpoint] = perfiles
+        return out
+
+    def archivo(self, endpoint: str, pid: str, ext: str):
+        """Ruta de un perfil guardado, o None si el nombre no es válido o no existe."""
+        for parte in (endpoint, pid):
+            if not parte or parte.startswith(".") or _SAFE.search(parte):
+                return None
+        if ext not in (".folded", ".json"):
+            return None
+        path = os.path.join(self.dir, endpoint, pid + ext)
+        return path if os.path.isfile(path) else None
@@ -0,0 +1,189 @@
+# reports.py — PDF de encuestas generado en segundo plano
+#
+# Tras registrar una encuesta se encola su PDF; un pool de hilos lo dibuja y lo
+# deja en uploads/encuestas/<encuesta_id>.pdf (escritura atómica). Las
+# descargas solo sirven el archivo ya generado, nunca renderizan en la petición.
+# Cada intento fallido (encuesta inexistente, error de reportlab) se anota en
+# <encuesta_id>.failed; tras REPORT_MAX_ATTEMPTS ya no se reencola y el export
+# lo informa como fallido. Borrar el .failed permite reintentarlo.
+import logging, os, tempfile, threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+except ImportError:  # reportlab es opcional: sin él no hay PDFs
+    canvas = None
+
+log = logging.getLogger(__name__)
+
+VINO = (0x8b / 255, 0x1e / 255, 0x3f / 255)
+
+
+def render_survey_pdf(data: dict, dest: str):
+    """
+    Dibuja la encuesta en `dest`. `data` trae "titulo", "secciones"
+    ([(título, [(etiqueta, valor), ...]), ...]) y opcionalmente "texto"
+    ([(título, párrafo), ...]) para sugerencias y comentarios.
+    """
+    width, height = letter
+    c = canvas.Canvas(dest, pagesize=letter)
+    c.setTitle(data.get("titulo") or "Encuesta")
+    margin, y = 54, height - 60
+
+    def line_break(needed=16):
+        nonlocal y
+        if y - needed < margin:
+            c.showPage()
+            y = height - 60
+
+    c.setFillColorRGB(*VINO)
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(margin, y, data.get("titulo") or "Encuesta")
+    c.setFillColorRGB(0, 0, 0)
+    y -= 28
+
+    for titulo, filas in data.get("secciones") or []:
+        line_break(40)
+        c.setFont("Helvetica-Bold", 11)
+        c.drawString(margin, y, titulo)
+        y -= 16
+        for etiqueta, valor in filas:
+            line_break()
+            c.setFont("Helvetica", 9)
+            c.drawString(margin + 8, y, f"{etiqueta}:")
+            c.drawString(margin + 210, y, str(valor if valor not in (None, "") else "-")[:80])
+            y -= 14
+        y -= 8
+
+    for titulo, parrafo in data.get("texto") or []:
+        if not parrafo:
+            continue
+        line_break(40)
+        c.setFont("Helvetica-Bold", 11)
+        c.drawString(margin, y, titulo)
+        y -= 16
+        c.setFont("Helvetica", 9)
+        for renglon in _wrap(parrafo, 100):
+            line_break()
+            c.drawString(margin + 8, y, renglon)
+            y -= 13
+        y -= 8
+
+    c.save()
+
+
+def _wrap(text: str, width: int):
+    for parrafo in str(text).splitlines() or [""]:
+        renglon = ""
+        for palabra in parrafo.split():
+            if renglon and len(renglon) + 1 + len(palabra) > width:
+                yield renglon
+                renglon = palabra
+            else:
+                renglon = f"{renglon} {palabra}".strip()
+        yield renglon
+
+
+class SurveyReports:
+    def __init__(self, app=None):
+        self.executor = None
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._stats = dict(queued=0, done=0, failed=0)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        cfg = app.config
+        self.out_dir = os.path.join(app.root_path, cfg["UPLOAD_FOLDER"], "encuestas")
+        self.max_attempts = int(cfg.get("REPORT_MAX_ATTEMPTS", 3))
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(cfg.get("REPORT_WORKERS", 1)),
+            thread_name_prefix="reports",
+        )
+
+    @property
+    def available(self) -> bool:
+        return canvas is not None
+
+    def path(self, encuesta_id: int) -> str:
+        return os.path.join(self.out_dir, f"{int(encuesta_id)}.pdf")
+
+    def exists(self, encuesta_id: int) -> bool:
+        return os.path.isfile(self.path(encuesta_id))
+
+    def _failed_path(self, encuesta_id: int) -> str:
+        return os.path.join(self.out_dir, f"{int(encuesta_id)}.failed")
+
+    def attempts(self, encuesta_id: int) -> int:
+        """Intentos fallidos registrados (compartidos entre workers vía disco)."""
+        try:
+            with open(self._failed_path(encuesta_id), encoding="utf-8") as fh:
+                return int(fh.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def failed(self, encuesta_id: int) -> bool:
+        """True si agotó REPORT_MAX_ATTEMPTS: no se vuelve a encolar."""
+        return not self.exists(encuesta_id) and self.attempts(encuesta_id) >= self.max_attempts
+
+    def _fallo(self, encuesta_id):
+        self._count("failed")
+        n = self.attempts(encuesta_id) + 1
+        try:
+            with open(self._failed_path(encuesta_id), "w", encoding="utf-8") as fh:
+                fh.write(str(n))
+        except OSError:
+            log.exception("No se pudo registrar el fallo del PDF %s", encuesta_id)
+
+    def submit(self, encuesta_id: int, loader):
+        """
+        Encola el PDF de la encuesta (si no existe, no está en cola ni agotó
+        sus intentos). loader() corre en el worker y devuelve los datos para
+        render_survey_pdf, o None si la encuesta ya no existe. Devuelve True si
+        quedó encolado.
+        """
+        if not self.available or self.exists(encuesta_id) or self.failed(encuesta_id):
+            return False
+        with self._lock:
+            if encuesta_id in self._pending:
+                return True
+            self._pending.add(encuesta_id)
+            self._stats["queued"] += 1
+        self.executor.submit(self._render, encuesta_id, loader)
+        return True
+
+    def _render(self, encuesta_id, loader):
+        dest = self.path(encuesta_id)
+        tmp = None
+        try:
+            data = loader()
+            if data is None:
+                log.warning("Encuesta %s sin datos para el PDF", encuesta_id)
+                self._fallo(encuesta_id)
+                return
+            fd, tmp = tempfile.mkstemp(dir=self.out_dir, suffix=".tmp")
+            os.close(fd)
+            render_survey_pdf(data, tmp)
+            os.replace(tmp, dest)
+            if os.path.exists(self._failed_path(encuesta_id)):
+                os.unlink(self._failed_path(encuesta_id))
+            self._count("done")
+        except Exception:
+            log.exception("No se pudo generar el PDF de la encuesta %s", encuesta_id)
+            self._fallo(encuesta_id)
+        finally:
+            if tmp and os.path.exists(tmp):
+                os.unlink(tmp)
+            with self._lock:
+                self._pending.discard(encuesta_id)
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, pending=len(self._pending), available=self.available)
@@ -5,6 +5,7 @@
  *  - Asignación: “solo yo” o “en equipo”
  *  - Cambiar estado (RESUELTO exige observaciones + evidencias opcionales)
  *  - Perfil del técnico con contadores
+ *  - Actualización en vivo vía SSE (/api/stream/tickets)
  * ========================================================================= */
 
 /* --------------------------- DOM & ESTADO -------------------------------- */
@@ -47,6 +48,9 @@ let cache     = [];
 let tecnicos  = [];
 let me        = null;
 let assigning = false;
+let counts    = { disponibles: 0, asignados: 0, historial: 0 };
+let nextCursor = null;
+let searchTimer = null;
 
 /* ----------------------------- HELPERS ----------------------------------- */
 function toast(message, type = 'ok') {
@@ -106,16 +110,6 @@ async function renderTechProfile() {
   let meData;
   try { meData = await $json('/api/session/me'); } catch { return; }
 
-  const scopes = ['disponibles', 'asignados', 'historial'];
-  const counts = { disponibles: 0, asignados: 0, historial: 0 };
-
-  await Promise.all(scopes.map(async s => {
-    try {
-      const arr = await $json(`/api/tecnico/tickets?scope=${s}`);
-      counts[s] = Array.isArray(arr) ? arr.length : 0;
-    } catch {}
-  }));
-
   const initials = initialsFrom(meData.username || meData.email || 'T');
   const email = meData.email || 'sin correo';
   const area  = meData.area_name || 'Sin área';
@@ -138,23 +132,18 @@ async function renderTechProfile() {
   `;
 }
 
-async function refreshTechCounters() {
+// Los contadores llegan en la misma respuesta de /api/tecnico/dashboard
+function refreshTechCounters(next) {
+  if (next) counts = { ...counts, ...next };
   const ids = {
     disponibles: document.getElementById('statDisponibles'),
     asignados:   document.getElementById('statAsignados'),
     historial:   document.getElementById('statHistorial'),
   };
   if (!ids.disponibles) return;
-  try {
-    const [d, a, h] = await Promise.all([
-      $json('/api/tecnico/tickets?scope=disponibles').catch(() => []),
-      $json('/api/tecnico/tickets?scope=asignados').catch(() => []),
-      $json('/api/tecnico/tickets?scope=historial').catch(() => []),
-    ]);
-    ids.disponibles.textContent = Array.isArray(d) ? d.length : 0;
-    ids.asignados.textContent   = Array.isArray(a) ? a.length : 0;
-    ids.historial.textContent   = Array.isArray(h) ? h.length : 0;
-  } catch {}
+  ids.disponibles.textContent = counts.disponibles;
+  ids.asignados.textContent   = counts.asignados;
+  ids.historial.textContent   = counts.historial;
 }
 
 /* ------------------------------ LISTADO ---------------------------------- */
@@ -199,22 +188,52 @@ function render(list) {
   grid.innerHTML = list.length
     ? list.map(card).join('')
     : `<div class="empty">No hay tickets.</div>`;
+  if (nextCursor) {
+    grid.insertAdjacentHTML('beforeend',
+      `<div class="empty"><button id="btnMore" class="btn">Cargar más</button></div>`);
+    $('#btnMore')?.addEventListener('click', cargarMas);
+  }
 }
 
-function aplicarFiltro() {
-  const term = (q.value || '').toLowerCase().trim();
-  if (!term) return render(cache);
-  const f = cache.filter(t =>
-    (t.asunto || '').toLowerCase().includes(term) ||
-    (t.solicitante_nombre || '').toLowerCase().includes(term)
-  );
-  render(f);
+// Parámetros comunes de listado: scope + búsqueda en servidor (+ cursor)
+function listParams(cursor) {
+  const p = new URLSearchParams({ scope });
+  const term = (q?.value || '').trim();
+  if (term)   p.set('q', term);
+  if (cursor) p.set('cursor', cursor);
+  return p.toString();
 }
 
 async function cargar() {
   skeleton();
-  cache = await $json(`/api/tecnico/tickets?scope=${encodeURIComponent(scope)}`).catch(() => []);
-  aplicarFiltro();
+  const data = await $json(`/api/tecnico/dashboard?${listParams()}`).catch(() => null);
+  cache = Array.isArray(data?.tickets) ? data.tickets : [];
+  nextCursor = data?.next_cursor || null;
+  refreshTechCounters(data?.counts);
+  render(cache);
+}
+
+// Siguiente página (keyset): el cursor llega en la cabecera X-Next-Cursor
+async function cargarMas() {
+  if (!nextCursor) return;
+  try {
+    const res = await fetch(`/api/tecnico/tickets?${listParams(nextCursor)}`, {
+      credentials: 'same-origin',
+      headers: { 'Accept': 'application/json' },
+    });
+    if (!res.ok) throw new Error(`HTTP ${res.status}`);
+    const page = await res.json();
+    cache = cache.concat(Array.isArray(page) ? page : []);
+    nextCursor = res.headers.get('X-Next-Cursor');
+    render(cache);
+  } catch {
+    toast('No se pudieron cargar más tickets', 'err');
+  }
+}
+
+function aplicarFiltro() {
+  clearTimeout(searchTimer);
+  searchTimer = setTimeout(cargar, 300);
 }
 
 async function refreshGrid() { await cargar(); }
@@ -228,9 +247,7 @@ async function ver(id) {
   currentId = t.id;
 
   const asign = (data.asignados || []).map(a => a.username).join(', ') || 'Nadie';
-  const notasHtml = (data.notas || []).map(n =>
-    `<li><strong>${escapeHtml(n.autor)}</strong> — ${escapeHtml(n.creado_en)}<br>${escapeHtml(n.texto)}</li>`
-  ).join('');
+  const notasHtml = notasItems(data.notas);
 
   const adj = data.adjuntos || [];
   const galHtml = adj.length ? `
@@ -239,7 +256,7 @@ async function ver(id) {
       <div class="tk-att-grid">
         ${adj.map(a => `
           <a class="tk-att" href="${a.url}" target="_blank" rel="noopener">
-            <img src="${a.url}" alt="Evidencia ${escapeHtml(a.name)}">
+            <img src="${a.thumb || a.url}" loading="lazy" alt="Evidencia ${escapeHtml(a.name)}">
           </a>`).join('')}
       </div>
     </div>` : '';
@@ -258,12 +275,13 @@ async function ver(id) {
     ${galHtml}
     ${notasHtml ? `<div class="tk-desc" style="margin-top:10px">
       <span>Notas recientes</span>
-      <ul style="margin:6px 0 0 18px">${notasHtml}</ul>
+      <ul id="dlgNotas" style="margin:6px 0 0 18px">${notasHtml}</ul>
     </div>` : '' }
   `;
 
   // Guardar id del ticket en el diálogo para el flujo de RESUELTO
   dlg.dataset.id = String(t.id);
+  dlg.dataset.notaMax = String(maxNotaId(data.notas));
 
   // Mostrar controles según scope
   if (btnTomar)   btnTomar.style.display  = (scope === 'disponibles') ? ''  : 'none';
@@ -276,6 +294,27 @@ async function ver(id) {
 }
 window.ver = ver;
 
+function notasItems(notas) {
+  return (notas || []).map(n =>
+    `<li><strong>${escapeHtml(n.autor)}</strong> — ${escapeHtml(n.creado_en)}<br>${escapeHtml(n.texto)}</li>`
+  ).join('');
+}
+
+function maxNotaId(notas) {
+  return (notas || []).reduce((m, n) => Math.max(m, n.id || 0), 0);
+}
+
+// Solo las notas posteriores a la última mostrada (?notes_since=)
+async function refrescarNotas(id) {
+  const lista = document.getElementById('dlgNotas');
+  if (!lista) { ver(id); return; }
+  const since = dlg.dataset.notaMax || '0';
+  const data = await $json(`/api/tecnico/tickets/${id}?notes_since=${since}`).catch(() => null);
+  if (!data?.ok || !data.notas?.length || String(dlg.dataset.id) !== String(id)) return;
+  lista.insertAdjacentHTML('afterbegin', notasItems(data.notas));
+  dlg.dataset.notaMax = String(Math.max(Number(since), maxNotaId(data.notas)));
+}
+
 btnClose?.addEventListener('click', () => dlg.close());
 
 /* -------------------------- ASIGNACIÓN EQUIPO ---------------------------- */
@@ -331,8 +370,17 @@ assignConfirm?.addEventListener('click', async () => {
   assignConfirm.disabled = true;
 
   try {
-    // 1) Me asigno
-    await fetch(`/api/tecnico/tickets/${currentId}/tomar`, { method: 'POST' });
+    // 1) Me asigno (reclamo exclusivo: si otro técnico ganó, 409 con su nombre)
+    const r = await fetch(`/api/tecnico/tickets/${currentId}/tomar?modo=cas`, { method: 'POST' });
+    if (r.status === 409) {
+      const j = await r.json().catch(() => ({}));
+      toast(j.msg || 'Otro técnico tomó este ticket.', 'err');
+      assignDlg.close();
+      dlg.close();
+      await refreshGrid();
+      return;
+    }
+    if (!r.ok) throw new Error('No se pudo asignar');
 
     // 2) Equipo adicional
     if (optEquipo?.checked) {
@@ -352,7 +400,6 @@ assignConfirm?.addEventListener('click', async () => {
     assignDlg.close();
     dlg.close();
     await refreshGrid();
-    await refreshTechCounters();
 
   } catch (e) {
     toast('No se pudo asignar', 'err');
@@ -411,7 +458,6 @@ btnEstado?.addEventListener('click', async () => {
 
     dlg.close();
     await refreshGrid();
-    await refreshTechCounters();
 
   } catch (err) {
     toast(err.message || 'No se pudo actualizar el estado.', 'err');
@@ -419,10 +465,7 @@ btnEstado?.addEventListener('click', async () => {
 });
 
 /* ------------------------------- EVENTOS --------------------------------- */
-btnRefresh?.addEventListener('click', async () => {
-  await refreshGrid();
-  setTimeout(refreshTechCounters, 150);
-});
+btnRefresh?.addEventListener('click', refreshGrid);
 
 q?.addEventListener('input', aplicarFiltro);
 
@@ -433,13 +476,73 @@ document.addEventListener('keydown', e => {
   }
 });
 
+/* ------------------------------ EN VIVO (SSE) ---------------------------- */
+// Parchea la grilla y los contadores con los eventos del servidor,
+// sin volver a pedir el listado completo.
+function patchTicket(id, changes) {
+  const t = cache.find(x => x.id === id);
+  if (t) Object.assign(t, changes);
+  return t;
+}
+
+function dropTicket(id) {
+  const before = cache.length;
+  cache = cache.filter(x => x.id !== id);
+  return cache.length !== before;
+}
+
+function onTicketEvent(type, ev) {
+  // Mis propias acciones ya recargan la grilla (refreshGrid)
+  if (ev.tecnico_id && me && ev.tecnico_id === me.user_id) return;
+
+  if (type === 'ticket_created') {
+    counts.disponibles += 1;
+    if (scope === 'disponibles' && !cache.some(x => x.id === ev.id)) cache.unshift(ev);
+  } else if (type === 'ticket_taken') {
+    // Una co-asignación sobre un ticket que ya tenía técnico no sale de "disponibles"
+    if (ev.disponible) counts.disponibles = Math.max(0, counts.disponibles - 1);
+    if (scope === 'disponibles') {
+      dropTicket(ev.id);
+    } else {
+      const t = patchTicket(ev.id, { estado: 'EN_CURSO' });
+      if (t) t.asignados = [t.asignados, ev.tecnico].filter(Boolean).join(', ');
+    }
+  } else if (type === 'state_changed') {
+    const cerrado = ev.estado === 'RESUELTO' || ev.estado === 'CANCELADO';
+    // Un compañero cerró un ticket compartido: pasa de "asignados" a "historial"
+    if (cerrado && scope === 'asignados' && dropTicket(ev.id)) {
+      counts.asignados = Math.max(0, counts.asignados - 1);
+      counts.historial += 1;
+    } else {
+      patchTicket(ev.id, { estado: ev.estado });
+    }
+  } else if (type === 'note_added') {
+    if (dlg?.open && String(dlg.dataset.id) === String(ev.id)) refrescarNotas(ev.id);
+    return;
+  }
+  refreshTechCounters();
+  render(cache);
+}
+
+function connectStream() {
+  if (!window.EventSource) return;
+  const es = new EventSource('/api/stream/tickets');
+  // Con el servidor lleno (503) EventSource no reintenta solo
+  es.onerror = () => { if (es.readyState === EventSource.CLOSED) setTimeout(connectStream, 30000); };
+  ['ticket_created', 'ticket_taken', 'state_changed', 'note_added'].forEach(type =>
+    es.addEventListener(type, e => {
+      try { onTicketEvent(type, JSON.parse(e.data)); } catch {}
+    }));
+}
+
 /* -------------------------------- INIT ----------------------------------- */
 (async function init() {
   // usuario básico y técnicos
   me = await $json('/api/session/basic').catch(() => null);
   await loadTecnicos();
 
-  // perfil + grilla
+  // perfil + grilla (los contadores se rellenan al cargar la grilla)
   await renderTechProfile();
   await cargar();
+  connectStream();
 })();
@@ -0,0 +1,64 @@
+# surveys.py — Respuestas de encuestas de satisfacción en forma estructurada
+#
+# Hasta ahora `api_encuestas_create` guardaba todo en `encuestas.descripcion`
+# como texto: secciones SUGERENCIAS / COMENTARIOS / RESPUESTAS separadas por
+# "---", con las calificaciones como repr de un dict de Python. Aquí están el
+# parser de ese formato (para migrar lo existente) y el cálculo de la
+# calificación que se guarda por encuesta en `encuesta_respuestas`.
+import ast
+
+SEPARATOR = "\n\n---\n\n"
+
+# Preguntas 1–5 que entran en la calificación promedio de una encuesta
+RATING_FIELDS = ("q_rapidez", "q_resolucion_efectiva", "q_satis_solucion", "q_satis_web",
+                 "p2", "p3", "p4")
+
+
+def score_1_5(value):
+    """Entero 1–5 o None."""
+    try:
+        v = int(value)
+    except (TypeError, ValueError):
+        return None
+    return v if 1 <= v <= 5 else None
+
+
+def rating(answers: dict):
+    """Promedio de las preguntas 1–5 respondidas (2 decimales), o None si no hay ninguna."""
+    scores = [s for s in (score_1_5(answers.get(k)) for k in RATING_FIELDS) if s is not None]
+    return round(sum(scores) / len(scores), 2) if scores else None
+
+
+def build_descripcion(sugerencias: str, comentarios: str) -> str:
+    """Texto libre que se sigue guardando en encuestas.descripcion."""
+    partes = [f"SUGERENCIAS:\n{sugerencias}"]
+    if comentarios:
+        partes.append(f"COMENTARIOS:\n{comentarios}")
+    return SEPARATOR.join(partes)
+
+
+def parse_descripcion(text: str) -> dict:
+    """
+    Inverso del formato antiguo. Devuelve {"sugerencias", "comentarios", **respuestas};
+    las secciones ausentes o ilegibles quedan vacías en lugar de fallar.
+    """
+    out = {"sugerencias": "", "comentarios": ""}
+    reconocido = False
+    for parte in (text or "").split(SEPARATOR):
+        titulo, _, cuerpo = parte.partition(":\n")
+        titulo = titulo.strip().upper()
+        reconocido = reconocido or titulo in ("SUGERENCIAS", "COMENTARIOS", "RESPUESTAS")
+        if titulo == "SUGERENCIAS":
+            out["sugerencias"] = cuerpo.strip()
+        elif titulo == "COMENTARIOS":
+            out["comentarios"] = cuerpo.strip()
+        elif titulo == "RESPUESTAS":
+            try:
+                extras = ast.literal_eval(cuerpo.strip())
+            except (ValueError, SyntaxError):
+                extras = None
+            if isinstance(extras, dict):
+                out.update({k: v for k, v in extras.items() if k not in out})
+    if not reconocido:
+        out["comentarios"] = (text or "").strip()
+    return out
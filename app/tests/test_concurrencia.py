@@ -0,0 +1,102 @@
+# tests/test_concurrencia.py — Carreras reales contra MySQL (ver conftest.py)
+import pytest
+
+pytestmark = pytest.mark.db
+
+N_HILOS = 8
+
+
+def _rollups_consistentes(consulta):
+    """Los rollups diarios coinciden con un recálculo desde tickets / ticket_tecnicos."""
+    tickets = consulta("""
+        SELECT r.dia, r.area_id, r.estado, r.asignado, r.n, COALESCE(x.n, 0) AS real_n
+        FROM metricas_tickets_dia r
+        LEFT JOIN (
+            SELECT DATE(creado_en) AS dia, COALESCE(area_id, 0) AS area_id, estado,
+                   asignado_a IS NOT NULL AS asignado, COUNT(*) AS n
+            FROM tickets
+            GROUP BY 1, 2, 3, 4
+        ) x ON x.dia = r.dia AND x.area_id = r.area_id AND x.estado = r.estado
+           AND x.asignado = r.asignado
+        WHERE r.n <> COALESCE(x.n, 0)
+    """)
+    tecnicos = consulta("""
+        SELECT r.dia, r.user_id, r.n, COALESCE(x.n, 0) AS real_n
+        FROM metricas_tecnicos_dia r
+        LEFT JOIN (
+            SELECT DATE(t.creado_en) AS dia, tt.user_id, COUNT(*) AS n
+            FROM ticket_tecnicos tt
+            JOIN tickets t ON t.id = tt.ticket_id
+            GROUP BY 1, 2
+        ) x ON x.dia = r.dia AND x.user_id = r.user_id
+        WHERE r.n <> COALESCE(x.n, 0)
+    """)
+    return tickets == [] and tecnicos == []
+
+
+def _forzar_estado(tid, estado):
+    """Cambia el estado a mano manteniendo los rollups (como las vistas)."""
+    from app import _rollup_aplicar, _rollup_claves, conexion
+    with conexion.borrow() as conn:
+        cur = conn.cursor()
+        try:
+            antes = _rollup_claves(cur, [tid], lock=True)
+            cur.execute("""UPDATE tickets SET estado=%s,
+                                  cerrado_en=IF(%s IN ('RESUELTO','CANCELADO'), NOW(), NULL)
+                           WHERE id=%s""", (estado, estado, tid))
+            _rollup_aplicar(cur, antes, _rollup_claves(cur, [tid]))
+            conn.commit()
+        finally:
+            cur.close()
+
+
+def test_tomar_cas_un_solo_ganador(datos, cliente, en_paralelo, consulta):
+    tecnicos = [uid for uid, _ in datos["tecnicos"]][:N_HILOS]
+    for tid in datos["abiertos"][:5]:
+        codigos = en_paralelo(
+            lambda uid: cliente(uid).post(f"/api/tecnico/tickets/{tid}/tomar?modo=cas").status_code,
+            tecnicos,
+        )
+        assert sorted(codigos) == [200] + [409] * (len(tecnicos) - 1)
+        filas = consulta("SELECT user_id FROM ticket_tecnicos WHERE ticket_id=%s", (tid,))
+        ticket = consulta("SELECT estado, asignado_a FROM tickets WHERE id=%s", (tid,))[0]
+        assert len(filas) == 1
+        assert ticket["estado"] == "EN_CURSO" and ticket["asignado_a"] == filas[0]["user_id"]
+    assert _rollups_consistentes(consulta)
+
+
+def test_tomar_cas_ticket_cerrado_sin_dueno(datos, cliente):
+    tid = datos["abiertos"][5]
+    _forzar_estado(tid, "CANCELADO")
+    r = cliente(datos["tecnicos"][0][0]).post(f"/api/tecnico/tickets/{tid}/tomar?modo=cas")
+    assert r.status_code == 409
+    assert r.get_json()["asignado_a"] is None
+    assert "tomado" not in r.get_json()["msg"]
+
+
+def _crear_ticket(cliente, uid):
+    return cliente(uid).post("/api/tickets", json={
+        "tipo": "Prueba", "descripcion": "Carrera de altas", "solicitante_nombre": "Pruebas",
+    })
+
+
+def test_limite_de_tickets_bajo_carrera(datos, cliente, en_paralelo, consulta):
+    from app import MAX_TOTAL_TICKETS
+    uid = datos["vacios"][0][0]
+    codigos = en_paralelo(lambda _: _crear_ticket(cliente, uid).status_code, range(N_HILOS))
+    assert codigos.count(201) == MAX_TOTAL_TICKETS
+    assert codigos.count(409) == N_HILOS - MAX_TOTAL_TICKETS
+    total = consulta("SELECT COUNT(*) AS n FROM tickets WHERE usuario_id=%s", (uid,))[0]["n"]
+    assert total == MAX_TOTAL_TICKETS
+    assert _rollups_consistentes(consulta)
+
+
+def test_encuesta_pendiente_devuelve_ids(datos, cliente, consulta):
+    uid = datos["vacios"][1][0]
+    r = _crear_ticket(cliente, uid)
+    assert r.status_code == 201
+    tid = r.get_json()["id"]
+    _forzar_estado(tid, "RESUELTO")
+    r = _crear_ticket(cliente, uid)
+    assert r.status_code == 409
+    assert r.get_json()["pendientes"] == [tid]
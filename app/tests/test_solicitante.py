@@ -0,0 +1,25 @@
+# tests/test_solicitante.py — Vistas del solicitante contra MySQL (ver conftest.py)
+import pytest
+
+pytestmark = pytest.mark.db
+
+
+def test_overview_agrupa_y_limita_en_sql(datos, cliente, consulta, monkeypatch):
+    import app
+    uid = datos["solicitantes"][0][0]  # concentra ~5% de los tickets sembrados
+    todos = consulta("""
+        SELECT t.id, t.estado,
+               EXISTS (SELECT 1 FROM encuestas e WHERE e.ticket_id = t.id) AS encuestada
+        FROM tickets t WHERE t.usuario_id=%s
+        ORDER BY t.creado_en DESC, t.id DESC
+    """, (uid,))
+    cerrados = [r["id"] for r in todos if r["estado"] not in app.ESTADOS_ABIERTOS]
+    assert len(cerrados) > 2
+    monkeypatch.setattr(app, "LIST_MAX_LIMIT", 2)
+
+    ov = cliente(uid).get("/api/solicitante/overview").get_json()
+    assert ov["count"] == len(todos)
+    assert [r["id"] for r in ov["abiertos"]] == [r["id"] for r in todos if r["estado"] in app.ESTADOS_ABIERTOS]
+    assert [r["id"] for r in ov["finalizados"]] == cerrados[:2]
+    pendientes = [r["id"] for r in todos if r["estado"] == "RESUELTO" and not r["encuestada"]]
+    assert [r["id"] for r in ov["encuestas_pendientes"]["tickets"]] == pendientes
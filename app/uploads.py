@@ -0,0 +1,346 @@
+# uploads.py — Subida de adjuntos: volcado por bloques + procesamiento en segundo plano
+#
+# Werkzeug escribe cada archivo del multipart directamente en un temporal de
+# uploads/tmp (UploadRequest) y corta con UploadTooLarge en cuanto una parte
+# pasa de UPLOAD_MAX_BYTES, mientras se recibe; spool() solo reclama ese
+# temporal, sin segunda copia. MAX_CONTENT_LENGTH rechaza antes de leer el
+# cuerpo las peticiones que anuncian un tamaño mayor. La validación,
+# normalización y el registro en `ticket_attachments` los hace un pool de hilos
+# (submit), o la propia petición cuando debe responder con la URL final
+# (process); los derivados WebP siempre se generan en el pool.
+#
+# Los archivos se guardan por contenido (<sha256>.<ext>): imágenes idénticas
+# de distintos tickets comparten un solo archivo en disco.
+import hashlib, logging, os, shutil, tempfile, threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow es opcional: sin él solo se valida la firma
+    Image = ImageOps = None
+
+log = logging.getLogger(__name__)
+
+CHUNK = 64 * 1024
+
+# Firmas (magic bytes) de los formatos aceptados
+_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+
+
+# Extensión con que se guarda cada formato detectado
+_EXTENSIONS = {"png": ".png", "jpeg": ".jpg", "gif": ".gif", "webp": ".webp"}
+
+# Derivados de evidencias: nombre → lado máximo en px (se guardan en WebP)
+DERIVATIVE_SIZES = {"thumb": 320, "medium": 1024}
+DERIVATIVES_DIR = "_derivados"
+
+
+class UploadTooLarge(Exception):
+    """El archivo supera UPLOAD_MAX_BYTES."""
+
+
+class InvalidImage(Exception):
+    """El contenido no corresponde a una imagen aceptada."""
+
+
+def sniff_image(path):
+    """Devuelve el formato ("png", "jpeg", "gif", "webp") o None."""
+    with open(path, "rb") as fh:
+        head = fh.read(16)
+    for sig, fmt in _SIGNATURES:
+        if head.startswith(sig):
+            return fmt
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def blob_name(path, fmt=None):
+    """Nombre direccionado por contenido: <sha256><ext>."""
+    fmt = fmt or sniff_image(path)
+    ext = _EXTENSIONS.get(fmt) or os.path.splitext(path)[1].lower()
+    return file_sha256(path) + ext
+
+
+def plan_dedupe(base_dir):
+    """
+    Agrupa los archivos de `base_dir` por contenido (sin tocar nada).
+    Devuelve {nombre_blob: [nombres actuales]} solo con archivos regulares.
+    """
+    groups = {}
+    for name in sorted(os.listdir(base_dir)):
+        path = os.path.join(base_dir, name)
+        if not os.path.isfile(path):
+            continue
+        groups.setdefault(blob_name(path), []).append(name)
+    return groups
+
+
+def remove_with_derivatives(base_dir, fname):
+    for path in [os.path.join(base_dir, fname)] + \
+                [derivative_path(base_dir, fname, size) for size in DERIVATIVE_SIZES]:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def derivative_path(base_dir, fname, size):
+    """
+    Ruta en disco del derivado `size` de uploads/tickets/<fname>. Conserva la
+    extensión del original (foto.png → foto.png.webp) para que foto.png y
+    foto.jpg no compartan derivado.
+    """
+    return os.path.join(base_dir, DERIVATIVES_DIR, size, fname + ".webp")
+
+
+def ensure_derivative(src, dest, max_dim):
+    """
+    Genera (una sola vez) el derivado WebP de `src` con lado máximo `max_dim`.
+    Devuelve la ruta, o None si no hay Pillow o la imagen no se puede leer.
+    """
+    if os.path.exists(dest):
+        return dest
+    if Image is None:
+        return None
+    try:
+        with Image.open(src) as im:
+            im = ImageOps.exif_transpose(im)
+            im.thumbnail((max_dim, max_dim))
+            if im.mode not in ("RGB", "RGBA"):
+                im = im.convert("RGBA" if "transparency" in im.info else "RGB")
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            # Escritura atómica: dos peticiones simultáneas no ven un archivo a medias
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), suffix=".tmp")
+            os.close(fd)
+            try:
+                im.save(tmp, format="WEBP", quality=80, method=4)
+                os.replace(tmp, dest)
+            finally:
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+        return dest
+    except Exception:
+        log.exception("No se pudo generar el derivado %s", dest)
+        return None
+
+
+class _PartFile:
+    """Temporal con nombre de una parte multipart; corta al pasar max_bytes."""
+
+    def __init__(self, tmp_dir, max_bytes, filename):
+        fd, self.path = tempfile.mkstemp(dir=tmp_dir, suffix=".part")
+        self.fh = os.fdopen(fd, "w+b")
+        self.max_bytes = max_bytes
+        self.filename = filename or "archivo"
+        self.size = 0
+        self.claimed = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(self.filename)
+        return self.fh.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.fh, name)
+
+    def discard(self):
+        self.fh.close()
+        if not self.claimed:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+
+def make_request_class(base):
+    """Request cuyos archivos multipart van a _PartFile en el tmp_dir del pipeline."""
+
+    class UploadRequest(base):
+        def _get_file_stream(self, total_content_length, content_type, filename=None,
+                             content_length=None):
+            pipeline = current_app.extensions["uploads"]
+            part = _PartFile(pipeline.tmp_dir, pipeline.max_bytes, filename)
+            self.__dict__.setdefault("_upload_parts", []).append(part)
+            return part
+
+        def close(self):
+            try:
+                super().close()
+            finally:
+                # Partes no reclamadas por spool() (error, petición rechazada)
+                for part in self.__dict__.pop("_upload_parts", []):
+                    part.discard()
+
+    return UploadRequest
+
+
+class UploadPipeline:
+    def __init__(self, app=None):
+        self.executor = None
+        self._lock = threading.Lock()
+        self._stats = dict(queued=0, done=0, rejected=0, failed=0, deduplicated=0)
+        self._derivatives_pending = set()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        cfg = app.config
+        self.max_bytes = int(cfg.get("UPLOAD_MAX_BYTES", 8 * 1024 * 1024))
+        self.max_dim = int(cfg.get("UPLOAD_MAX_DIM", 2560))
+        self.tmp_dir = os.path.join(app.root_path, cfg["UPLOAD_FOLDER"], "tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(cfg.get("UPLOAD_WORKERS", 2)),
+            thread_name_prefix="uploads",
+        )
+        app.extensions["uploads"] = self
+        app.request_class = make_request_class(app.request_class)
+
+    # ---- en la petición ----
+    def spool(self, storage):
+        """
+        Ruta del temporal con el contenido del FileStorage. Si Werkzeug ya lo
+        escribió en un _PartFile se reclama tal cual; si no, se copia por
+        bloques. UploadTooLarge si excede el tope.
+        """
+        part = storage.stream
+        if isinstance(part, _PartFile):
+            part.fh.close()
+            part.claimed = True
+            return part.path
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir, suffix=".part")
+        written = 0
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = storage.stream.read(CHUNK)
+                    if not chunk:
+                        break
+                    written += len(chunk)
+                    if written > self.max_bytes:
+                        raise UploadTooLarge(storage.filename or "archivo")
+                    out.write(chunk)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        return tmp_path
+
+    def submit(self, tmp_path, dest_dir, on_ready):
+        """
+        Encola validación + normalización; el archivo final queda en
+        dest_dir/<sha256><ext> y on_ready(ruta) se llama al terminar.
+        """
+        with self._lock:
+            self._stats["queued"] += 1
+        return self.executor.submit(self._process, tmp_path, dest_dir, on_ready)
+
+    def process(self, tmp_path, dest_dir, on_ready):
+        """
+        Como submit() pero en el hilo actual, para respuestas que necesitan la
+        ruta final; solo los derivados quedan en el pool. Devuelve la ruta, o
+        None si la imagen se rechazó o falló (queda en el log y en stats()).
+        """
+        with self._lock:
+            self._stats["queued"] += 1
+        return self._process(tmp_path, dest_dir, on_ready, derivatives_async=True)
+
+    # ---- en el worker (o en la petición, con process()) ----
+    def _process(self, tmp_path, dest_dir, on_ready, derivatives_async=False):
+        try:
+            fmt = sniff_image(tmp_path)
+            if not fmt:
+                raise InvalidImage(os.path.basename(tmp_path))
+            self._normalize(tmp_path, fmt)
+            os.makedirs(dest_dir, exist_ok=True)
+            dest_path = os.path.join(dest_dir, blob_name(tmp_path, fmt))
+            try:
+                # Blob reutilizado: se toca para que uploads-gc respete su periodo de gracia
+                os.utime(dest_path)
+                self._count("deduplicated")
+            except FileNotFoundError:
+                shutil.move(tmp_path, dest_path)
+            if derivatives_async:
+                self.executor.submit(self._derivatives, dest_path)
+            else:
+                self._derivatives(dest_path)
+            on_ready(dest_path)
+            self._count("done")
+            return dest_path
+        except InvalidImage:
+            log.warning("Adjunto rechazado (no es imagen): %s", tmp_path)
+            self._count("rejected")
+        except Exception:
+            log.exception("Error procesando adjunto %s", tmp_path)
+            self._count("failed")
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        return None
+
+    def _normalize(self, path, fmt):
+        """Aplica la orientación EXIF y reduce imágenes enormes (requiere Pillow)."""
+        if Image is None or fmt == "gif":
+            return
+        with Image.open(path) as im:
+            orientation = im.getexif().get(0x0112, 1)
+            if orientation == 1 and max(im.size) <= self.max_dim:
+                return
+            pil_format = im.format
+            fixed = ImageOps.exif_transpose(im)
+        fixed.thumbnail((self.max_dim, self.max_dim))
+        fixed.save(path, format=pil_format, optimize=True)
+
+    def queue_derivative(self, src, dest, max_dim):
+        """
+        Encola un derivado que falta (adjuntos anteriores a los derivados).
+        False si no se puede generar (sin Pillow); una sola tarea por destino.
+        """
+        if Image is None:
+            return False
+        with self._lock:
+            if dest in self._derivatives_pending:
+                return True
+            self._derivatives_pending.add(dest)
+
+        def run():
+            try:
+                ensure_derivative(src, dest, max_dim)
+            finally:
+                with self._lock:
+                    self._derivatives_pending.discard(dest)
+
+        self.executor.submit(run)
+        return True
+
+    def _derivatives(self, path):
+        """Genera thumb/medium al terminar la subida para que la galería no espere."""
+        base_dir, fname = os.path.split(path)
+        for size, max_dim in DERIVATIVE_SIZES.items():
+            ensure_derivative(path, derivative_path(base_dir, fname, size), max_dim)
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+        out["pending"] = out["queued"] - out["done"] - out["rejected"] - out["failed"]
+        return out